@@ -152,7 +152,7 @@ const App: React.FC = () => {
 
     try {
       // Use Local Backend (Multimodal) first, with automatic fallback to Gemini handled in service
-      const data: NovaResponse = await sendMessageToLocalNova(text, image, audio);
+      const data: NovaResponse = await sendMessageToLocalNova(text, image, audio, currentSessionId);
       
       const botMsg: Message = {
         id: (Date.now() + 1).toString(),
@@ -109,14 +109,16 @@ export const generateAnalysisReport = async (messages: Message[]): Promise<Analy
 export const sendMessageToLocalNova = async (
     text: string,
     imageBase64?: string,
-    audioBase64?: string // Currently backend might not handle raw audio base64 directly in the chat endpoint payload same way, but let's assume text/vision first
+    audioBase64?: string, // Currently backend might not handle raw audio base64 directly in the chat endpoint payload same way, but let's assume text/vision first
+    sessionId?: string | null // Lets the backend keep conversation memory per session
 ): Promise<NovaResponse> => {
     try {
         const payload: any = {
             text: text,
             emotion: "neutral", // Client-side initial guess or placeholder
             image: imageBase64, // Send base64 directly
-            audio: audioBase64  // Send base64 audio
+            audio: audioBase64, // Send base64 audio
+            session_id: sessionId ?? undefined
         };
         
         // Note: The Python backend now accepts an 'audio' field in ChatRequest.
@@ -8,13 +8,19 @@ import os
 from .utils import extract_mel_spectrogram
 
 # Define constants for audio CNN
-INPUT_SHAPE = (128, 44, 1)  # Example: 128 Mel bands, 44 frames (for approx 1 sec audio), 1 channel
+INPUT_SHAPE = (128, 44, 1)  # Example: 128 Mel bands, 44 frames (~88 ms at 22050 Hz with a 44-sample hop), 1 channel
 FILTERS = 64
 KERNEL_SIZE = (3, 3)
 POOL_SIZE = (2, 2)
 BATCH_SIZE = 32
 EPOCHS = 3
 
+# Long clips are encoded as INPUT_SHAPE windows and pooled into one embedding
+AUDIO_POOLING_MODES = ("mean", "energy", "max")
+DEFAULT_WINDOW_HOP_FRAMES = 22 # 50% overlap
+# 64 non-overlapping windows cover ~5.6 s; longer clips keep evenly spaced windows
+DEFAULT_MAX_WINDOWS = 64
+
 def build_audio_cnn_encoder(num_labels):
     """
     Builds a small Convolutional Neural Network (CNN) for audio emotion classification
@@ -56,17 +62,65 @@ def train_audio_encoder(model, train_mel_spectrograms, train_labels, val_mel_spe
     model.save(output_dir + ".keras") # Save as Keras Native format
     print(f"Audio CNN encoder model saved to {output_dir}.keras")
 
+def build_audio_embedding_extractor(model):
+    """
+    Builds the sub-model that outputs the 'audio_embedding' layer.
+    Build it once and reuse it; constructing it per request is expensive.
+    """
+    return Model(inputs=model.inputs, outputs=model.get_layer('audio_embedding').output)
+
 def get_audio_embeddings_cnn_model(model, mel_spectrograms):
     """
     Generates embeddings for input mel-spectrograms using the CNN model.
     We'll use the output of the 'audio_embedding' layer.
     """
-    # Create a sub-model that outputs the embedding layer
-    embedding_model = Model(inputs=model.inputs, outputs=model.get_layer('audio_embedding').output)
+    embedding_model = build_audio_embedding_extractor(model)
     embeddings = embedding_model.predict(mel_spectrograms)
     print(f"Generated audio embeddings from CNN model. Shape: {embeddings.shape}")
     return embeddings
 
+def window_weights(energies, max_windows, pooling="mean"):
+    """
+    Per-window pooling weights, zero-padded to `max_windows`.
+
+    A weight of 0 marks a padding slot. "energy" weights windows by their mean mel power
+    (louder, voiced windows count more); "mean" and "max" only mark valid windows.
+
+    Args:
+        energies (np.array): Mean mel power of each real window.
+        max_windows (int): Number of window slots per clip.
+        pooling (str): One of AUDIO_POOLING_MODES.
+
+    Returns:
+        np.array: float32 weights of shape (max_windows,).
+    """
+    if pooling not in AUDIO_POOLING_MODES:
+        raise ValueError(f"Unknown audio pooling mode '{pooling}'. Expected one of {AUDIO_POOLING_MODES}.")
+    weights = np.zeros(max_windows, dtype=np.float32)
+    if pooling == "energy":
+        # Floor keeps silent windows valid (a 0 weight would mark them as padding)
+        weights[:len(energies)] = np.maximum(energies / max(float(np.max(energies)), 1e-10), 1e-6)
+    else:
+        weights[:len(energies)] = 1.0
+    return weights
+
+def pool_window_embeddings(embeddings, weights, pooling="mean"):
+    """
+    Pools per-window embeddings of one clip into a single audio embedding.
+
+    Args:
+        embeddings (np.array): (W, 128) window embeddings.
+        weights (np.array): (W,) weights from `window_weights`; 0 marks padding.
+        pooling (str): One of AUDIO_POOLING_MODES.
+
+    Returns:
+        np.array: (128,) pooled embedding.
+    """
+    valid = weights > 0
+    if pooling == "max":
+        return embeddings[valid].max(axis=0)
+    return (embeddings[valid] * weights[valid, np.newaxis]).sum(axis=0) / weights[valid].sum()
+
 if __name__ == "__main__":
     print("Running audio encoder development example:")
 
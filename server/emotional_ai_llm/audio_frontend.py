@@ -0,0 +1,323 @@
+# emotional_ai_llm/audio_frontend.py
+
+# Vectorized mel-spectrogram frontend for the audio CNN. Kept free of TensorFlow
+# imports, like preprocessing.py.
+
+import threading
+
+import librosa
+import numpy as np
+import scipy.fft
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Defaults matching the audio encoder input (128 mel bands x 44 frames) and the
+# librosa settings used by utils.extract_mel_spectrogram
+DEFAULT_SR = 22050
+DEFAULT_N_MELS = 128
+DEFAULT_N_FRAMES = 44
+DEFAULT_HOP_LENGTH = 44
+DEFAULT_N_FFT = 2048
+DEFAULT_TOP_DB = 80.0
+AMIN = 1e-10
+
+# Frames transformed per FFT call; bounds the temporary (batch, frames, n_fft) buffers
+FRAME_CHUNK = 512
+
+# Voice-activity detection defaults (see trim_silence)
+VAD_FRAME_MS = 20
+VAD_ENERGY_THRESHOLD_DBFS = -45.0
+VAD_UNVOICED_MARGIN_DB = 10.0 # Quieter frames still count if they look like fricatives
+VAD_ZCR_THRESHOLD = 0.25 # Zero crossings per sample marking fricative-like frames
+VAD_PADDING_MS = 100
+
+
+def trim_silence(y, sr, frame_ms=VAD_FRAME_MS, energy_threshold_dbfs=VAD_ENERGY_THRESHOLD_DBFS,
+                 zcr_threshold=VAD_ZCR_THRESHOLD, padding_ms=VAD_PADDING_MS, hop_length=DEFAULT_HOP_LENGTH):
+    """
+    Energy / zero-crossing voice-activity detection that trims leading and trailing silence.
+
+    The clip is cut into non-overlapping frames (one reshape, no Python loop). A frame is
+    active when its RMS level is above `energy_threshold_dbfs`, or when it is at most
+    VAD_UNVOICED_MARGIN_DB quieter but has a high zero-crossing rate (unvoiced consonants
+    such as "s" or "f"). Everything before the first and after the last active frame,
+    minus `padding_ms` of context, is dropped.
+
+    Args:
+        y (np.array): Mono waveform in [-1, 1].
+        sr (int): Sampling rate of `y`.
+        frame_ms (float): VAD frame length.
+        energy_threshold_dbfs (float): RMS level (dB full scale) above which a frame is active.
+        zcr_threshold (float): Zero-crossing rate above which quieter frames count as active.
+        padding_ms (float): Context kept around the active region.
+        hop_length (int): STFT hop used downstream, for the saved-compute estimate.
+
+    Returns:
+        tuple: (trimmed waveform, or None if no active frame was found, stats dict with
+               "original_s", "trimmed_s", "removed_s", "voiced" and "saved_stft_frames").
+    """
+    y = np.asarray(y, dtype=np.float32).reshape(-1)
+    frame_length = max(1, int(sr * frame_ms / 1000))
+    num_frames = len(y) // frame_length
+    active_frames = np.zeros(0, dtype=np.int64)
+    if num_frames > 0:
+        frames = y[:num_frames * frame_length].reshape(num_frames, frame_length)
+        rms_dbfs = 10.0 * np.log10(np.maximum(np.mean(np.square(frames), axis=1), AMIN))
+        zcr = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+        active = (rms_dbfs > energy_threshold_dbfs) | (
+            (rms_dbfs > energy_threshold_dbfs - VAD_UNVOICED_MARGIN_DB) & (zcr > zcr_threshold)
+        )
+        active_frames = np.flatnonzero(active)
+
+    stats = {"original_s": round(len(y) / sr, 3)}
+    if len(active_frames) == 0:
+        trimmed = None
+        trimmed_length = 0
+    else:
+        padding = int(sr * padding_ms / 1000)
+        start = max(0, active_frames[0] * frame_length - padding)
+        stop = min(len(y), (active_frames[-1] + 1) * frame_length + padding)
+        trimmed = y[start:stop]
+        trimmed_length = len(trimmed)
+    stats["trimmed_s"] = round(trimmed_length / sr, 3)
+    stats["removed_s"] = round((len(y) - trimmed_length) / sr, 3)
+    stats["voiced"] = trimmed is not None
+    # Centred STFT frames (1 + samples // hop) cut from the clip before feature extraction
+    stats["saved_stft_frames"] = int((1 + len(y) // hop_length) - (1 + trimmed_length // hop_length if trimmed is not None else 0))
+    return trimmed, stats
+
+
+class VoiceActivityStats:
+    def __init__(self):
+        """Aggregates `trim_silence` statistics across requests for /metrics."""
+        self._lock = threading.Lock()
+        self._stats = {"clips": 0, "silent_clips": 0, "original_s": 0.0, "removed_s": 0.0, "saved_stft_frames": 0}
+
+    def record(self, stats):
+        with self._lock:
+            self._stats["clips"] += 1
+            self._stats["silent_clips"] += int(not stats["voiced"])
+            self._stats["original_s"] += stats["original_s"]
+            self._stats["removed_s"] += stats["removed_s"]
+            self._stats["saved_stft_frames"] += stats["saved_stft_frames"]
+
+    def get_metrics(self):
+        with self._lock:
+            metrics = dict(self._stats)
+        metrics["original_s"] = round(metrics["original_s"], 3)
+        metrics["removed_s"] = round(metrics["removed_s"], 3)
+        metrics["removed_fraction"] = round(metrics["removed_s"] / metrics["original_s"], 4) if metrics["original_s"] > 0 else 0.0
+        return metrics
+
+
+class MelFrontend:
+    def __init__(self, sr=DEFAULT_SR, n_mels=DEFAULT_N_MELS, n_frames=DEFAULT_N_FRAMES,
+                 hop_length=DEFAULT_HOP_LENGTH, n_fft=DEFAULT_N_FFT, top_db=DEFAULT_TOP_DB):
+        """
+        Computes audio encoder inputs (dB mel-spectrograms resized/padded to `n_frames`) for
+        batches of waveforms in one vectorized NumPy pass.
+
+        Reproduces `librosa.feature.melspectrogram` + `librosa.power_to_db(ref=np.max)`
+        followed by the bilinear `tf.image.resize` (clips with more frames) or zero padding
+        (clips with fewer frames) used by `main.prepare_audio_input`. The Hann window and
+        the mel filterbank are computed once, and the resize interpolation weights are
+        cached per source frame count. Only the frames the resize actually reads are
+        converted to dB.
+
+        Args:
+            sr (int): Sampling rate the waveforms are given at.
+            n_mels (int): Number of mel bands.
+            n_frames (int): Number of time frames expected by the audio encoder.
+            hop_length (int): Samples between successive STFT frames.
+            n_fft (int): FFT window size.
+            top_db (float): Dynamic range kept below the per-clip maximum.
+        """
+        self.sr = sr
+        self.n_mels = n_mels
+        self.n_frames = n_frames
+        self.hop_length = hop_length
+        self.n_fft = n_fft
+        self.top_db = top_db
+
+        # Periodic Hann window, as used by librosa's STFT
+        self.window = (0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)
+        # (n_fft // 2 + 1, n_mels), laid out for `power @ mel_basis`
+        self.mel_basis = np.ascontiguousarray(librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels).T, dtype=np.float32)
+        self._resize_weights = {}
+
+    def _resize_weights_for(self, num_frames):
+        """Source frame indices and lerp weights of a bilinear, half-pixel-centred resize to `n_frames`."""
+        weights = self._resize_weights.get(num_frames)
+        if weights is None:
+            positions = (np.arange(self.n_frames) + 0.5) * (num_frames / self.n_frames) - 0.5
+            floors = np.floor(positions)
+            lower = np.maximum(floors, 0).astype(np.int64)
+            upper = np.minimum(np.ceil(positions), num_frames - 1).astype(np.int64)
+            lerp = (positions - floors).astype(np.float32)
+            weights = self._resize_weights[num_frames] = (lower, upper, lerp)
+        return weights
+
+    def mel_power(self, waveforms):
+        """
+        Mel power spectrograms for a batch of clips.
+
+        Clips are zero-padded to a common length and framed with a strided view, so the
+        STFT of the whole batch runs as a few large FFT calls.
+
+        Args:
+            waveforms (list): Mono waveforms (1-D arrays) at `sr`, of any lengths.
+
+        Returns:
+            tuple: (mel_power, frame_counts) where mel_power is (N, max_frames, n_mels) float32
+                   and frame_counts holds each clip's own number of STFT frames.
+        """
+        waveforms = [np.asarray(waveform, dtype=np.float32).reshape(-1) for waveform in waveforms]
+        lengths = np.array([len(waveform) for waveform in waveforms])
+        frame_counts = 1 + lengths // self.hop_length
+
+        # Centred frames with zero padding (librosa's default `center=True, pad_mode="constant"`)
+        pad = self.n_fft // 2
+        padded = np.zeros((len(waveforms), lengths.max() + 2 * pad), dtype=np.float32)
+        for row, waveform in enumerate(waveforms):
+            padded[row, pad:pad + len(waveform)] = waveform
+        frames = sliding_window_view(padded, self.n_fft, axis=-1)[:, ::self.hop_length][:, :frame_counts.max()]
+
+        mel_power = np.empty((len(waveforms), frames.shape[1], self.n_mels), dtype=np.float32)
+        for start in range(0, frames.shape[1], FRAME_CHUNK):
+            spectrum = scipy.fft.rfft(frames[:, start:start + FRAME_CHUNK] * self.window, axis=-1)
+            power = np.square(spectrum.real) + np.square(spectrum.imag)
+            np.matmul(power, self.mel_basis, out=mel_power[:, start:start + FRAME_CHUNK])
+        return mel_power, frame_counts
+
+    def __call__(self, waveforms):
+        """
+        Builds audio encoder inputs for a batch of clips.
+
+        Args:
+            waveforms (list): Mono waveforms (1-D arrays) at `sr`, of any lengths.
+
+        Returns:
+            np.array: float32 array of shape (N, n_mels, n_frames, 1).
+        """
+        return self._encoder_inputs(*self.mel_power(waveforms))
+
+    def _encoder_inputs(self, mel_power, frame_counts):
+        """dB conversion plus resize/padding of `mel_power` output to (N, n_mels, n_frames, 1)."""
+        output = np.zeros((len(frame_counts), self.n_mels, self.n_frames), dtype=np.float32)
+        for row, num_frames in enumerate(frame_counts):
+            clip_power = mel_power[row, :num_frames]
+            # power_to_db(ref=np.max): the clip maximum maps to 0 dB and the floor is -top_db
+            ref_db = 10.0 * np.log10(max(float(clip_power.max()), AMIN))
+
+            def to_db(power):
+                return np.maximum(10.0 * np.log10(np.maximum(power, AMIN)) - ref_db, -self.top_db)
+
+            if num_frames > self.n_frames:
+                lower, upper, lerp = self._resize_weights_for(num_frames)
+                lower_db, upper_db = to_db(clip_power[lower]), to_db(clip_power[upper])
+                output[row] = (lower_db + (upper_db - lower_db) * lerp[:, None]).T
+            else:
+                output[row, :, :num_frames] = to_db(clip_power).T
+        return output[..., np.newaxis]
+
+    def _window_starts(self, num_frames, hop_frames):
+        """Window starts every `hop_frames` frames, plus one aligned to the end of the clip."""
+        starts = list(range(0, num_frames - self.n_frames + 1, hop_frames))
+        if starts[-1] != num_frames - self.n_frames:
+            starts.append(num_frames - self.n_frames)
+        return np.array(starts)
+
+    def windows(self, waveform, hop_frames, max_windows):
+        """
+        Splits one clip into `n_frames`-wide dB mel windows instead of resizing it.
+
+        Window starts advance by `hop_frames`; a last window is aligned to the end of the clip
+        so the tail is covered. A window spans only `n_frames * hop_length / sr` seconds
+        (~88 ms with the defaults), so when there are more than `max_windows` windows the
+        overlap is dropped first (starts advance by `n_frames`), and only if that still gives
+        too many windows are evenly spaced ones kept. Only the STFT frames inside the kept
+        windows are computed, which bounds the cost for long recordings. Clips no longer
+        than `n_frames` frames give one zero-padded window, exactly as `__call__` does.
+
+        Args:
+            waveform (np.array): Mono waveform at `sr`.
+            hop_frames (int): Frames between successive window starts.
+            max_windows (int): Maximum number of windows returned.
+
+        Returns:
+            tuple: (windows, energies, encoded_s) with windows of shape (W, n_mels, n_frames, 1)
+                   float32, the mean mel power of each window (for energy-weighted pooling),
+                   W <= max_windows, and the seconds of the clip inside the kept windows.
+        """
+        waveform = np.asarray(waveform, dtype=np.float32).reshape(-1)
+        num_frames = 1 + len(waveform) // self.hop_length
+        if num_frames <= self.n_frames:
+            mel_power, frame_counts = self.mel_power([waveform])
+            energies = np.array([mel_power[0].mean()], dtype=np.float32)
+            return self._encoder_inputs(mel_power, frame_counts), energies, len(waveform) / self.sr
+
+        starts = self._window_starts(num_frames, hop_frames)
+        if len(starts) > max_windows and hop_frames < self.n_frames:
+            starts = self._window_starts(num_frames, self.n_frames)
+        if len(starts) > max_windows:
+            starts = starts[np.round(np.linspace(0, len(starts) - 1, max_windows)).astype(np.int64)]
+
+        # STFT only of the frames the kept windows cover (overlapping frames computed once)
+        frame_indices = starts[:, np.newaxis] + np.arange(self.n_frames)
+        unique_frames, inverse = np.unique(frame_indices, return_inverse=True)
+        pad = self.n_fft // 2
+        padded = np.pad(waveform, (pad, pad))
+        frames = sliding_window_view(padded, self.n_fft)[::self.hop_length][unique_frames]
+        spectrum = scipy.fft.rfft(frames * self.window, axis=-1)
+        power = (np.square(spectrum.real) + np.square(spectrum.imag)) @ self.mel_basis
+
+        ref_db = 10.0 * np.log10(max(float(power.max()), AMIN))
+        power_db = np.maximum(10.0 * np.log10(np.maximum(power, AMIN)) - ref_db, -self.top_db)
+        windows = power_db[inverse.reshape(frame_indices.shape)] # (W, n_frames, n_mels)
+        energies = power[inverse.reshape(frame_indices.shape)].mean(axis=(1, 2))
+        encoded_s = min(len(unique_frames) * self.hop_length, len(waveform)) / self.sr
+        return (np.ascontiguousarray(windows.transpose(0, 2, 1)[..., np.newaxis], dtype=np.float32),
+                energies.astype(np.float32), encoded_s)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    import tensorflow as tf
+
+    from .utils import mel_spectrogram_from_waveform
+
+    parser = argparse.ArgumentParser(description="Compare the vectorized mel frontend with the librosa path.")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    frontend = MelFrontend()
+    rng = np.random.default_rng(0)
+    # Mixed clip lengths, including clips shorter and longer than the 44-frame target
+    lengths = rng.integers(DEFAULT_HOP_LENGTH * 10, int(args.seconds * DEFAULT_SR), size=args.batch_size)
+    waveforms = [(0.1 * rng.standard_normal(length)).astype(np.float32) for length in lengths]
+
+    def librosa_path(waveform):
+        mel_spec = mel_spectrogram_from_waveform(waveform, DEFAULT_SR, n_mels=DEFAULT_N_MELS, hop_length=DEFAULT_HOP_LENGTH)
+        mel_spec = mel_spec[np.newaxis, ..., np.newaxis]
+        if mel_spec.shape[2] > DEFAULT_N_FRAMES:
+            mel_spec = tf.image.resize(mel_spec, (DEFAULT_N_MELS, DEFAULT_N_FRAMES)).numpy()
+        elif mel_spec.shape[2] < DEFAULT_N_FRAMES:
+            mel_spec = np.pad(mel_spec, ((0, 0), (0, 0), (0, DEFAULT_N_FRAMES - mel_spec.shape[2]), (0, 0)))
+        return mel_spec[0]
+
+    def median_ms(fn):
+        fn() # Warm-up
+        samples = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        return 1000 * float(np.median(samples))
+
+    # Parity with the librosa path is asserted in tests/test_audio_frontend.py
+    librosa_ms = median_ms(lambda: [librosa_path(waveform) for waveform in waveforms])
+    frontend_ms = median_ms(lambda: frontend(waveforms))
+    print(f"Batch of {args.batch_size} clips: librosa {librosa_ms:.2f} ms, vectorized {frontend_ms:.2f} ms (x{librosa_ms / frontend_ms:.1f})")
@@ -0,0 +1,235 @@
+# emotional_ai_llm/batching.py
+
+import asyncio
+import logging
+import os
+import time
+
+import numpy as np
+
+# Default coalescing window (overridable through environment variables, see MicroBatcher.from_env)
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_MS = 5.0
+DEFAULT_MAX_CONCURRENT_BATCHES = 1
+
+
+def _stack_inputs(inputs_list):
+    """Concatenates per-request inputs (arrays or dicts of arrays) along the batch axis."""
+    if isinstance(inputs_list[0], dict):
+        return {key: np.concatenate([inputs[key] for inputs in inputs_list], axis=0) for key in inputs_list[0]}
+    return np.concatenate(inputs_list, axis=0)
+
+
+def _slice_rows(outputs, start, stop):
+    """Selects the rows of a batched output (array or dict of arrays) belonging to one request."""
+    if isinstance(outputs, dict):
+        return {key: value[start:stop] for key, value in outputs.items()}
+    return outputs[start:stop]
+
+
+def _batch_rows(inputs):
+    """Number of rows a single request contributes to the stacked batch."""
+    if isinstance(inputs, dict):
+        return len(next(iter(inputs.values())))
+    return len(inputs)
+
+
+class MicroBatcher:
+    def __init__(self, name, batch_fn, executor, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, max_concurrent_batches=DEFAULT_MAX_CONCURRENT_BATCHES):
+        """
+        Coalesces concurrent requests for one model into a single batched call.
+
+        Requests submitted within `max_wait_ms` of the first queued request (or until
+        `max_batch_size` rows are collected) are stacked along axis 0, run through
+        `batch_fn` once on the InferenceExecutor, and the output rows are scattered back
+        to the awaiting callers.
+
+        Args:
+            name (str): Name used in logs and metrics (e.g. "text", "fusion").
+            batch_fn (callable): Blocking function mapping a stacked batch (array or dict of
+                                 arrays) to an output array (or dict of arrays) with one row
+                                 per input row.
+            executor (InferenceExecutor): Executor the batched calls are run on.
+            max_batch_size (int): Maximum number of rows per batched call.
+            max_wait_ms (float): How long the first request in a batch may wait for company.
+            max_concurrent_batches (int): Number of batches of this model allowed in flight.
+        """
+        self.name = name
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.max_concurrent_batches = max_concurrent_batches
+
+        self._queue = None
+        self._worker_task = None
+        self._batch_slots = None
+        self._batch_size_counts = {}
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "rows": 0,
+            "total_queue_wait_s": 0.0,
+            "max_queue_wait_s": 0.0,
+            "total_run_s": 0.0,
+        }
+        logging.info(
+            f"MicroBatcher '{name}' initialized (max batch {max_batch_size}, max wait {max_wait_ms} ms)."
+        )
+
+    @classmethod
+    def from_env(cls, name, batch_fn, executor):
+        """
+        Builds a batcher configured from environment variables:
+        NOVA_BATCH_MAX_SIZE, NOVA_BATCH_MAX_WAIT_MS and NOVA_BATCH_MAX_CONCURRENT.
+        """
+        return cls(
+            name,
+            batch_fn,
+            executor,
+            max_batch_size=int(os.environ.get("NOVA_BATCH_MAX_SIZE", DEFAULT_MAX_BATCH_SIZE)),
+            max_wait_ms=float(os.environ.get("NOVA_BATCH_MAX_WAIT_MS", DEFAULT_MAX_WAIT_MS)),
+            max_concurrent_batches=int(os.environ.get("NOVA_BATCH_MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT_BATCHES)),
+        )
+
+    def _ensure_worker(self):
+        """Starts the collector task on the running event loop on first use."""
+        if self._worker_task is None or self._worker_task.done():
+            self._queue = asyncio.Queue()
+            self._batch_slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker_task = asyncio.get_running_loop().create_task(self._collect_batches())
+
+    async def submit(self, inputs):
+        """
+        Queues one request's inputs and waits for its slice of the batched output.
+
+        Args:
+            inputs (np.array or dict): Model inputs with a leading batch dimension (usually 1).
+
+        Returns:
+            np.array: The output rows belonging to this request.
+        """
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((inputs, future, time.perf_counter()))
+        return await future
+
+    async def _collect_batches(self):
+        """Collector loop: gathers queued requests into batches and dispatches them."""
+        while True:
+            first = await self._queue.get()
+            pending = [first]
+            rows = _batch_rows(first[0])
+            deadline = first[2] + self.max_wait_s
+
+            while rows < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                rows += _batch_rows(item[0])
+
+            # Wait for a free batch slot; requests arriving meanwhile join the next batch
+            await self._batch_slots.acquire()
+            asyncio.get_running_loop().create_task(self._run_batch(pending))
+
+    async def _run_batch(self, pending):
+        """Runs one stacked batch and scatters the output rows back to the callers."""
+        try:
+            started_at = time.perf_counter()
+            waits = [started_at - enqueued_at for _, _, enqueued_at in pending]
+            row_counts = [_batch_rows(inputs) for inputs, _, _ in pending]
+            try:
+                outputs = await self.executor.run(self.batch_fn, _stack_inputs([inputs for inputs, _, _ in pending]))
+                if isinstance(outputs, dict):
+                    outputs = {key: np.asarray(value) for key, value in outputs.items()}
+                else:
+                    outputs = np.asarray(outputs)
+            except Exception as e:
+                logging.error(f"MicroBatcher '{self.name}' batch of {len(pending)} failed: {e}")
+                for _, future, _ in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            offset = 0
+            for (_, future, _), count in zip(pending, row_counts):
+                if not future.done():
+                    future.set_result(_slice_rows(outputs, offset, offset + count))
+                offset += count
+
+            batch_rows = sum(row_counts)
+            self._batch_size_counts[batch_rows] = self._batch_size_counts.get(batch_rows, 0) + 1
+            self._stats["requests"] += len(pending)
+            self._stats["batches"] += 1
+            self._stats["rows"] += batch_rows
+            self._stats["total_queue_wait_s"] += sum(waits)
+            self._stats["max_queue_wait_s"] = max(self._stats["max_queue_wait_s"], max(waits))
+            self._stats["total_run_s"] += time.perf_counter() - started_at
+        finally:
+            self._batch_slots.release()
+
+    def get_metrics(self):
+        """
+        Returns achieved batch sizes and queue wait times.
+
+        Returns:
+            dict: Batch size histogram, average batch size and queue wait / run latency in ms.
+        """
+        stats = self._stats
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+            "requests": stats["requests"],
+            "batches": stats["batches"],
+            "avg_batch_size": round(stats["rows"] / stats["batches"], 3) if stats["batches"] else 0.0,
+            "batch_size_histogram": dict(sorted(self._batch_size_counts.items())),
+            "avg_queue_wait_ms": round(1000 * stats["total_queue_wait_s"] / stats["requests"], 3) if stats["requests"] else 0.0,
+            "max_queue_wait_ms": round(1000 * stats["max_queue_wait_s"], 3),
+            "avg_batch_run_ms": round(1000 * stats["total_run_s"] / stats["batches"], 3) if stats["batches"] else 0.0,
+        }
+
+    async def close(self):
+        """Stops the collector task. Requests still queued are cancelled."""
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            while not self._queue.empty():
+                _, future, _ = self._queue.get_nowait()
+                future.cancel()
+        logging.info(f"MicroBatcher '{self.name}' closed.")
+
+
+if __name__ == "__main__":
+    from emotional_ai_llm.inference_executor import InferenceExecutor
+
+    print("Running MicroBatcher module development example:")
+
+    weights = np.random.rand(8, 4).astype(np.float32)
+
+    def dense_layer(batch):
+        time.sleep(0.01) # Fixed per-call overhead, as with a framework predict() call
+        return batch @ weights
+
+    async def demo():
+        executor = InferenceExecutor(max_threads=2)
+        batcher = MicroBatcher("demo", dense_layer, executor, max_batch_size=16, max_wait_ms=5.0)
+        requests = [np.random.rand(1, 8).astype(np.float32) for _ in range(40)]
+        outputs = await asyncio.gather(*(batcher.submit(r) for r in requests))
+        for request, output in zip(requests, outputs):
+            assert np.allclose(output, request @ weights, atol=1e-5)
+        print("All 40 scattered outputs match their unbatched results.")
+        print(f"Metrics: {batcher.get_metrics()}")
+        await batcher.close()
+        executor.shutdown()
+
+    asyncio.run(demo())
+    print("\nMicroBatcher module development example finished.")
@@ -0,0 +1,311 @@
+# emotional_ai_llm/chat_generators.py
+
+# Registry of the seq2seq models ResponsePlanner can generate replies with. Each entry knows
+# how to load its model and how to phrase a turn the way that model was trained; loaded
+# generators keep their own scheduler and latency histogram.
+
+import asyncio
+import bisect
+import logging
+import threading
+import time
+
+import torch
+from transformers import (
+    AutoModelForSeq2SeqLM, AutoTokenizer, BlenderbotForConditionalGeneration, BlenderbotTokenizer,
+    StoppingCriteria, StoppingCriteriaList,
+)
+
+from .generation_backends import load_generation_model
+from .generation_scheduler import GenerationScheduler, DEFAULT_GENERATION_PARAMS
+from .model_registry import T5_MODEL_PATH, get_model_registry
+
+# Upper bucket bounds of the per-generator latency histograms
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+# Project emotion -> closest empathetic_dialogues emotion context, the vocabulary the T5 model was trained on
+EMPATHETIC_DIALOGUES_CONTEXTS = {
+    'anger': 'angry',
+    'disgust': 'disgusted',
+    'fear': 'afraid',
+    'happy': 'joyful',
+    'sad': 'sad',
+    'surprise': 'surprised',
+    'neutral': 'content',
+}
+
+
+def blenderbot_prompt(user_input_text, primary_emotion):
+    """States the detected emotion up front so BlenderBot responds to it."""
+    if primary_emotion in ['sad', 'anger', 'fear', 'happy', 'disgust']:
+        return f"I feel {primary_emotion}. {user_input_text}"
+    return user_input_text
+
+
+def empathetic_t5_prompt(user_input_text, primary_emotion):
+    """
+    Same layout as fine_tune_t5.preprocess_function: the empathetic_dialogues emotion context
+    fills the "dialogue" slot and the user's situation the "emotion" slot.
+    """
+    context = EMPATHETIC_DIALOGUES_CONTEXTS.get(primary_emotion, 'content')
+    return f"dialogue: {context} ||| emotion: {user_input_text.strip()}"
+
+
+class DeadlineStoppingCriteria(StoppingCriteria):
+    def __init__(self, deadline, seconds_per_token=0.0, smoothing=0.3):
+        """
+        Stops generate() before the token that would finish after `deadline`.
+
+        The time per token starts from `seconds_per_token` and is re-estimated from the
+        steps of this call, so the check adapts to the current load.
+
+        Args:
+            deadline (float): time.monotonic() by which generation must end.
+            seconds_per_token (float): Initial estimate of one decode step.
+            smoothing (float): Weight of the newest step in the moving average.
+        """
+        self.deadline = deadline
+        self.seconds_per_token = seconds_per_token
+        self.smoothing = smoothing
+        self.stopped = False
+        self._last_call = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        now = time.monotonic()
+        if self._last_call is not None:
+            step_s = now - self._last_call
+            self.seconds_per_token += self.smoothing * (step_s - self.seconds_per_token)
+        self._last_call = now
+        self.stopped = now + self.seconds_per_token >= self.deadline
+        return torch.full((input_ids.shape[0],), self.stopped, dtype=torch.bool, device=input_ids.device)
+
+
+class GeneratorSpec:
+    def __init__(self, model_name, model_class, tokenizer_class, build_prompt, generation_params=None):
+        """
+        How to load and prompt one chat model.
+
+        Args:
+            model_name (str): Hub model name or local checkpoint path.
+            model_class: transformers seq2seq class used by the torch/int8 backends.
+            tokenizer_class: transformers tokenizer class.
+            build_prompt (callable): (user_input_text, primary_emotion) -> model input text.
+            generation_params (dict, optional): max_length / sampling parameters of a reply.
+        """
+        self.model_name = model_name
+        self.model_class = model_class
+        self.tokenizer_class = tokenizer_class
+        self.build_prompt = build_prompt
+        self.generation_params = dict(generation_params or DEFAULT_GENERATION_PARAMS)
+
+
+GENERATOR_REGISTRY = {
+    "blenderbot": GeneratorSpec(
+        "facebook/blenderbot-400M-distill", BlenderbotForConditionalGeneration, BlenderbotTokenizer, blenderbot_prompt,
+    ),
+    # Trained with 64-token targets (MAX_TARGET_LENGTH in fine_tune_t5.py)
+    "t5": GeneratorSpec(
+        T5_MODEL_PATH, AutoModelForSeq2SeqLM, AutoTokenizer, empathetic_t5_prompt,
+        {**DEFAULT_GENERATION_PARAMS, "max_length": 64},
+    ),
+}
+
+
+def register_generator(name, spec):
+    """Adds (or replaces) a chat model that ResponsePlanner can load by name."""
+    GENERATOR_REGISTRY[name] = spec
+
+
+class LatencyHistogram:
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        """Counts reply latencies into fixed buckets (the last bucket is unbounded)."""
+        self.buckets_ms = tuple(buckets_ms)
+        self._counts = [0] * (len(self.buckets_ms) + 1)
+        self._total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, latency_s):
+        latency_ms = 1000 * latency_s
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets_ms, latency_ms)] += 1
+            self._total_ms += latency_ms
+
+    def _quantile_ms(self, counts, total, quantile):
+        """Upper bound of the bucket holding the given quantile (None if it is the unbounded one)."""
+        seen = 0
+        for bound, count in zip(self.buckets_ms, counts):
+            seen += count
+            if seen >= quantile * total:
+                return bound
+        return None
+
+    def get_metrics(self):
+        """
+        Returns:
+            dict: count, mean_ms, bucketed p50/p95 upper bounds, and counts per "le_<ms>" bucket.
+        """
+        with self._lock:
+            counts, total_ms = list(self._counts), self._total_ms
+        total = sum(counts)
+        return {
+            "count": total,
+            "mean_ms": round(total_ms / total, 3) if total else 0.0,
+            "p50_ms": self._quantile_ms(counts, total, 0.5) if total else None,
+            "p95_ms": self._quantile_ms(counts, total, 0.95) if total else None,
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(self.buckets_ms, counts)},
+                "inf": counts[-1],
+            },
+        }
+
+
+class ChatGenerator:
+    def __init__(self, name, spec, backend, device=None, batching=True):
+        """
+        A loaded chat model: tokenizer, model on its backend, optional GenerationScheduler,
+        startup smoke test and latency histogram.
+
+        Args:
+            name (str): Registry name.
+            spec (GeneratorSpec): What to load.
+            backend (str): One of generation_backends.GENERATION_BACKENDS.
+            device (torch.device, optional): Device for the torch backend.
+            batching (bool): Decode concurrent replies together through a GenerationScheduler.
+        """
+        self.name = name
+        self.spec = spec
+        self.generation_params = spec.generation_params
+        registry = get_model_registry()
+        model_path = registry.resolve(name, spec.model_name)
+        logging.info(f"Loading chat generator '{name}': {model_path}")
+        with registry.timed_load(name):
+            self.tokenizer = spec.tokenizer_class.from_pretrained(model_path)
+            self.model, self.backend, self.device = load_generation_model(model_path, spec.model_class, backend, device)
+        logging.info(f"Chat generator '{name}' loaded ({self.backend} backend on {self.device}).")
+        self.self_check = self._smoke_test()
+        self.latency = LatencyHistogram()
+        self.scheduler = GenerationScheduler.from_env(self.model, self.tokenizer, self.device) if batching else None
+
+    def build_prompt(self, user_input_text, primary_emotion):
+        return self.spec.build_prompt(user_input_text, primary_emotion)
+
+    def _smoke_test(self):
+        """
+        Greedily decodes one short reply to confirm the loaded backend produces text.
+
+        Returns:
+            dict: backend, whether a non-empty reply came back, and the decode speed.
+        """
+        report = {"backend": self.backend, "ok": False, "tokens_per_s": 0.0}
+        try:
+            inputs = self.tokenizer([self.build_prompt("I lost the game.", "sad")], return_tensors="pt").to(self.device)
+            started = time.perf_counter()
+            reply_ids = self.model.generate(**inputs, max_length=32, do_sample=False, num_beams=1)
+            elapsed = time.perf_counter() - started
+            report["ok"] = bool(self.tokenizer.decode(reply_ids[0], skip_special_tokens=True).strip())
+            report["tokens_per_s"] = round((reply_ids.shape[-1] - 1) / elapsed, 1)
+        except Exception as e:
+            logging.error(f"Smoke test of chat generator '{self.name}' failed on the {self.backend} backend: {e}")
+        if not report["ok"]:
+            logging.warning(f"Smoke test: chat generator '{self.name}' returned no reply.")
+        logging.info(f"Chat generator '{self.name}' smoke test: {report}")
+        return report
+
+    def load(self):
+        """Sequences waiting for or being decoded by the scheduler (0 without one)."""
+        if self.scheduler is None:
+            return 0
+        metrics = self.scheduler.get_metrics()
+        return metrics["pending"] + metrics["active"]
+
+    def seconds_per_token(self):
+        """Current estimate of one decode step: measured by the scheduler, else from the smoke test."""
+        if self.scheduler is not None and self.scheduler.seconds_per_step() > 0:
+            return self.scheduler.seconds_per_step()
+        tokens_per_s = self.self_check["tokens_per_s"]
+        return 1.0 / tokens_per_s if tokens_per_s > 0 else 0.0
+
+    def stop_reason(self, reply_ids, max_length=None):
+        """Why decoding of `reply_ids` ended: "eos", "max_length" or "deadline"."""
+        max_length = max_length or self.generation_params["max_length"]
+        if reply_ids and reply_ids[-1] == self.model.config.eos_token_id:
+            return "eos"
+        # max_length counts the decoder start token
+        if len(reply_ids) + 1 >= max_length:
+            return "max_length"
+        return "deadline"
+
+    def _params(self, max_length=None):
+        return {**self.generation_params, "max_length": max_length} if max_length else self.generation_params
+
+    def _generate_ids(self, prompt, streamer=None, max_length=None, deadline=None):
+        """One blocking model.generate() call, optionally pushing tokens into a streamer."""
+        inputs = self.tokenizer([prompt], return_tensors="pt").to(self.device)
+        stopping_criteria = None
+        if deadline is not None:
+            stopping_criteria = StoppingCriteriaList([DeadlineStoppingCriteria(deadline, self.seconds_per_token())])
+        output = self.model.generate(**inputs, **self._params(max_length), streamer=streamer, stopping_criteria=stopping_criteria)
+        # Drop the decoder start token, as the scheduler does
+        return output[0].tolist()[1:]
+
+    def generate(self, prompt, session_id=None, max_length=None, deadline=None):
+        """
+        Blocking: returns the generated token ids.
+
+        Args:
+            max_length (int, optional): Overrides the spec's max_length for this reply.
+            deadline (float, optional): time.monotonic() by which decoding must stop.
+        """
+        started = time.perf_counter()
+        if self.scheduler is not None:
+            reply_ids = self.scheduler.generate(prompt, session_id=session_id, deadline=deadline, **self._params(max_length))
+        else:
+            reply_ids = self._generate_ids(prompt, max_length=max_length, deadline=deadline)
+        self.latency.observe(time.perf_counter() - started)
+        return reply_ids
+
+    async def agenerate_ids(self, prompt, session_id=None, streamer=None, run_blocking=None, max_length=None, deadline=None):
+        """
+        Awaits the reply ids. With a scheduler, cancelling the await evicts the sequence;
+        without one, the blocking generate() call is handed to `run_blocking`
+        (defaults to asyncio.to_thread).
+        """
+        started = time.perf_counter()
+        if self.scheduler is not None:
+            reply_ids = await asyncio.wrap_future(self.scheduler.submit(
+                prompt, session_id=session_id, streamer=streamer, deadline=deadline, **self._params(max_length)))
+        else:
+            reply_ids = await (run_blocking or asyncio.to_thread)(self._generate_ids, prompt, streamer, max_length, deadline)
+        self.latency.observe(time.perf_counter() - started)
+        return reply_ids
+
+    def close(self):
+        if self.scheduler is not None:
+            self.scheduler.close()
+
+    def get_metrics(self):
+        return {
+            "backend": self.backend,
+            "self_check": self.self_check,
+            "latency": self.latency.get_metrics(),
+            "scheduler": self.scheduler.get_metrics() if self.scheduler is not None else None,
+        }
+
+
+if __name__ == "__main__":
+    print("Running chat generator registry development example:")
+
+    print(f"BlenderBot prompt: {blenderbot_prompt('I lost the game.', 'sad')}")
+    print(f"T5 prompt:         {empathetic_t5_prompt('I lost the game.', 'sad')}")
+
+    histogram = LatencyHistogram()
+    for latency_s in (0.04, 0.3, 0.35, 0.6, 1.2, 1.5, 20.0):
+        histogram.observe(latency_s)
+    print(f"Latency histogram: {histogram.get_metrics()}")
+
+    for name, spec in GENERATOR_REGISTRY.items():
+        generator = ChatGenerator(name, spec, "torch", torch.device("cpu"), batching=False)
+        prompt = generator.build_prompt("I lost the game and I feel terrible.", "sad")
+        reply_ids = generator.generate(prompt, deadline=time.monotonic() + 0.5)
+        print(f"{name} (0.5 s budget, stopped by {generator.stop_reason(reply_ids)}): "
+              f"{generator.tokenizer.decode(reply_ids, skip_special_tokens=True)} | {generator.get_metrics()['latency']}")
@@ -0,0 +1,176 @@
+# emotional_ai_llm/embedding_cache.py
+
+# Content-addressed caches for per-turn model outputs (modality embeddings, NLP scores).
+# Clients resend the same camera frame or audio clip and users repeat short phrases, so
+# results are keyed by a hash of the normalized input rather than by request.
+
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Defaults (overridable through environment variables, see EmbeddingCache.from_env)
+DEFAULT_CACHE_MB = 32
+DEFAULT_CACHE_TTL_S = 0 # 0 = entries only leave the cache through LRU eviction
+
+# Caches kept by the FastAPI app, one per cached model
+CACHE_NAMES = ("text", "audio", "vision", "nlp")
+
+
+def normalize_text(text):
+    """Collapses whitespace so trivially different spellings of a phrase share a cache entry."""
+    return " ".join(str(text).split())
+
+
+def content_key(*parts):
+    """
+    Hashes inputs into a cache key.
+
+    Args:
+        *parts: str, bytes or np.array values. Arrays are hashed with their dtype and shape.
+
+    Returns:
+        str: Hex digest identifying the content.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            array = np.ascontiguousarray(part)
+            digest.update(f"{array.dtype.str}{array.shape}".encode())
+            digest.update(array.data)
+        elif isinstance(part, str):
+            digest.update(part.encode("utf-8"))
+        else:
+            digest.update(bytes(part))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _value_size(value):
+    """Approximate memory held by a cached value."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class EmbeddingCache:
+    def __init__(self, name, max_mb=DEFAULT_CACHE_MB, ttl_s=DEFAULT_CACHE_TTL_S):
+        """
+        Byte-budgeted LRU cache with an optional time-to-live.
+
+        Cached arrays are stored read-only and dicts are copied on the way in and out,
+        so callers can never modify an entry shared with other requests.
+
+        Args:
+            name (str): Name reported in logs and metrics.
+            max_mb (float): Memory budget of the cached values. 0 disables the cache.
+            ttl_s (float): Seconds an entry stays valid. 0 disables expiry.
+        """
+        self.name = name
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict() # key -> (value, size, stored_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evicted_lru": 0, "evicted_ttl": 0}
+        logging.info(f"EmbeddingCache '{name}' initialized: {max_mb} MB budget, TTL {ttl_s or 'none'}.")
+
+    @classmethod
+    def from_env(cls, name):
+        """Builds a cache configured from NOVA_EMBEDDING_CACHE_MB and NOVA_EMBEDDING_CACHE_TTL_S."""
+        return cls(
+            name,
+            max_mb=float(os.environ.get("NOVA_EMBEDDING_CACHE_MB", DEFAULT_CACHE_MB)),
+            ttl_s=float(os.environ.get("NOVA_EMBEDDING_CACHE_TTL_S", DEFAULT_CACHE_TTL_S)),
+        )
+
+    def _pop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """
+        Looks up a cached value.
+
+        Returns:
+            The cached value (a copy for dicts), or None on a miss or expired entry.
+        """
+        if key is None or self.max_bytes <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_s > 0 and time.monotonic() - entry[2] > self.ttl_s:
+                self._pop(key)
+                self._stats["evicted_ttl"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            value = entry[0]
+        return dict(value) if isinstance(value, dict) else value
+
+    def put(self, key, value):
+        """Stores a value, evicting least recently used entries to stay within the budget."""
+        if key is None or value is None or self.max_bytes <= 0:
+            return
+        if isinstance(value, np.ndarray):
+            value = np.array(value, copy=True)
+            value.setflags(write=False)
+        elif isinstance(value, dict):
+            value = dict(value)
+        size = _value_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self._stats["evicted_lru"] += 1
+
+    def get_metrics(self):
+        """
+        Returns entry counts, memory use, hit/miss counters and the hit rate.
+
+        Returns:
+            dict: Cache metrics.
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+if __name__ == "__main__":
+    print("Running EmbeddingCache module development example:")
+
+    cache = EmbeddingCache("demo", max_mb=1024 / (1024 * 1024), ttl_s=0.2) # 1 KB budget
+    first, second = np.ones(128, dtype=np.float32), np.zeros(128, dtype=np.float32) # 512 bytes each
+
+    cache.put(content_key(normalize_text("I feel  great ")), first)
+    print(f"Whitespace-normalized hit: {cache.get(content_key(normalize_text('I feel great'))) is not None}")
+    cache.put(content_key(second), second)
+    cache.put(content_key("third"), first) # Exceeds the budget: evicts the least recently used entry
+    print(f"After eviction: {cache.get_metrics()}")
+
+    time.sleep(0.3)
+    print(f"Expired entry returned: {cache.get(content_key('third')) is not None}")
+    print(f"After TTL: {cache.get_metrics()}")
+
+    print("\nEmbeddingCache module development example finished.")
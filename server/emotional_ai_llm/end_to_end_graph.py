@@ -0,0 +1,234 @@
+# emotional_ai_llm/end_to_end_graph.py
+
+import os
+
+import tensorflow as tf
+
+from .text_encoder import MAX_LEN, TEXT_LENGTH_BUCKETS
+from .audio_encoder import INPUT_SHAPE as INPUT_SHAPE_AUDIO, AUDIO_POOLING_MODES
+from .vision_encoder import INPUT_SHAPE as INPUT_SHAPE_VISION
+from .fusion_module import AUDIO_EMBEDDING_DIM, VISION_EMBEDDING_DIM
+
+# Output paths for the exported graph
+END_TO_END_SAVED_MODEL_DIR = "models/end_to_end_savedmodel"
+END_TO_END_TFLITE_PATH = "models/tflite/end_to_end.tflite"
+
+# Signature names, keyed by which optional modalities are present: (has_audio, has_vision)
+SIGNATURE_NAMES = {
+    (False, False): "text_only",
+    (False, True): "text_vision",
+    (True, False): "text_audio",
+    (True, True): "all_modalities",
+}
+
+# Audio arrives as (batch, windows, 128, 44, 1) mel windows with (batch, windows) pooling weights; 0 marks padding
+MEL_SPECTROGRAMS_SPEC = tf.TensorSpec(shape=[None, None, *INPUT_SHAPE_AUDIO], dtype=tf.float32, name="mel_spectrograms")
+AUDIO_WINDOW_WEIGHTS_SPEC = tf.TensorSpec(shape=[None, None], dtype=tf.float32, name="audio_window_weights")
+IMAGES_SPEC = tf.TensorSpec(shape=[None, *INPUT_SHAPE_VISION], dtype=tf.float32, name="images")
+
+
+def signature_for(has_audio, has_vision):
+    """Returns the signature name that matches the modalities present in a turn."""
+    return SIGNATURE_NAMES[(bool(has_audio), bool(has_vision))]
+
+
+class EndToEndGraph(tf.Module):
+    def __init__(self, text_extractor, audio_extractor, vision_extractor, fusion_model, text_only_fusion_model=None, audio_pooling="mean"):
+        """
+        Stitches the three embedding extractors and the fusion MLP into one graph.
+
+        One traced function per modality combination takes raw encoder inputs and returns the
+        emotion probabilities together with the per-modality embeddings (needed for conversation
+        memory). Absent modalities are replaced by zero embeddings inside the graph, so a turn is
+        a single graph call and TensorFlow can optimize across the encoder/fusion boundaries.
+        The `text_only` signature never touches the audio/vision encoders and, when given,
+        uses the text-only fusion variant that has the zero embeddings folded into its bias.
+
+        Every signature is also traced once per text length bucket (TEXT_LENGTH_BUCKETS), see
+        `get_function`. The exported signatures use the full MAX_LEN sequences.
+
+        Audio is given as fixed-size mel windows per clip. All valid windows of the batch are
+        encoded in one audio CNN call and pooled per clip into a single audio embedding.
+
+        Args:
+            text_extractor, audio_extractor, vision_extractor (tf.keras.Model): Embedding sub-models.
+            fusion_model (tf.keras.Model): The multimodal fusion MLP.
+            text_only_fusion_model (tf.keras.Model, optional): See `build_text_only_fusion_model`.
+            audio_pooling (str): How window embeddings are pooled, one of AUDIO_POOLING_MODES
+                                 ("mean" and "energy" are weighted means, "max" ignores weights).
+        """
+        super().__init__(name="nova_end_to_end")
+        self.text_extractor = text_extractor
+        self.audio_extractor = audio_extractor
+        self.vision_extractor = vision_extractor
+        self.fusion_model = fusion_model
+        self.text_only_fusion_model = text_only_fusion_model
+        if audio_pooling not in AUDIO_POOLING_MODES:
+            raise ValueError(f"Unknown audio pooling mode '{audio_pooling}'. Expected one of {AUDIO_POOLING_MODES}.")
+        self.audio_pooling = audio_pooling
+
+        # String keys only: tf.Module cannot checkpoint dicts with other key types
+        self.bucket_functions = {}
+        for bucket in TEXT_LENGTH_BUCKETS:
+            for signature_name, function in self._build_functions(bucket).items():
+                self.bucket_functions[f"{signature_name}_{bucket}"] = function
+
+        self.text_only = self.bucket_functions[f"text_only_{MAX_LEN}"]
+        self.text_vision = self.bucket_functions[f"text_vision_{MAX_LEN}"]
+        self.text_audio = self.bucket_functions[f"text_audio_{MAX_LEN}"]
+        self.all_modalities = self.bucket_functions[f"all_modalities_{MAX_LEN}"]
+
+    def _build_functions(self, sequence_length):
+        """Traces one function per signature for sequences padded to `sequence_length`."""
+        sequences_spec = tf.TensorSpec(shape=[None, sequence_length], dtype=tf.int32, name="sequences")
+        return {
+            "text_only": tf.function(
+                lambda sequences: self._forward(sequences),
+                input_signature=[sequences_spec],
+            ),
+            "text_vision": tf.function(
+                lambda sequences, images: self._forward(sequences, images=images),
+                input_signature=[sequences_spec, IMAGES_SPEC],
+            ),
+            "text_audio": tf.function(
+                lambda sequences, mel_spectrograms, audio_window_weights: self._forward(
+                    sequences, mel_spectrograms=mel_spectrograms, audio_window_weights=audio_window_weights),
+                input_signature=[sequences_spec, MEL_SPECTROGRAMS_SPEC, AUDIO_WINDOW_WEIGHTS_SPEC],
+            ),
+            "all_modalities": tf.function(
+                lambda sequences, mel_spectrograms, audio_window_weights, images: self._forward(
+                    sequences, mel_spectrograms, audio_window_weights, images),
+                input_signature=[sequences_spec, MEL_SPECTROGRAMS_SPEC, AUDIO_WINDOW_WEIGHTS_SPEC, IMAGES_SPEC],
+            ),
+        }
+
+    def pooled_audio_embedding(self, mel_spectrograms, audio_window_weights):
+        """
+        Encodes the valid mel windows of every clip in one audio CNN call and pools them per clip.
+
+        Args:
+            mel_spectrograms: (N, W, 128, 44, 1) mel windows.
+            audio_window_weights: (N, W) pooling weights; windows with weight 0 are skipped.
+
+        Returns:
+            tf.Tensor: (N, AUDIO_EMBEDDING_DIM) pooled audio embeddings.
+        """
+        batch_size = tf.shape(mel_spectrograms)[0]
+        num_windows = tf.shape(mel_spectrograms)[1]
+        flat_windows = tf.reshape(mel_spectrograms, [-1, *INPUT_SHAPE_AUDIO])
+        valid_indices = tf.where(tf.reshape(audio_window_weights, [-1]) > 0)
+        window_embeddings = self.audio_extractor(tf.gather_nd(flat_windows, valid_indices), training=False)
+        scatter_shape = tf.cast(tf.stack([batch_size * num_windows, AUDIO_EMBEDDING_DIM]), tf.int64)
+        window_embeddings = tf.reshape(
+            tf.scatter_nd(valid_indices, window_embeddings, scatter_shape),
+            [batch_size, num_windows, AUDIO_EMBEDDING_DIM],
+        )
+
+        if self.audio_pooling == "max":
+            valid = (audio_window_weights > 0)[..., tf.newaxis]
+            pooled = tf.reduce_max(tf.where(valid, window_embeddings, tf.float32.min), axis=1)
+            return tf.where(tf.reduce_any(valid, axis=1), pooled, tf.zeros_like(pooled))
+        weighted_sum = tf.reduce_sum(window_embeddings * audio_window_weights[..., tf.newaxis], axis=1)
+        total_weight = tf.reduce_sum(audio_window_weights, axis=1, keepdims=True)
+        return weighted_sum / tf.maximum(total_weight, 1e-12)
+
+    def _forward(self, sequences, mel_spectrograms=None, audio_window_weights=None, images=None):
+        batch_size = tf.shape(sequences)[0]
+        text_embedding = self.text_extractor(sequences, training=False)
+        if mel_spectrograms is not None:
+            audio_embedding = self.pooled_audio_embedding(mel_spectrograms, audio_window_weights)
+        else:
+            audio_embedding = tf.zeros([batch_size, AUDIO_EMBEDDING_DIM], dtype=tf.float32)
+        if images is not None:
+            vision_embedding = self.vision_extractor(images, training=False)
+        else:
+            vision_embedding = tf.zeros([batch_size, VISION_EMBEDDING_DIM], dtype=tf.float32)
+
+        if mel_spectrograms is None and images is None and self.text_only_fusion_model is not None:
+            emotion_probabilities = self.text_only_fusion_model(text_embedding, training=False)
+        else:
+            emotion_probabilities = self.fusion_model({
+                "text_embedding_input": text_embedding,
+                "audio_embedding_input": audio_embedding,
+                "vision_embedding_input": vision_embedding,
+            }, training=False)
+        return {
+            "emotion_probabilities": emotion_probabilities,
+            "text_embedding": text_embedding,
+            "audio_embedding": audio_embedding,
+            "vision_embedding": vision_embedding,
+        }
+
+    def get_function(self, signature_name, sequence_length=MAX_LEN):
+        """Returns the traced function for a signature name (see SIGNATURE_NAMES) and length bucket."""
+        return self.bucket_functions[f"{signature_name}_{sequence_length}"]
+
+    def concrete_signatures(self):
+        """Full-length concrete functions keyed by signature name, as expected by tf.saved_model.save."""
+        return {name: self.get_function(name).get_concrete_function() for name in SIGNATURE_NAMES.values()}
+
+
+def export_end_to_end_graph(graph, saved_model_dir=END_TO_END_SAVED_MODEL_DIR, tflite_path=END_TO_END_TFLITE_PATH):
+    """
+    Exports the end-to-end graph as a SavedModel (and optionally TFLite) with one
+    signature per modality combination.
+
+    Args:
+        graph (EndToEndGraph): The graph to export.
+        saved_model_dir (str): Output directory for the SavedModel.
+        tflite_path (str, optional): Output path for the TFLite flatbuffer. None skips TFLite.
+
+    Returns:
+        bool: True if every requested export succeeded.
+    """
+    try:
+        tf.saved_model.save(graph, saved_model_dir, signatures=graph.concrete_signatures())
+        print(f"End-to-end SavedModel exported to '{saved_model_dir}' with signatures {list(SIGNATURE_NAMES.values())}")
+    except Exception as e:
+        print(f"Error exporting end-to-end SavedModel: {e}")
+        return False
+
+    if tflite_path:
+        try:
+            converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir, signature_keys=list(SIGNATURE_NAMES.values()))
+            tflite_model = converter.convert()
+            os.makedirs(os.path.dirname(tflite_path), exist_ok=True)
+            with open(tflite_path, 'wb') as f:
+                f.write(tflite_model)
+            print(f"End-to-end TFLite model exported to '{tflite_path}'")
+        except Exception as e:
+            print(f"Error exporting end-to-end TFLite model: {e}")
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    import numpy as np
+    from emotional_ai_llm.main import load_all_models
+    from emotional_ai_llm.audio_encoder import pool_window_embeddings
+
+    print("Running end-to-end graph export:")
+
+    _, _, _, _, session = load_all_models(run_self_check=False)
+    if export_end_to_end_graph(session.end_to_end):
+        # Parity check: the exported signatures must match the chained per-model calls
+        reloaded = tf.saved_model.load(END_TO_END_SAVED_MODEL_DIR)
+        sequences = np.random.randint(0, 100, size=(2, MAX_LEN)).astype(np.int32)
+        mel_spectrograms = np.random.rand(2, 3, *INPUT_SHAPE_AUDIO).astype(np.float32)
+        audio_window_weights = np.array([[1, 1, 1], [1, 0, 0]], dtype=np.float32)
+        images = np.random.rand(2, *INPUT_SHAPE_VISION).astype(np.float32)
+
+        exported = reloaded.signatures["all_modalities"](
+            sequences=sequences, mel_spectrograms=mel_spectrograms,
+            audio_window_weights=audio_window_weights, images=images,
+        )
+        chained = session.fuse({
+            "text_embedding_input": session.text_embeddings(sequences),
+            "audio_embedding_input": np.stack([
+                pool_window_embeddings(session.audio_embeddings(windows), weights, session.audio_pooling)
+                for windows, weights in zip(mel_spectrograms, audio_window_weights)
+            ]),
+            "vision_embedding_input": session.vision_embeddings(images),
+        })
+        diff = np.max(np.abs(exported["emotion_probabilities"].numpy() - chained))
+        print(f"Max |diff| between exported graph and chained models: {diff:.2e}")
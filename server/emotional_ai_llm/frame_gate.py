@@ -0,0 +1,146 @@
+# emotional_ai_llm/frame_gate.py
+
+# Per-session change detection for camera frames. When the (face-cropped) frame of a turn
+# looks like the one the session's last vision embedding was computed from, that embedding
+# is reused and the vision encoder is skipped. Kept free of TensorFlow imports.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Defaults (overridable through environment variables, see FrameChangeGate.from_env)
+DEFAULT_MAX_HASH_DISTANCE = 6 # Differing bits (out of 64) of the difference hash
+DEFAULT_MAX_MEAN_DIFF = 0.04 # Mean absolute difference of the 16x16 grayscale thumbnails, in [0, 1]
+DEFAULT_GATE_TTL_S = 300
+DEFAULT_MAX_GATED_SESSIONS = 10000
+
+THUMBNAIL_SIZE = 16
+
+
+def frame_signature(image):
+    """
+    Cheap fingerprint of a preprocessed frame.
+
+    Args:
+        image (np.array): float32 RGB image in [0, 1], as produced by `decode_image_bytes`.
+
+    Returns:
+        tuple: (64-bit difference hash as int, (16, 16) float32 grayscale thumbnail).
+    """
+    gray = cv2.cvtColor(np.asarray(image, dtype=np.float32), cv2.COLOR_RGB2GRAY)
+    # dHash: sign of horizontal gradients on a 9x8 thumbnail, robust to exposure and noise
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).reshape(-1)
+    dhash = int(np.packbits(bits).view(">u8")[0])
+    thumbnail = cv2.resize(gray, (THUMBNAIL_SIZE, THUMBNAIL_SIZE), interpolation=cv2.INTER_AREA)
+    return dhash, thumbnail
+
+
+class FrameChangeGate:
+    def __init__(self, max_hash_distance=DEFAULT_MAX_HASH_DISTANCE, max_mean_diff=DEFAULT_MAX_MEAN_DIFF,
+                 ttl_s=DEFAULT_GATE_TTL_S, max_sessions=DEFAULT_MAX_GATED_SESSIONS):
+        """
+        Remembers, per session, the signature of the frame the last vision embedding was
+        computed from, together with that embedding.
+
+        A new frame counts as unchanged when its difference hash is within
+        `max_hash_distance` bits AND its thumbnail differs by at most `max_mean_diff` on
+        average. The reference frame is only replaced when the encoder actually runs, so
+        slow drift over many turns still triggers a recomputation.
+
+        Args:
+            max_hash_distance (int): Maximum Hamming distance between difference hashes.
+            max_mean_diff (float): Maximum mean absolute thumbnail difference. Negative disables the gate.
+            ttl_s (float): Seconds after which a session's reference frame is forgotten.
+            max_sessions (int): Maximum number of sessions tracked (least recently updated evicted first).
+        """
+        self.max_hash_distance = max_hash_distance
+        self.max_mean_diff = max_mean_diff
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self._references = OrderedDict() # session_id -> (dhash, thumbnail, embedding, updated_at)
+        self._lock = threading.Lock()
+        self._stats = {"checked": 0, "skipped_inferences": 0, "changed": 0, "expired": 0}
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds a gate configured from NOVA_FRAME_HASH_DISTANCE, NOVA_FRAME_MEAN_DIFF,
+        NOVA_FRAME_GATE_TTL_S and NOVA_MAX_GATED_SESSIONS.
+        """
+        return cls(
+            max_hash_distance=int(os.environ.get("NOVA_FRAME_HASH_DISTANCE", DEFAULT_MAX_HASH_DISTANCE)),
+            max_mean_diff=float(os.environ.get("NOVA_FRAME_MEAN_DIFF", DEFAULT_MAX_MEAN_DIFF)),
+            ttl_s=float(os.environ.get("NOVA_FRAME_GATE_TTL_S", DEFAULT_GATE_TTL_S)),
+            max_sessions=int(os.environ.get("NOVA_MAX_GATED_SESSIONS", DEFAULT_MAX_GATED_SESSIONS)),
+        )
+
+    def reuse(self, session_id, signature):
+        """
+        Returns the session's previous vision embedding if `signature` matches its reference frame.
+
+        Args:
+            session_id (str or None): Chat session; requests without one are never gated.
+            signature (tuple): Output of `frame_signature` for the new frame.
+
+        Returns:
+            np.array or None: The embedding to reuse, or None if the encoder must run.
+        """
+        if not session_id or self.max_mean_diff < 0:
+            return None
+        dhash, thumbnail = signature
+        with self._lock:
+            self._stats["checked"] += 1
+            reference = self._references.get(session_id)
+            if reference is None:
+                return None
+            ref_hash, ref_thumbnail, embedding, updated_at = reference
+            if time.monotonic() - updated_at > self.ttl_s:
+                del self._references[session_id]
+                self._stats["expired"] += 1
+                return None
+            if bin(dhash ^ ref_hash).count("1") > self.max_hash_distance or \
+                    float(np.mean(np.abs(thumbnail - ref_thumbnail))) > self.max_mean_diff:
+                self._stats["changed"] += 1
+                return None
+            self._stats["skipped_inferences"] += 1
+            return embedding
+
+    def update(self, session_id, signature, embedding):
+        """Makes a frame (and the embedding computed from it) the session's new reference."""
+        if not session_id:
+            return
+        dhash, thumbnail = signature
+        with self._lock:
+            self._references.pop(session_id, None)
+            self._references[session_id] = (dhash, thumbnail, np.asarray(embedding, dtype=np.float32), time.monotonic())
+            while len(self._references) > self.max_sessions:
+                self._references.popitem(last=False)
+
+    def drop_session(self, session_id):
+        with self._lock:
+            self._references.pop(session_id, None)
+
+    def get_metrics(self):
+        with self._lock:
+            return {"tracked_sessions": len(self._references), **self._stats}
+
+
+if __name__ == "__main__":
+    print("Running FrameChangeGate module development example:")
+
+    rng = np.random.default_rng(0)
+    rows, cols = np.mgrid[0:128, 0:128] / 128.0
+    frame = np.stack([np.sin(3 * rows) ** 2, np.cos(5 * cols) ** 2, rows * cols], axis=-1).astype(np.float32)
+    gate = FrameChangeGate()
+    gate.update("alice", frame_signature(frame), np.ones(128, dtype=np.float32))
+
+    noisy = np.clip(frame + rng.normal(0, 0.01, frame.shape).astype(np.float32), 0, 1)
+    print(f"Sensor noise reuses the embedding: {gate.reuse('alice', frame_signature(noisy)) is not None}")
+    moved = np.roll(frame, 32, axis=1)
+    print(f"Shifted frame reuses the embedding: {gate.reuse('alice', frame_signature(moved)) is not None}")
+    print(f"Metrics: {gate.get_metrics()}")
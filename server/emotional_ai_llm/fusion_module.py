@@ -39,6 +39,51 @@ def build_fusion_model(num_emotion_labels):
     model.summary()
     return model
 
+def build_text_only_fusion_model(fusion_model, audio_embedding=None, vision_embedding=None):
+    """
+    Builds a text-only variant of a trained fusion model for turns without audio or vision.
+
+    The absent modalities are constants, so their contribution to the first Dense layer
+    (`audio @ W_audio + vision @ W_vision`) is folded into that layer's bias and only the
+    text rows of its kernel are kept. The remaining layers are copied unchanged (Dropout is
+    inference-time identity and is dropped), so the output matches the full model fed with
+    the same constant embeddings.
+
+    Args:
+        fusion_model (tf.keras.Model): Trained model from `build_fusion_model`.
+        audio_embedding (np.array, optional): Constant audio embedding. Defaults to zeros.
+        vision_embedding (np.array, optional): Constant vision embedding. Defaults to zeros.
+
+    Returns:
+        tf.keras.Model: Model taking only `text_embedding_input`.
+    """
+    if audio_embedding is None:
+        audio_embedding = np.zeros(AUDIO_EMBEDDING_DIM, dtype=np.float32)
+    if vision_embedding is None:
+        vision_embedding = np.zeros(VISION_EMBEDDING_DIM, dtype=np.float32)
+
+    dense_layers = [layer for layer in fusion_model.layers if isinstance(layer, layers.Dense)]
+    first_dense, remaining_dense = dense_layers[0], dense_layers[1:]
+
+    kernel, bias = first_dense.get_weights()
+    text_kernel = kernel[:TEXT_EMBEDDING_DIM]
+    audio_kernel = kernel[TEXT_EMBEDDING_DIM:TEXT_EMBEDDING_DIM + AUDIO_EMBEDDING_DIM]
+    vision_kernel = kernel[TEXT_EMBEDDING_DIM + AUDIO_EMBEDDING_DIM:]
+    folded_bias = bias + np.asarray(audio_embedding, dtype=np.float32) @ audio_kernel + np.asarray(vision_embedding, dtype=np.float32) @ vision_kernel
+
+    text_input = layers.Input(shape=(TEXT_EMBEDDING_DIM,), name="text_embedding_input")
+    folded_dense = layers.Dense(first_dense.units, activation=first_dense.activation, name="text_only_dense")
+    x = folded_dense(text_input)
+    folded_dense.set_weights([text_kernel, folded_bias.astype(np.float32)])
+    for dense in remaining_dense:
+        copied_dense = layers.Dense(dense.units, activation=dense.activation, name=dense.name)
+        x = copied_dense(x)
+        copied_dense.set_weights(dense.get_weights())
+
+    model = Model(inputs=text_input, outputs=x, name="text_only_fusion_model")
+    print("Text-only fusion model built (absent modalities folded into the first Dense bias).")
+    return model
+
 def train_fusion_model(model, train_embeddings, train_labels, val_embeddings, val_labels, output_dir="models/fusion_mlp_model"):
     """
     Trains the multimodal fusion model.
@@ -0,0 +1,166 @@
+# emotional_ai_llm/generation_backends.py
+
+# Runtimes the Chat SLM can be loaded on. All backends return an object with the
+# transformers generation interface (generate(), get_encoder(), forward with
+# past_key_values), so ResponsePlanner and the GenerationScheduler are backend-agnostic.
+#
+#   torch - the fp32 (or CUDA) transformers model
+#   int8  - torch dynamic quantization: Linear weights stored as int8, activations
+#           quantized on the fly (CPU only)
+#   onnx  - encoder, decoder and decoder-with-past graphs exported to ONNX and run by
+#           ONNX Runtime (CPU only, needs `optimum[onnxruntime]`)
+
+import logging
+import os
+import time
+
+import torch
+
+from .model_registry import load_pretrained
+
+# Backend selection (overridable through environment variables, see backend_from_env)
+DEFAULT_GENERATION_BACKEND = "torch"
+GENERATION_BACKENDS = ("torch", "int8", "onnx")
+
+# ONNX exports are cached here, one directory per model
+DEFAULT_ONNX_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'models', 'onnx'))
+
+
+def backend_from_env():
+    """Reads the generation backend from NOVA_GENERATION_BACKEND."""
+    backend = os.environ.get("NOVA_GENERATION_BACKEND", DEFAULT_GENERATION_BACKEND).lower()
+    if backend not in GENERATION_BACKENDS:
+        raise ValueError(f"Unknown NOVA_GENERATION_BACKEND '{backend}', expected one of {GENERATION_BACKENDS}.")
+    return backend
+
+
+def onnx_export_dir(model_name, onnx_dir=DEFAULT_ONNX_DIR):
+    """Directory holding the ONNX export of a Hub model name or local checkpoint path."""
+    return os.path.join(onnx_dir, os.path.basename(os.path.normpath(model_name)))
+
+
+def quantize_dynamic_int8(model):
+    """Returns a CPU copy of `model` whose nn.Linear layers use dynamic int8 quantization."""
+    return torch.quantization.quantize_dynamic(model.to("cpu").eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _load_onnx(model_name, onnx_dir):
+    # Optional dependency: only needed for the onnx backend
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    export_dir = onnx_export_dir(model_name, onnx_dir)
+    if os.path.isdir(export_dir) and any(name.endswith(".onnx") for name in os.listdir(export_dir)):
+        return ORTModelForSeq2SeqLM.from_pretrained(export_dir, use_cache=True)
+
+    logging.info(f"Exporting {model_name} to ONNX (encoder, decoder, decoder with past) in {export_dir}...")
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, use_cache=True)
+    model.save_pretrained(export_dir)
+    return model
+
+
+def load_generation_model(model_name, model_class, backend=DEFAULT_GENERATION_BACKEND, device=None,
+                          onnx_dir=DEFAULT_ONNX_DIR):
+    """
+    Loads a seq2seq chat model on the requested backend.
+
+    The int8 and onnx backends run on CPU only. If the onnx backend cannot be loaded
+    (e.g. optimum is not installed), the torch model is used instead and an error is logged.
+
+    Args:
+        model_name (str): Hub model name or local checkpoint path.
+        model_class: transformers class used for the torch and int8 backends
+                     (e.g. BlenderbotForConditionalGeneration).
+        backend (str): One of GENERATION_BACKENDS.
+        device (torch.device, optional): Device for the torch backend. Defaults to CUDA if available.
+        onnx_dir (str): Where ONNX exports are cached.
+
+    Returns:
+        tuple: (model, backend actually loaded, torch.device the model's inputs must live on)
+    """
+    if backend not in GENERATION_BACKENDS:
+        raise ValueError(f"Unknown generation backend '{backend}', expected one of {GENERATION_BACKENDS}.")
+    device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    cpu = torch.device("cpu")
+
+    if backend == "onnx":
+        try:
+            return _load_onnx(model_name, onnx_dir), "onnx", cpu
+        except Exception as e:
+            logging.error(f"Failed to load ONNX Runtime backend for {model_name}, falling back to torch: {e}")
+            backend = "torch"
+
+    model = load_pretrained(model_class, model_name).eval()
+    if backend == "int8":
+        return quantize_dynamic_int8(model), "int8", cpu
+    return model.to(device), "torch", device
+
+
+def greedy_reply_ids(model, tokenizer, prompts, device, max_length=64):
+    """Deterministic replies used to compare backends: greedy decoding, no beam search."""
+    replies = []
+    for prompt in prompts:
+        inputs = tokenizer([prompt], return_tensors="pt").to(device)
+        output = model.generate(**inputs, max_length=max_length, do_sample=False, num_beams=1)
+        replies.append(output[0].tolist())
+    return replies
+
+
+def reply_parity(reference_ids, candidate_ids):
+    """
+    Compares greedy replies of a backend with those of the fp32 reference.
+
+    Returns:
+        dict: exact_match (fraction of identical replies) and prefix_agreement (mean
+              fraction of the reference reply reproduced before the first differing token).
+    """
+    exact, prefix = 0, 0.0
+    for reference, candidate in zip(reference_ids, candidate_ids):
+        exact += reference == candidate
+        common = 0
+        for ref_token, cand_token in zip(reference, candidate):
+            if ref_token != cand_token:
+                break
+            common += 1
+        prefix += common / max(len(reference), 1)
+    count = max(len(reference_ids), 1)
+    return {"exact_match": round(exact / count, 3), "prefix_agreement": round(prefix / count, 3)}
+
+
+def benchmark_tokens_per_second(model, tokenizer, prompts, device, max_length=64, repeats=2):
+    """Tokens generated per second by greedy decoding of `prompts` (after one warm-up reply)."""
+    greedy_reply_ids(model, tokenizer, prompts[:1], device, max_length)
+    started = time.perf_counter()
+    tokens = 0
+    for _ in range(repeats):
+        tokens += sum(len(reply) - 1 for reply in greedy_reply_ids(model, tokenizer, prompts, device, max_length))
+    return tokens / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    from transformers import BlenderbotTokenizer, BlenderbotForConditionalGeneration
+
+    print("Running generation backend parity and throughput check:")
+
+    model_name = "facebook/blenderbot-400M-distill"
+    tokenizer = BlenderbotTokenizer.from_pretrained(model_name)
+    prompts = [
+        "I feel sad. I lost the game and I feel terrible.",
+        "I feel happy. My sister is visiting this weekend.",
+        "I can't sleep before my exam tomorrow.",
+        "I feel anger. My roommate ate my lunch again.",
+    ]
+
+    reference_ids = None
+    for backend in GENERATION_BACKENDS:
+        model, loaded, device = load_generation_model(model_name, BlenderbotForConditionalGeneration, backend, torch.device("cpu"))
+        if loaded != backend:
+            print(f"{backend:>5}: not available, skipped")
+            continue
+        reply_ids = greedy_reply_ids(model, tokenizer, prompts, device)
+        if reference_ids is None:
+            reference_ids = reply_ids
+        parity = reply_parity(reference_ids, reply_ids)
+        tokens_per_s = benchmark_tokens_per_second(model, tokenizer, prompts, device)
+        print(f"{backend:>5}: {tokens_per_s:6.1f} tokens/s | parity vs torch fp32: {parity}")
+        print(f"       \"{tokenizer.decode(reply_ids[0], skip_special_tokens=True)}\"")
+        del model
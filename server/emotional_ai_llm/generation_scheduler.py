@@ -0,0 +1,673 @@
+# emotional_ai_llm/generation_scheduler.py
+
+# Continuous batching for the Chat SLM (BlenderBot). Prompts of concurrent chats are decoded
+# together by one background thread that steps the encoder-decoder token by token, merging
+# new prompts into the running batch and evicting finished replies between steps instead of
+# running one `model.generate` call per chat.
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+
+import torch
+from transformers.modeling_outputs import BaseModelOutput
+
+from .inference_executor import InferenceQueueFullError
+
+# Defaults (overridable through environment variables, see GenerationScheduler.from_env)
+DEFAULT_MAX_ACTIVE_SEQUENCES = 8
+DEFAULT_MAX_ACTIVE_PER_SESSION = 1
+DEFAULT_MAX_PENDING = 64
+DEFAULT_MAX_LENGTH_CAP = 128
+
+# Weight of the newest decode step in the moving average used for deadline checks
+STEP_TIME_SMOOTHING = 0.2
+
+# Sampling parameters of a reply unless the caller overrides them
+DEFAULT_GENERATION_PARAMS = {"max_length": 128, "do_sample": True, "top_p": 0.9, "temperature": 0.8}
+
+
+class GenerationRequest:
+    def __init__(self, prompt, session_id=None, max_length=128, do_sample=True, top_p=0.9, temperature=0.8,
+                 streamer=None, deadline=None):
+        """
+        One prompt waiting for (or being decoded by) the GenerationScheduler.
+
+        `future` resolves to the generated token ids (without the decoder start token).
+        Cancelling it evicts the sequence at the next decode step. With a `deadline`
+        (time.monotonic()), decoding stops early once the next step would overrun it.
+        """
+        self.prompt = prompt
+        self.session_id = session_id
+        self.max_length = max_length
+        self.do_sample = do_sample
+        self.top_p = top_p
+        self.temperature = temperature
+        self.streamer = streamer
+        self.deadline = deadline
+        self.future = Future()
+        self.tokens = []
+        self.submitted_at = time.monotonic()
+        self.done = False # Resolved (or failed) and released by the scheduler
+
+
+class _Batch:
+    def __init__(self, requests, encoder_hidden_states, attention_mask, decoder_input_ids, past_key_values,
+                 decoder_mask, positions):
+        """
+        The sequences being decoded, one row each. Rows admitted at different steps have
+        different decoder lengths: their self-attention key/value caches are left-padded to a
+        common length (masked out by `decoder_mask`) and `positions` holds each row's own
+        decoder position, so one forward call advances all of them.
+        """
+        self.requests = requests
+        self.encoder_hidden_states = encoder_hidden_states
+        self.attention_mask = attention_mask
+        self.decoder_input_ids = decoder_input_ids
+        self.past_key_values = past_key_values
+        self.decoder_mask = decoder_mask # (batch, cached decoder length), 0 = padding
+        self.positions = positions # (batch,) decoder position of each row's next input token
+
+
+def _pad(tensor, length, dim, left=False):
+    """Zero-pads `tensor` along `dim` to `length` (on the left or the right)."""
+    missing = length - tensor.shape[dim]
+    if missing <= 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = missing
+    padding = tensor.new_zeros(shape)
+    return torch.cat([padding, tensor] if left else [tensor, padding], dim=dim)
+
+
+def _cache_layers(past_key_values):
+    """Per-layer (self key, self value, cross key, cross value) tuples of a cache, and its Cache class (None for legacy tuples)."""
+    if hasattr(past_key_values, "to_legacy_cache"):
+        return past_key_values.to_legacy_cache(), type(past_key_values)
+    return past_key_values, None
+
+
+def _rebuild_cache(layers, cache_class):
+    return cache_class.from_legacy_cache(tuple(layers)) if cache_class is not None else tuple(layers)
+
+
+def _select_cache_rows(past_key_values, rows):
+    """Keeps the batch rows `rows` of a key/value cache (Cache object or legacy tuples)."""
+    if hasattr(past_key_values, "batch_select_indices"):
+        past_key_values.batch_select_indices(rows)
+        return past_key_values
+    return tuple(tuple(state.index_select(0, rows) for state in layer) for layer in past_key_values)
+
+
+def _merge_caches(running, added):
+    """
+    Concatenates the key/value caches of two batches: self-attention states are left-padded
+    to the longer decoder length, cross-attention states right-padded to the longer prompt.
+    """
+    running_layers, cache_class = _cache_layers(running)
+    added_layers, _ = _cache_layers(added)
+    merged = []
+    for running_layer, added_layer in zip(running_layers, added_layers):
+        layer = []
+        for index, (running_state, added_state) in enumerate(zip(running_layer, added_layer)):
+            left = index < 2 # Self-attention key/value
+            length = max(running_state.shape[2], added_state.shape[2])
+            layer.append(torch.cat([_pad(running_state, length, 2, left), _pad(added_state, length, 2, left)]))
+        merged.append(tuple(layer))
+    return _rebuild_cache(merged, cache_class)
+
+
+def _trim_cache(past_key_values, start):
+    """Drops the first `start` self-attention positions (padding no remaining row attends to)."""
+    layers, cache_class = _cache_layers(past_key_values)
+    return _rebuild_cache([(key[:, :, start:], value[:, :, start:], *cross) for key, value, *cross in layers], cache_class)
+
+
+def _banned_ngram_tokens(sequence, ngram_size):
+    """Tokens that would repeat an n-gram of `sequence` (no_repeat_ngram_size)."""
+    if ngram_size <= 0 or len(sequence) < ngram_size:
+        return []
+    prefix = sequence[len(sequence) - ngram_size + 1:]
+    return [
+        sequence[i + ngram_size - 1]
+        for i in range(len(sequence) - ngram_size + 1)
+        if sequence[i:i + ngram_size - 1] == prefix
+    ]
+
+
+class GenerationScheduler:
+    def __init__(self, model, tokenizer, device, max_active_sequences=DEFAULT_MAX_ACTIVE_SEQUENCES,
+                 max_active_per_session=DEFAULT_MAX_ACTIVE_PER_SESSION, max_pending=DEFAULT_MAX_PENDING,
+                 max_length_cap=DEFAULT_MAX_LENGTH_CAP):
+        """
+        Decodes the prompts of concurrent chats together (continuous batching).
+
+        Between decode steps, finished sequences are evicted and pending prompts are admitted:
+        the prompts admitted in one step are encoded and decode their first token together
+        (prefill), then join the running batch. Every step is one forward call that advances
+        all active sequences by one token, so a new chat starts decoding after at most one
+        step instead of waiting for the replies ahead of it, and throughput grows with the
+        number of concurrent chats.
+
+        Rows joining mid-reply need their own decoder positions: with learned absolute
+        position embeddings (BlenderBot, BART) these are substituted through a forward hook on
+        the decoder's `embed_positions`; relative position biases (T5) only need the padding
+        mask. Models that are not torch modules (the ONNX Runtime backend) cannot take per-row
+        positions, so new prompts wait until the running batch has drained.
+
+        Fairness: at most `max_active_sequences` sequences are decoded at once, one session
+        holds at most `max_active_per_session` of them (further prompts of that session wait
+        while other sessions are admitted in arrival order), and no reply may exceed
+        `max_length_cap` tokens whatever the request asks for.
+
+        Args:
+            model: BlenderbotForConditionalGeneration (any encoder-decoder LM works).
+            tokenizer: Matching tokenizer.
+            device (torch.device): Device the model lives on.
+            max_active_sequences (int): Sequences decoded concurrently across all sessions.
+            max_active_per_session (int): Sequences one session may have in flight.
+            max_pending (int): Prompts allowed to wait for admission. Further submissions raise
+                               InferenceQueueFullError.
+            max_length_cap (int): Upper bound on a request's `max_length`.
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.max_active_sequences = max(1, max_active_sequences)
+        self.max_active_per_session = max(1, max_active_per_session)
+        self.max_pending = max_pending
+        self.max_length_cap = max_length_cap
+
+        config = model.config
+        generation_config = getattr(model, "generation_config", config)
+        self.decoder_start_token_id = config.decoder_start_token_id
+        self.eos_token_id = config.eos_token_id
+        self.min_length = getattr(generation_config, "min_length", 0) or 0
+        self.no_repeat_ngram_size = getattr(generation_config, "no_repeat_ngram_size", 0) or 0
+
+        self._pending = deque()
+        self._batch = None
+        self._active_per_session = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "cancelled": 0,
+            "failed": 0,
+            "rejected": 0,
+            "deadline_stops": 0,
+            "decode_steps": 0,
+            "forward_calls": 0,
+            "generated_tokens": 0,
+            "max_active": 0,
+            "total_queue_wait_s": 0.0,
+            "total_decode_s": 0.0,
+        }
+        self._step_s = 0.0
+        self._row_positions = None # Per-row decoder positions of the forward call in progress
+        self._merge_supported = isinstance(model, torch.nn.Module)
+        if self._merge_supported:
+            decoder = model.get_decoder() if hasattr(model, "get_decoder") else None
+            embed_positions = getattr(decoder, "embed_positions", None)
+            if isinstance(embed_positions, torch.nn.Embedding):
+                embed_positions.register_forward_hook(self._per_row_positions)
+        self._thread = threading.Thread(target=self._run, name="nova-generation", daemon=True)
+        self._thread.start()
+        logging.info(
+            f"GenerationScheduler initialized (max {self.max_active_sequences} active sequence(s), "
+            f"{self.max_active_per_session} per session, max {max_pending} pending)."
+        )
+
+    @classmethod
+    def from_env(cls, model, tokenizer, device):
+        """
+        Builds a scheduler configured from NOVA_GENERATION_MAX_ACTIVE, NOVA_GENERATION_MAX_PER_SESSION,
+        NOVA_GENERATION_MAX_PENDING and NOVA_GENERATION_MAX_LENGTH.
+        """
+        return cls(
+            model, tokenizer, device,
+            max_active_sequences=int(os.environ.get("NOVA_GENERATION_MAX_ACTIVE", DEFAULT_MAX_ACTIVE_SEQUENCES)),
+            max_active_per_session=int(os.environ.get("NOVA_GENERATION_MAX_PER_SESSION", DEFAULT_MAX_ACTIVE_PER_SESSION)),
+            max_pending=int(os.environ.get("NOVA_GENERATION_MAX_PENDING", DEFAULT_MAX_PENDING)),
+            max_length_cap=int(os.environ.get("NOVA_GENERATION_MAX_LENGTH", DEFAULT_MAX_LENGTH_CAP)),
+        )
+
+    def submit(self, prompt, session_id=None, streamer=None, deadline=None, **params):
+        """
+        Queues a prompt for generation.
+
+        Args:
+            prompt (str): Chat SLM input.
+            session_id (str, optional): Chat session, used for the per-session fairness cap.
+            streamer (optional): transformers streamer (e.g. AsyncTextIteratorStreamer) that
+                                 receives the tokens as they are decoded.
+            deadline (float, optional): time.monotonic() by which the reply must be finished.
+                                        Decoding stops before the step that would overrun it,
+                                        so the reply may end without EOS (or be empty).
+            **params: max_length, do_sample, top_p, temperature (see DEFAULT_GENERATION_PARAMS).
+
+        Returns:
+            concurrent.futures.Future: Resolves to the list of generated token ids.
+        """
+        request = GenerationRequest(prompt, session_id=session_id, streamer=streamer, deadline=deadline,
+                                    **{**DEFAULT_GENERATION_PARAMS, **params})
+        request.max_length = min(request.max_length, self.max_length_cap)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("GenerationScheduler is closed.")
+            if len(self._pending) >= self.max_pending:
+                self._stats["rejected"] += 1
+                raise InferenceQueueFullError(
+                    f"Generation queue is full ({self.max_pending} prompts waiting)."
+                )
+            self._pending.append(request)
+            self._stats["submitted"] += 1
+            self._condition.notify()
+        return request.future
+
+    def generate(self, prompt, session_id=None, deadline=None, **params):
+        """Blocking variant of `submit`: returns the generated token ids."""
+        return self.submit(prompt, session_id=session_id, deadline=deadline, **params).result()
+
+    def seconds_per_step(self):
+        """Moving average of one decode step (one token for every active sequence); 0 before the first."""
+        return self._step_s
+
+    def close(self):
+        """Stops the decode thread; prompts still pending or in flight are failed."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    # --- Decode loop (scheduler thread) ---
+
+    def _active_count(self):
+        batch = self._batch
+        return len(batch.requests) if batch is not None else 0
+
+    def _take_admissible(self):
+        """Pops pending prompts (oldest first) that fit the global and per-session caps."""
+        if self._batch is not None and not self._merge_supported:
+            return []
+        capacity = self.max_active_sequences - self._active_count()
+        admitted, deferred = [], deque()
+        while self._pending and len(admitted) < capacity:
+            request = self._pending.popleft()
+            if request.future.cancelled():
+                self._stats["cancelled"] += 1
+                request.done = True
+                self._end_streamer(request)
+                continue
+            if request.deadline is not None and time.monotonic() >= request.deadline:
+                # Expired while waiting: answer with an empty reply rather than start decoding
+                self._stats["deadline_stops"] += 1
+                self._stats["completed"] += 1
+                request.done = True
+                self._end_streamer(request)
+                self._resolve(request, result=[])
+                continue
+            if request.session_id is not None and \
+                    self._active_per_session.get(request.session_id, 0) >= self.max_active_per_session:
+                deferred.append(request)
+                continue
+            if request.session_id is not None:
+                self._active_per_session[request.session_id] = self._active_per_session.get(request.session_id, 0) + 1
+            admitted.append(request)
+        deferred.extend(self._pending)
+        self._pending = deferred
+        return admitted
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and self._batch is None and not self._pending:
+                    self._condition.wait()
+                if self._closed:
+                    break
+                admitted = self._take_admissible()
+                if not admitted and self._batch is None:
+                    # Everything pending belongs to sessions at their cap; wait for a change
+                    self._condition.wait(0.05)
+                    continue
+
+            started = time.perf_counter()
+            try:
+                if admitted:
+                    self._admit(admitted)
+                if self._batch is not None:
+                    self._step()
+            except Exception as e:
+                # Never let one bad step kill the decode thread: fail the sequences involved and carry on
+                logging.error(f"Generation step failed: {e}")
+                self._fail(admitted + (self._batch.requests if self._batch is not None else []), e)
+                self._batch = None
+            step_s = time.perf_counter() - started
+            self._step_s = step_s if self._step_s == 0.0 else self._step_s + STEP_TIME_SMOOTHING * (step_s - self._step_s)
+            with self._condition:
+                self._stats["decode_steps"] += 1
+                self._stats["total_decode_s"] += step_s
+
+        shutdown_error = RuntimeError("GenerationScheduler was closed.")
+        if self._batch is not None:
+            self._fail(self._batch.requests, shutdown_error)
+        self._fail(list(self._pending), shutdown_error)
+        self._batch, self._pending = None, deque()
+
+    def _per_row_positions(self, module, args, output):
+        """Forward hook on the decoder's position embedding: substitutes each row's own position."""
+        positions = self._row_positions
+        if positions is None or threading.get_ident() != self._thread.ident:
+            return None
+        embeddings = torch.nn.Embedding.forward(module, positions + getattr(module, "offset", 0))
+        return embeddings.unsqueeze(1).to(output.dtype)
+
+    def _forward(self, encoder_hidden_states, attention_mask, decoder_input_ids, past_key_values=None,
+                 decoder_mask=None, positions=None):
+        """One decoder step over a batch; returns the model outputs."""
+        extra = {}
+        if decoder_mask is not None and not bool(decoder_mask.all()):
+            extra["decoder_attention_mask"] = decoder_mask
+        self._row_positions = positions if self._merge_supported else None
+        try:
+            with torch.inference_mode():
+                return self.model(
+                    encoder_outputs=BaseModelOutput(last_hidden_state=encoder_hidden_states),
+                    attention_mask=attention_mask,
+                    decoder_input_ids=decoder_input_ids,
+                    past_key_values=past_key_values,
+                    **extra,
+                )
+        finally:
+            self._row_positions = None
+
+    def _admit(self, requests):
+        """Encodes newly admitted prompts, decodes their first token and merges them into the running batch."""
+        now = time.monotonic()
+        with self._condition:
+            self._stats["total_queue_wait_s"] += sum(now - request.submitted_at for request in requests)
+        try:
+            inputs = self.tokenizer(
+                [request.prompt for request in requests], return_tensors="pt", padding=True,
+                truncation=True, max_length=self.tokenizer.model_max_length,
+            ).to(self.device)
+            with torch.inference_mode():
+                encoder_hidden_states = self.model.get_encoder()(**inputs).last_hidden_state
+            decoder_input_ids = torch.full((len(requests), 1), self.decoder_start_token_id, dtype=torch.long, device=self.device)
+            outputs = self._forward(encoder_hidden_states, inputs["attention_mask"], decoder_input_ids)
+            next_tokens = self._sample(outputs.logits[:, -1, :].float(), requests)
+        except Exception as e:
+            logging.error(f"Generation prefill failed: {e}")
+            self._fail(requests, e)
+            return
+
+        for request in requests:
+            # Mirrors generate(): the first put() is the decoder prompt, skipped by skip_prompt
+            self._stream(request, decoder_input_ids[:1].cpu())
+        added = _Batch(
+            requests, encoder_hidden_states, inputs["attention_mask"], next_tokens.unsqueeze(-1), outputs.past_key_values,
+            decoder_mask=torch.ones((len(requests), 1), dtype=torch.long, device=self.device),
+            positions=torch.ones(len(requests), dtype=torch.long, device=self.device),
+        )
+        added = self._advance(added, next_tokens)
+        if added is not None:
+            self._merge(added)
+        with self._condition:
+            self._stats["max_active"] = max(self._stats["max_active"], self._active_count())
+
+    def _merge(self, added):
+        """Appends the rows of `added` to the running batch, padding decoder caches on the left and prompts on the right."""
+        batch = self._batch
+        if batch is None:
+            self._batch = added
+            return
+        decoder_length = max(batch.decoder_mask.shape[1], added.decoder_mask.shape[1])
+        source_length = max(batch.attention_mask.shape[1], added.attention_mask.shape[1])
+        batch.past_key_values = _merge_caches(batch.past_key_values, added.past_key_values)
+        batch.requests = batch.requests + added.requests
+        batch.encoder_hidden_states = torch.cat([
+            _pad(batch.encoder_hidden_states, source_length, 1), _pad(added.encoder_hidden_states, source_length, 1)])
+        batch.attention_mask = torch.cat([
+            _pad(batch.attention_mask, source_length, 1), _pad(added.attention_mask, source_length, 1)])
+        batch.decoder_mask = torch.cat([
+            _pad(batch.decoder_mask, decoder_length, 1, left=True), _pad(added.decoder_mask, decoder_length, 1, left=True)])
+        batch.decoder_input_ids = torch.cat([batch.decoder_input_ids, added.decoder_input_ids])
+        batch.positions = torch.cat([batch.positions, added.positions])
+
+    def _step(self):
+        """Decodes one token for every active sequence in one forward call and evicts the finished ones."""
+        batch = self._batch
+        decoder_mask = torch.cat([batch.decoder_mask, batch.decoder_mask.new_ones((len(batch.requests), 1))], dim=1)
+        try:
+            outputs = self._forward(batch.encoder_hidden_states, batch.attention_mask, batch.decoder_input_ids,
+                                    batch.past_key_values, decoder_mask, batch.positions)
+            next_tokens = self._sample(outputs.logits[:, -1, :].float(), batch.requests)
+        except Exception as e:
+            logging.error(f"Generation decode step failed: {e}")
+            self._batch = None
+            self._fail(batch.requests, e)
+            return
+        batch.past_key_values = outputs.past_key_values
+        batch.decoder_mask = decoder_mask
+        batch.positions = batch.positions + 1
+        batch.decoder_input_ids = next_tokens.unsqueeze(-1)
+        self._batch = self._advance(batch, next_tokens)
+
+    def _advance(self, batch, next_tokens):
+        """
+        Hands each row its new token, finishes the rows that are done and drops them from `batch`.
+
+        Returns:
+            _Batch or None: The remaining rows, or None if none are left.
+        """
+        keep = []
+        for row, (request, token) in enumerate(zip(batch.requests, next_tokens.tolist())):
+            if request.done:
+                continue # Already failed (e.g. by its streamer)
+            if request.future.cancelled():
+                self._finish(request, cancelled=True)
+                continue
+            request.tokens.append(token)
+            if not self._stream(request, torch.tensor([token])):
+                continue
+            # max_length counts the decoder start token, as in generate()
+            if token == self.eos_token_id or len(request.tokens) + 1 >= request.max_length:
+                self._finish(request)
+            elif request.deadline is not None and time.monotonic() + self._step_s >= request.deadline:
+                with self._condition:
+                    self._stats["deadline_stops"] += 1
+                self._finish(request)
+            else:
+                keep.append(row)
+
+        with self._condition:
+            self._stats["forward_calls"] += 1
+            self._stats["generated_tokens"] += len(batch.requests)
+        if not keep:
+            return None
+        if len(keep) < len(batch.requests):
+            rows = torch.tensor(keep, dtype=torch.long, device=self.device)
+            batch.requests = [batch.requests[row] for row in keep]
+            batch.encoder_hidden_states = batch.encoder_hidden_states.index_select(0, rows)
+            batch.attention_mask = batch.attention_mask.index_select(0, rows)
+            batch.decoder_input_ids = batch.decoder_input_ids.index_select(0, rows)
+            batch.decoder_mask = batch.decoder_mask.index_select(0, rows)
+            batch.positions = batch.positions.index_select(0, rows)
+            batch.past_key_values = _select_cache_rows(batch.past_key_values, rows)
+            # Leading cache positions that were padding for every remaining row
+            start = int(batch.decoder_mask.any(dim=0).int().argmax())
+            if start > 0:
+                batch.decoder_mask = batch.decoder_mask[:, start:]
+                batch.past_key_values = _trim_cache(batch.past_key_values, start)
+        return batch
+
+    def _sample(self, logits, requests):
+        """
+        Picks the next token per row with that request's own sampling parameters
+        (temperature and top-p for sampled rows, argmax for greedy ones).
+        """
+        for row, request in enumerate(requests):
+            sequence = [self.decoder_start_token_id] + request.tokens
+            if len(sequence) < self.min_length:
+                logits[row, self.eos_token_id] = -float("inf")
+            banned = _banned_ngram_tokens(sequence, self.no_repeat_ngram_size)
+            if banned:
+                logits[row, banned] = -float("inf")
+
+        greedy = logits.argmax(dim=-1)
+        sampled_rows = [row for row, request in enumerate(requests) if request.do_sample]
+        if not sampled_rows:
+            return greedy
+
+        rows = torch.tensor(sampled_rows, dtype=torch.long, device=logits.device)
+        temperatures = torch.tensor([max(requests[row].temperature, 1e-5) for row in sampled_rows],
+                                    device=logits.device).unsqueeze(-1)
+        top_ps = torch.tensor([requests[row].top_p for row in sampled_rows], device=logits.device).unsqueeze(-1)
+        probabilities = torch.softmax(logits.index_select(0, rows) / temperatures, dim=-1)
+        sorted_probabilities, sorted_indices = probabilities.sort(dim=-1, descending=True)
+        # Drop tokens once the mass before them already reaches top_p (the first token always stays)
+        outside_nucleus = sorted_probabilities.cumsum(dim=-1) - sorted_probabilities >= top_ps
+        sorted_probabilities = sorted_probabilities.masked_fill(outside_nucleus, 0.0)
+        choice = torch.multinomial(sorted_probabilities, num_samples=1)
+        greedy[rows] = sorted_indices.gather(-1, choice).squeeze(-1)
+        return greedy
+
+    def _release(self, request):
+        if request.session_id is not None:
+            with self._condition:
+                remaining = self._active_per_session.get(request.session_id, 0) - 1
+                if remaining > 0:
+                    self._active_per_session[request.session_id] = remaining
+                else:
+                    self._active_per_session.pop(request.session_id, None)
+
+    def _stream(self, request, token_ids):
+        """Forwards tokens to the request's streamer; a failing streamer fails only its own request."""
+        if request.streamer is None:
+            return True
+        try:
+            request.streamer.put(token_ids)
+            return True
+        except Exception as e:
+            logging.error(f"Generation streamer failed: {e}")
+            self._fail([request], e)
+            return False
+
+    @staticmethod
+    def _end_streamer(request):
+        if request.streamer is not None:
+            try:
+                request.streamer.end()
+            except Exception as e:
+                logging.error(f"Generation streamer failed to close: {e}")
+
+    @staticmethod
+    def _resolve(request, result=None, error=None):
+        """Sets the request's result or exception, unless the caller cancelled it in the meantime."""
+        try:
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(result)
+        except InvalidStateError:
+            pass # Cancelled (client disconnected or timed out) after the last check
+
+    def _finish(self, request, cancelled=False):
+        if request.done:
+            return
+        request.done = True
+        self._release(request)
+        self._end_streamer(request)
+        with self._condition:
+            self._stats["cancelled" if cancelled else "completed"] += 1
+        if not cancelled:
+            self._resolve(request, result=request.tokens)
+
+    def _fail(self, requests, error):
+        for request in requests:
+            if request.done:
+                continue
+            request.done = True
+            self._release(request)
+            self._end_streamer(request)
+            with self._condition:
+                self._stats["failed"] += 1
+            self._resolve(request, error=error)
+
+    def get_metrics(self):
+        """
+        Returns request counters, the current load and decode throughput.
+
+        `tokens_per_forward` is the average number of sequences decoded per model call,
+        i.e. how much batching concurrent chats currently get.
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            pending = len(self._pending)
+        admitted = stats["completed"] + stats["cancelled"] + stats["failed"]
+        return {
+            "active": self._active_count(),
+            "pending": pending,
+            **{key: value for key, value in stats.items() if not key.startswith("total_")},
+            "step_ms": round(1000 * self._step_s, 3),
+            "avg_queue_wait_ms": round(1000 * stats["total_queue_wait_s"] / admitted, 3) if admitted else 0.0,
+            "tokens_per_forward": round(stats["generated_tokens"] / stats["forward_calls"], 3) if stats["forward_calls"] else 0.0,
+            "tokens_per_s": round(stats["generated_tokens"] / stats["total_decode_s"], 2) if stats["total_decode_s"] else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    from concurrent.futures import wait
+    from transformers import BlenderbotTokenizer, BlenderbotForConditionalGeneration
+
+    print("Running GenerationScheduler module development example:")
+
+    model_name = "facebook/blenderbot-400M-distill"
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    tokenizer = BlenderbotTokenizer.from_pretrained(model_name)
+    model = BlenderbotForConditionalGeneration.from_pretrained(model_name).to(device).eval()
+    prompts = [
+        "I feel sad. I lost the game.",
+        "I feel happy. My sister is visiting this weekend.",
+        "I can't sleep before my exam tomorrow.",
+        "I feel anger. My roommate ate my lunch again.",
+    ] * 2
+
+    started = time.perf_counter()
+    sequential_tokens = 0
+    for prompt in prompts:
+        inputs = tokenizer([prompt], return_tensors="pt").to(device)
+        sequential_tokens += model.generate(**inputs, num_beams=1, **DEFAULT_GENERATION_PARAMS).shape[-1] - 1
+    sequential_s = time.perf_counter() - started
+    print(f"Sequential generate(): {sequential_tokens / sequential_s:.1f} tokens/s")
+
+    for max_active in (1, 4, 8):
+        scheduler = GenerationScheduler(model, tokenizer, device, max_active_sequences=max_active)
+        started = time.perf_counter()
+        futures = [scheduler.submit(prompt, session_id=f"user-{i}") for i, prompt in enumerate(prompts)]
+        wait(futures)
+        elapsed = time.perf_counter() - started
+        tokens = sum(len(future.result()) for future in futures)
+        print(f"Scheduler, {max_active} active: {tokens / elapsed:.1f} tokens/s | {scheduler.get_metrics()}")
+        scheduler.close()
+
+    print(f"Sample reply: {tokenizer.decode(futures[0].result(), skip_special_tokens=True)}")
+
+    # Staggered arrivals join the running batch mid-reply; greedy replies must match generate()
+    greedy = {"do_sample": False, "max_length": 48}
+    scheduler = GenerationScheduler(model, tokenizer, device, max_active_sequences=8)
+    futures = []
+    for i, prompt in enumerate(prompts[:4]):
+        futures.append(scheduler.submit(prompt, session_id=f"user-{i}", **greedy))
+        time.sleep(0.15)
+    wait(futures)
+    for prompt, future in zip(prompts, futures):
+        reference = model.generate(**tokenizer([prompt], return_tensors="pt").to(device), num_beams=1, **greedy)[0, 1:].tolist()
+        reference = reference[:reference.index(model.config.eos_token_id) + 1] if model.config.eos_token_id in reference else reference
+        print(f"Greedy parity (staggered): {'match' if future.result() == reference else 'MISMATCH'}")
+    print(f"Staggered arrivals: {scheduler.get_metrics()}")
+    scheduler.close()
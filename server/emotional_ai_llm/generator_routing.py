@@ -0,0 +1,78 @@
+# emotional_ai_llm/generator_routing.py
+
+# Picks the chat generator (see chat_generators.GENERATOR_REGISTRY) for each turn from the
+# length of the user's message and the load on the default generator. Kept free of torch imports.
+
+import os
+import threading
+
+# Defaults (overridable through environment variables, see GeneratorRoutingPolicy.from_env)
+DEFAULT_FAST_MAX_WORDS = 6 # Messages this short go to the fast generator
+DEFAULT_FAST_LOAD_THRESHOLD = 4 # Replies queued or decoding on the default generator before turns overflow to the fast one
+
+
+class GeneratorRoutingPolicy:
+    def __init__(self, default_generator, fast_generator=None, fast_max_words=DEFAULT_FAST_MAX_WORDS,
+                 fast_load_threshold=DEFAULT_FAST_LOAD_THRESHOLD):
+        """
+        Chooses which chat generator answers a turn.
+
+        Turns go to `fast_generator` when the user's message has at most `fast_max_words`
+        words, or when at least `fast_load_threshold` replies are already queued or decoding
+        on `default_generator`. Everything else goes to `default_generator`.
+
+        Args:
+            default_generator (str): Name of the generator used normally (e.g. "blenderbot").
+            fast_generator (str, optional): Name of the smaller generator (e.g. "t5"). None
+                                            disables routing.
+            fast_max_words (int): Longest message (in words) sent to the fast generator. 0 disables.
+            fast_load_threshold (int): Default-generator load from which turns overflow. 0 disables.
+        """
+        self.default_generator = default_generator
+        self.fast_generator = fast_generator
+        self.fast_max_words = fast_max_words
+        self.fast_load_threshold = fast_load_threshold
+        self._lock = threading.Lock()
+        self._routed = {"default": 0, "short_input": 0, "load": 0}
+
+    @classmethod
+    def from_env(cls, default_generator, fast_generator=None):
+        """Builds a policy with thresholds from NOVA_FAST_GENERATOR_MAX_WORDS and NOVA_FAST_GENERATOR_LOAD."""
+        return cls(
+            default_generator, fast_generator,
+            fast_max_words=int(os.environ.get("NOVA_FAST_GENERATOR_MAX_WORDS", DEFAULT_FAST_MAX_WORDS)),
+            fast_load_threshold=int(os.environ.get("NOVA_FAST_GENERATOR_LOAD", DEFAULT_FAST_LOAD_THRESHOLD)),
+        )
+
+    def choose(self, user_input_text, default_load=0):
+        """
+        Args:
+            user_input_text (str): The user's message.
+            default_load (int): Replies queued or decoding on the default generator.
+
+        Returns:
+            str: Name of the generator to use.
+        """
+        reason = "default"
+        if self.fast_generator is not None:
+            if self.fast_max_words > 0 and len(user_input_text.split()) <= self.fast_max_words:
+                reason = "short_input"
+            elif self.fast_load_threshold > 0 and default_load >= self.fast_load_threshold:
+                reason = "load"
+        with self._lock:
+            self._routed[reason] += 1
+        return self.default_generator if reason == "default" else self.fast_generator
+
+    def get_metrics(self):
+        with self._lock:
+            return {"default_generator": self.default_generator, "fast_generator": self.fast_generator, "routed": dict(self._routed)}
+
+
+if __name__ == "__main__":
+    print("Running GeneratorRoutingPolicy module development example:")
+
+    policy = GeneratorRoutingPolicy("blenderbot", "t5")
+    print(f"'thanks'                      -> {policy.choose('thanks')}")
+    print(f"long message, idle            -> {policy.choose('I had a long day at work and my boss yelled at me again')}")
+    print(f"long message, 5 replies queued -> {policy.choose('I had a long day at work and my boss yelled at me again', 5)}")
+    print(f"Metrics: {policy.get_metrics()}")
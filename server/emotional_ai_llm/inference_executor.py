@@ -0,0 +1,230 @@
+# emotional_ai_llm/inference_executor.py
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Default pool sizes (overridable through environment variables, see InferenceExecutor.from_env)
+DEFAULT_INFERENCE_THREADS = 4
+DEFAULT_PREPROCESS_PROCESSES = 0 # 0 disables the process pool; preprocessing then shares the thread pool
+DEFAULT_MAX_QUEUE_DEPTH = 64
+
+
+class InferenceQueueFullError(RuntimeError):
+    """Raised when a job is submitted while the executor's queue is already at capacity."""
+
+
+class InferenceExecutor:
+    def __init__(self, max_threads=DEFAULT_INFERENCE_THREADS, max_processes=DEFAULT_PREPROCESS_PROCESSES,
+                 max_queue_depth=DEFAULT_MAX_QUEUE_DEPTH):
+        """
+        Runs blocking model calls off the asyncio event loop.
+
+        TensorFlow and torch release the GIL inside their kernels, so a bounded thread pool
+        is enough to let concurrent requests overlap. An optional process pool is available
+        for CPU-heavy, pure-Python preprocessing (image/audio decoding).
+
+        Args:
+            max_threads (int): Number of worker threads for model inference.
+            max_processes (int): Number of worker processes for preprocessing. 0 disables the pool.
+            max_queue_depth (int): Maximum number of jobs allowed to wait for a free worker
+                                   (per pool). Further submissions raise InferenceQueueFullError.
+        """
+        self.max_threads = max_threads
+        self.max_processes = max_processes
+        self.max_queue_depth = max_queue_depth
+
+        self._thread_pool = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="nova-inference")
+        # "spawn" avoids forking a process that already holds TensorFlow/torch thread pools
+        self._process_pool = (
+            ProcessPoolExecutor(max_workers=max_processes, mp_context=multiprocessing.get_context("spawn"))
+            if max_processes > 0 else None
+        )
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "thread": self._empty_stats(),
+            "process": self._empty_stats(),
+        }
+        logging.info(
+            f"InferenceExecutor initialized with {max_threads} thread(s), "
+            f"{max_processes} preprocessing process(es), max queue depth {max_queue_depth}."
+        )
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds an executor configured from environment variables:
+        NOVA_INFERENCE_THREADS, NOVA_PREPROCESS_PROCESSES and NOVA_MAX_QUEUE_DEPTH.
+        """
+        return cls(
+            max_threads=int(os.environ.get("NOVA_INFERENCE_THREADS", DEFAULT_INFERENCE_THREADS)),
+            max_processes=int(os.environ.get("NOVA_PREPROCESS_PROCESSES", DEFAULT_PREPROCESS_PROCESSES)),
+            max_queue_depth=int(os.environ.get("NOVA_MAX_QUEUE_DEPTH", DEFAULT_MAX_QUEUE_DEPTH)),
+        )
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            "queued": 0,
+            "running": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "cancelled": 0,
+            "max_queued": 0,
+            "total_wait_s": 0.0,
+            "total_run_s": 0.0,
+        }
+
+    def _admit(self, pool_name, capacity):
+        """Reserves a queue slot for a new job or raises if the pool is saturated."""
+        with self._lock:
+            stats = self._stats[pool_name]
+            # Jobs beyond the number of workers have to wait in the queue
+            waiting = max(0, stats["queued"] + stats["running"] - capacity)
+            if waiting >= self.max_queue_depth:
+                stats["rejected"] += 1
+                raise InferenceQueueFullError(
+                    f"Inference {pool_name} pool is saturated ({waiting} jobs waiting)."
+                )
+            stats["queued"] += 1
+            stats["max_queued"] = max(stats["max_queued"], stats["queued"])
+
+    def _run_tracked(self, enqueued_at, fn, *args, **kwargs):
+        """Executes fn inside a worker thread while recording wait and run time."""
+        started_at = time.perf_counter()
+        with self._lock:
+            stats = self._stats["thread"]
+            stats["queued"] -= 1
+            stats["running"] += 1
+            stats["total_wait_s"] += started_at - enqueued_at
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                stats["failed"] += 1
+            raise
+        finally:
+            with self._lock:
+                stats["running"] -= 1
+                stats["total_run_s"] += time.perf_counter() - started_at
+        with self._lock:
+            stats["completed"] += 1
+        return result
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Runs a blocking callable (model inference, tokenization, generation) in the thread pool
+        and awaits its result without blocking the event loop.
+        """
+        self._admit("thread", self.max_threads)
+        job = self._thread_pool.submit(self._run_tracked, time.perf_counter(), fn, *args, **kwargs)
+        # Cancelling the awaiting coroutine also cancels a job that has not started yet, and
+        # then _run_tracked never runs to release its queue slot
+        job.add_done_callback(self._release_cancelled)
+        return await asyncio.wrap_future(job)
+
+    def _release_cancelled(self, job):
+        """Done-callback of thread pool jobs: frees the queue slot of a job cancelled before it started."""
+        if job.cancelled():
+            with self._lock:
+                stats = self._stats["thread"]
+                stats["queued"] -= 1
+                stats["cancelled"] += 1
+
+    async def run_preprocess(self, fn, *args, **kwargs):
+        """
+        Runs CPU-heavy preprocessing in the process pool if one is configured,
+        otherwise falls back to the thread pool. `fn` and its arguments must be picklable
+        (i.e. a module-level function) when the process pool is enabled.
+        """
+        if self._process_pool is None:
+            return await self.run(fn, *args, **kwargs)
+
+        self._admit("process", self.max_processes)
+        loop = asyncio.get_running_loop()
+        submitted_at = time.perf_counter()
+        with self._lock:
+            # Worker processes cannot report back when they pick a job up, so jobs
+            # are accounted as running for their whole lifetime in the pool.
+            stats = self._stats["process"]
+            stats["queued"] -= 1
+            stats["running"] += 1
+        try:
+            result = await loop.run_in_executor(self._process_pool, functools.partial(fn, *args, **kwargs))
+        except Exception:
+            with self._lock:
+                stats["failed"] += 1
+            raise
+        finally:
+            with self._lock:
+                stats["running"] -= 1
+                stats["total_run_s"] += time.perf_counter() - submitted_at
+        with self._lock:
+            stats["completed"] += 1
+        return result
+
+    def queue_depth(self, pool_name="thread"):
+        """Number of jobs currently waiting for a worker of the given pool."""
+        with self._lock:
+            return self._stats[pool_name]["queued"]
+
+    def get_metrics(self):
+        """
+        Returns a snapshot of pool sizes, queue depth and latency counters.
+
+        Returns:
+            dict: Per-pool metrics, e.g. {"thread": {"queued": 0, "running": 2, ...}, ...}.
+        """
+        with self._lock:
+            snapshot = {}
+            for pool_name, stats in self._stats.items():
+                finished = stats["completed"] + stats["failed"]
+                snapshot[pool_name] = {
+                    "workers": self.max_threads if pool_name == "thread" else self.max_processes,
+                    "queued": stats["queued"],
+                    "running": stats["running"],
+                    "max_queued": stats["max_queued"],
+                    "completed": stats["completed"],
+                    "failed": stats["failed"],
+                    "rejected": stats["rejected"],
+                    "cancelled": stats["cancelled"],
+                    "avg_wait_ms": round(1000 * stats["total_wait_s"] / finished, 3) if finished else 0.0,
+                    "avg_run_ms": round(1000 * stats["total_run_s"] / finished, 3) if finished else 0.0,
+                }
+            snapshot["max_queue_depth"] = self.max_queue_depth
+            return snapshot
+
+    def shutdown(self, wait=True):
+        """Stops accepting work and shuts down the worker pools."""
+        self._thread_pool.shutdown(wait=wait)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait)
+        logging.info("InferenceExecutor shut down.")
+
+
+if __name__ == "__main__":
+    print("Running InferenceExecutor module development example:")
+
+    def slow_square(x):
+        time.sleep(0.2) # Stands in for a GIL-releasing model call
+        return x * x
+
+    async def demo():
+        executor = InferenceExecutor(max_threads=4, max_queue_depth=8)
+        start = time.perf_counter()
+        results = await asyncio.gather(*(executor.run(slow_square, i) for i in range(8)))
+        elapsed = time.perf_counter() - start
+        print(f"Results: {results}")
+        print(f"8 jobs of 0.2s on 4 threads took {elapsed:.2f}s (serial would be 1.6s).")
+        print(f"Metrics: {executor.get_metrics()}")
+        executor.shutdown()
+
+    asyncio.run(demo())
+    print("\nInferenceExecutor module development example finished.")
@@ -0,0 +1,346 @@
+# emotional_ai_llm/inference_session.py
+
+import logging
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from .text_encoder import build_text_embedding_extractor, group_by_length_bucket, bucket_boundary_lengths, MAX_LEN, TEXT_LENGTH_BUCKETS
+from .audio_encoder import build_audio_embedding_extractor, pool_window_embeddings, INPUT_SHAPE as INPUT_SHAPE_AUDIO
+from .vision_encoder import (
+    build_vision_embedding_extractor, build_vision_embedding_and_head_model, vision_tier_input_shape,
+    DEFAULT_VISION_TIER, INPUT_SHAPE as INPUT_SHAPE_VISION,
+)
+from .fusion_module import build_text_only_fusion_model, TEXT_EMBEDDING_DIM, AUDIO_EMBEDDING_DIM, VISION_EMBEDDING_DIM
+from .end_to_end_graph import EndToEndGraph, SIGNATURE_NAMES, MEL_SPECTROGRAMS_SPEC, AUDIO_WINDOW_WEIGHTS_SPEC, signature_for
+from .numpy_fusion import NumpyFusionMLP
+
+# Largest |diff| between a fast path and predict() that still counts as a match
+SELF_CHECK_TOLERANCE = 1e-4
+SELF_CHECK_TOLERANCE_FLOAT16 = 5e-3 # NumPy fusion runtime in float16
+
+class InferenceSession:
+    def __init__(self, text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model, fusion_dtype=np.float32, audio_pooling="mean",
+                 vision_tier_models=None):
+        """
+        Owns the request-path graphs for all encoders and the fusion model.
+
+        The embedding extractor sub-models are built once, and every model is wrapped in a
+        `tf.function` with a fixed input signature (dynamic batch dimension only), so request
+        calls run the traced graph directly instead of going through `Model.predict()` and its
+        data-adapter/callback machinery. Text runs on length-bucketed sequences (one traced
+        graph per bucket in TEXT_LENGTH_BUCKETS). Standalone fusion calls (`fuse`, `fuse_text_only`)
+        skip TensorFlow entirely and run on the NumPy fusion runtime.
+
+        Args:
+            text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model:
+                The trained Keras models returned by `load_all_models`.
+            fusion_dtype: Compute precision of the NumPy fusion runtime (np.float32 or np.float16).
+            audio_pooling (str): How mel window embeddings are pooled per clip (see AUDIO_POOLING_MODES).
+            vision_tier_models (dict, optional): Additional vision backbone tiers, {tier name: model}
+                                                 (see VISION_TIERS). The default tier is `vision_encoder_model`.
+        """
+        self.text_encoder_model = text_encoder_model
+        self.audio_encoder_model = audio_encoder_model
+        self.vision_encoder_model = vision_encoder_model
+        self.fusion_model = fusion_model
+        self.audio_pooling = audio_pooling
+        self.self_check_report = {}
+
+        self.text_extractor = build_text_embedding_extractor(text_encoder_model)
+        self.audio_extractor = build_audio_embedding_extractor(audio_encoder_model)
+        self.vision_extractor = build_vision_embedding_extractor(vision_encoder_model)
+        self.vision_head = build_vision_embedding_and_head_model(vision_encoder_model)
+        self.text_only_fusion_model = build_text_only_fusion_model(fusion_model)
+        # Conv1D kernel size of the trained model decides how short a bucket may be
+        self.text_kernel_size = text_encoder_model.layers[1].kernel_size[0]
+
+        self._text_fns = {
+            bucket: tf.function(
+                lambda sequences: self.text_extractor(sequences, training=False),
+                input_signature=[tf.TensorSpec(shape=[None, bucket], dtype=tf.int32)],
+            )
+            for bucket in TEXT_LENGTH_BUCKETS
+        }
+        self._audio_fn = tf.function(
+            lambda mel_spectrograms: self.audio_extractor(mel_spectrograms, training=False),
+            input_signature=[tf.TensorSpec(shape=[None, *INPUT_SHAPE_AUDIO], dtype=tf.float32)],
+        )
+        self._vision_fn = tf.function(
+            lambda images: self.vision_extractor(images, training=False),
+            input_signature=[tf.TensorSpec(shape=[None, *INPUT_SHAPE_VISION], dtype=tf.float32)],
+        )
+        # Other backbone tiers only run standalone (embedding + NumPy fusion), outside the end-to-end graph
+        self.vision_tier_extractors = {
+            tier: build_vision_embedding_extractor(model) for tier, model in (vision_tier_models or {}).items()
+            if tier != DEFAULT_VISION_TIER
+        }
+        self._vision_tier_fns = {DEFAULT_VISION_TIER: self._vision_fn}
+        for tier, extractor in self.vision_tier_extractors.items():
+            self._vision_tier_fns[tier] = tf.function(
+                lambda images, extractor=extractor: extractor(images, training=False),
+                input_signature=[tf.TensorSpec(shape=[None, *vision_tier_input_shape(tier)], dtype=tf.float32)],
+            )
+        self._vision_head_fn = tf.function(
+            lambda images: self.vision_head(images, training=False),
+            input_signature=[tf.TensorSpec(shape=[None, *INPUT_SHAPE_VISION], dtype=tf.float32)],
+        )
+        self.numpy_fusion = NumpyFusionMLP.from_keras_model(fusion_model, dtype=fusion_dtype)
+        self.numpy_text_only_fusion = NumpyFusionMLP.from_keras_model(self.text_only_fusion_model, dtype=fusion_dtype)
+        self.end_to_end = EndToEndGraph(
+            self.text_extractor, self.audio_extractor, self.vision_extractor, fusion_model,
+            text_only_fusion_model=self.text_only_fusion_model, audio_pooling=audio_pooling,
+        )
+        self._pooled_audio_fn = tf.function(
+            self.end_to_end.pooled_audio_embedding,
+            input_signature=[MEL_SPECTROGRAMS_SPEC, AUDIO_WINDOW_WEIGHTS_SPEC],
+        )
+        logging.info("InferenceSession built: embedding extractors, fusion and end-to-end graphs traced with fixed signatures.")
+
+    def _length_buckets(self, sequences):
+        return group_by_length_bucket(sequences, kernel_size=self.text_kernel_size)
+
+    def text_embeddings(self, sequences):
+        """
+        (N, MAX_LEN) token ids -> (N, 128) text embeddings.
+
+        Rows are grouped by length bucket and each group runs trimmed to its bucket. Results
+        are identical to the full-length path because the encoder ends in GlobalMaxPooling1D.
+        """
+        sequences = np.asarray(sequences, dtype=np.int32)
+        embeddings = np.empty((len(sequences), TEXT_EMBEDDING_DIM), dtype=np.float32)
+        for bucket, rows in self._length_buckets(sequences).items():
+            embeddings[rows] = self._text_fns[bucket](sequences[rows, :bucket]).numpy()
+        return embeddings
+
+    def audio_embeddings(self, mel_spectrograms):
+        """(N, 128, 44, 1) mel-spectrograms -> (N, 128) audio embeddings."""
+        return self._audio_fn(np.asarray(mel_spectrograms, dtype=np.float32)).numpy()
+
+    def pooled_audio_embeddings(self, mel_spectrograms, audio_window_weights):
+        """(N, W, 128, 44, 1) mel windows + (N, W) weights -> (N, 128) pooled audio embeddings."""
+        return self._pooled_audio_fn(
+            np.asarray(mel_spectrograms, dtype=np.float32), np.asarray(audio_window_weights, dtype=np.float32)
+        ).numpy()
+
+    def vision_embeddings(self, images):
+        """(N, 128, 128, 3) images in [0, 1] -> (N, 128) vision embeddings."""
+        return self._vision_fn(np.asarray(images, dtype=np.float32)).numpy()
+
+    @property
+    def vision_tiers(self):
+        """Names of the vision backbone tiers this session can serve."""
+        return list(self._vision_tier_fns)
+
+    def vision_tier_embeddings(self, tier, images):
+        """(N, R, R, 3) images at the tier's resolution -> (N, 128) vision embeddings of that tier."""
+        return self._vision_tier_fns[tier](np.asarray(images, dtype=np.float32)).numpy()
+
+    def benchmark_vision_tiers(self, repeats=5):
+        """
+        Measures the single-frame latency of every vision tier (also tracing their graphs).
+
+        Returns:
+            dict: {tier: median milliseconds per frame}.
+        """
+        latencies = {}
+        for tier in self.vision_tiers:
+            frame = np.zeros((1, *vision_tier_input_shape(tier)), dtype=np.float32)
+            self.vision_tier_embeddings(tier, frame) # Warm-up
+            samples = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                self.vision_tier_embeddings(tier, frame)
+                samples.append(time.perf_counter() - start)
+            latencies[tier] = round(1000 * float(np.median(samples)), 3)
+        logging.info(f"Vision tier latencies (ms/frame): {latencies}")
+        return latencies
+
+    def vision_embeddings_and_probabilities(self, images):
+        """
+        (N, 128, 128, 3) images in [0, 1] -> dict with "vision_embedding" (N, 128) and the
+        vision head's "vision_probabilities" (N, NUM_EMOTION_LABELS), from one encoder pass.
+        """
+        outputs = self._vision_head_fn(np.asarray(images, dtype=np.float32))
+        return {name: tensor.numpy() for name, tensor in outputs.items()}
+
+    def fuse(self, fused_embedding_input):
+        """
+        Runs the fusion MLP on the NumPy runtime.
+
+        Args:
+            fused_embedding_input (dict): The three `*_embedding_input` arrays, as passed to `fusion_model.predict`.
+
+        Returns:
+            np.array: (N, NUM_EMOTION_LABELS) emotion probabilities.
+        """
+        return self.numpy_fusion.predict(fused_embedding_input)
+
+    def fuse_text_only(self, text_embeddings):
+        """
+        Runs the text-only fusion variant (zero audio/vision folded into the first Dense bias).
+
+        Args:
+            text_embeddings (np.array): (N, 128) text embeddings.
+
+        Returns:
+            np.array: (N, NUM_EMOTION_LABELS) emotion probabilities, identical to `fuse` with zero audio/vision.
+        """
+        return self.numpy_text_only_fusion.predict(text_embeddings)
+
+    def run_end_to_end(self, sequences, mel_spectrograms=None, audio_window_weights=None, images=None):
+        """
+        Runs a whole turn (all encoders + fusion) as one graph call.
+
+        The signature is picked from the modalities present; absent ones contribute
+        zero embeddings inside the graph. Rows are grouped by text length bucket, with
+        one call per bucket present in the batch.
+
+        Args:
+            sequences (np.array): (N, MAX_LEN) token ids.
+            mel_spectrograms (np.array, optional): (N, W, 128, 44, 1) mel windows.
+            audio_window_weights (np.array, optional): (N, W) window pooling weights (0 = padding).
+            images (np.array, optional): (N, 128, 128, 3) images in [0, 1].
+
+        Returns:
+            dict: "emotion_probabilities" (N, NUM_EMOTION_LABELS) plus "text_embedding",
+                  "audio_embedding" and "vision_embedding" (N, 128 each), as np.arrays.
+        """
+        sequences = np.asarray(sequences, dtype=np.int32)
+        optional_inputs = []
+        if mel_spectrograms is not None:
+            optional_inputs.append(np.asarray(mel_spectrograms, dtype=np.float32))
+            optional_inputs.append(np.asarray(audio_window_weights, dtype=np.float32))
+        if images is not None:
+            optional_inputs.append(np.asarray(images, dtype=np.float32))
+        signature_name = signature_for(mel_spectrograms is not None, images is not None)
+
+        outputs = {}
+        for bucket, rows in self._length_buckets(sequences).items():
+            graph_fn = self.end_to_end.get_function(signature_name, bucket)
+            bucket_outputs = graph_fn(sequences[rows, :bucket], *(array[rows] for array in optional_inputs))
+            for name, value in bucket_outputs.items():
+                value = value.numpy()
+                if name not in outputs:
+                    outputs[name] = np.empty((len(sequences), *value.shape[1:]), dtype=value.dtype)
+                outputs[name][rows] = value
+        return outputs
+
+    def _self_check_cases(self, batch_size):
+        """Yields (name, predict_fn, direct_fn) triples on dummy inputs for the self-check."""
+        # Padded sequences spanning every length bucket, so bucketed results are checked
+        # against the full-length predict() path and every bucket graph gets traced
+        rng = np.random.default_rng(0)
+        lengths = np.repeat(bucket_boundary_lengths(self.text_kernel_size), batch_size)
+        sequences = np.zeros((len(lengths), MAX_LEN), dtype=np.int32)
+        for row, length in enumerate(lengths):
+            sequences[row, :length] = rng.integers(2, 1000, size=length)
+        batch_size = len(lengths)
+        mel_spectrograms = np.zeros((batch_size, *INPUT_SHAPE_AUDIO), dtype=np.float32)
+        # Two mel windows per clip, the second one padding on every other row
+        mel_windows = rng.random((batch_size, 2, *INPUT_SHAPE_AUDIO), dtype=np.float32)
+        audio_window_weights = np.ones((batch_size, 2), dtype=np.float32)
+        audio_window_weights[1::2, 1] = 0.0
+        images = np.zeros((batch_size, *INPUT_SHAPE_VISION), dtype=np.float32)
+        fused_embedding_input = {
+            # Non-zero text embeddings so the text-only parity check exercises the folded kernel
+            "text_embedding_input": rng.random((batch_size, TEXT_EMBEDDING_DIM), dtype=np.float32),
+            "audio_embedding_input": np.zeros((batch_size, AUDIO_EMBEDDING_DIM), dtype=np.float32),
+            "vision_embedding_input": np.zeros((batch_size, VISION_EMBEDDING_DIM), dtype=np.float32),
+        }
+        yield "text", lambda: self.text_extractor.predict(sequences, verbose=0), lambda: self.text_embeddings(sequences)
+        yield "audio", lambda: self.audio_extractor.predict(mel_spectrograms, verbose=0), lambda: self.audio_embeddings(mel_spectrograms)
+        yield "vision", lambda: self.vision_extractor.predict(images, verbose=0), lambda: self.vision_embeddings(images)
+        for tier, extractor in self.vision_tier_extractors.items():
+            tier_images = np.zeros((batch_size, *vision_tier_input_shape(tier)), dtype=np.float32)
+            yield (
+                f"vision_{tier}",
+                lambda extractor=extractor, tier_images=tier_images: extractor.predict(tier_images, verbose=0),
+                lambda tier=tier, tier_images=tier_images: self.vision_tier_embeddings(tier, tier_images),
+            )
+        yield (
+            "vision_head",
+            lambda: self.vision_encoder_model.predict(images, verbose=0),
+            lambda: self.vision_embeddings_and_probabilities(images)["vision_probabilities"],
+        )
+        yield "fusion", lambda: self.fusion_model.predict(fused_embedding_input, verbose=0), lambda: self.fuse(fused_embedding_input)
+        # Parity of the folded text-only variant against the full model with zero audio/vision
+        yield (
+            "text_only_fusion",
+            lambda: self.fusion_model.predict(fused_embedding_input, verbose=0),
+            lambda: self.fuse_text_only(fused_embedding_input["text_embedding_input"]),
+        )
+
+        def predict_pooled_audio():
+            window_embeddings = self.audio_extractor.predict(mel_windows.reshape(-1, *INPUT_SHAPE_AUDIO), verbose=0)
+            window_embeddings = window_embeddings.reshape(batch_size, mel_windows.shape[1], -1)
+            return np.stack([
+                pool_window_embeddings(embeddings, weights, self.audio_pooling)
+                for embeddings, weights in zip(window_embeddings, audio_window_weights)
+            ])
+
+        def chained_predict(has_audio=False, image=None):
+            return self.fusion_model.predict({
+                "text_embedding_input": self.text_extractor.predict(sequences, verbose=0),
+                "audio_embedding_input": predict_pooled_audio() if has_audio else fused_embedding_input["audio_embedding_input"],
+                "vision_embedding_input": self.vision_extractor.predict(image, verbose=0) if image is not None else fused_embedding_input["vision_embedding_input"],
+            }, verbose=0)
+
+        # Warms up every end-to-end signature so the first /chat turn does not pay for tracing
+        for (has_audio, has_vision), signature_name in SIGNATURE_NAMES.items():
+            mel, weights = (mel_windows, audio_window_weights) if has_audio else (None, None)
+            image = images if has_vision else None
+            yield (
+                f"end_to_end_{signature_name}",
+                lambda has_audio=has_audio, image=image: chained_predict(has_audio, image),
+                lambda mel=mel, weights=weights, image=image: self.run_end_to_end(sequences, mel, weights, image)["emotion_probabilities"],
+            )
+
+    def self_check(self, repeats=5, batch_size=1):
+        """
+        Warms up every traced graph and compares it with `predict()`.
+
+        Reports the median latency of both paths and the maximum absolute difference
+        between their outputs for each model. A difference above SELF_CHECK_TOLERANCE (or
+        SELF_CHECK_TOLERANCE_FLOAT16 for float16 NumPy fusion) is logged as an error.
+
+        Args:
+            repeats (int): Timed calls per path after one warm-up call.
+            batch_size (int): Dummy rows per text length (see bucket_boundary_lengths).
+
+        Returns:
+            dict: {model_name: {"predict_ms", "direct_ms", "speedup", "max_abs_diff", "ok"}}.
+        """
+        float16_fusion = self.numpy_fusion.dtype == np.float16
+        report = {}
+        for name, predict_fn, direct_fn in self._self_check_cases(batch_size):
+            expected = predict_fn() # Warm-up (and trace) both paths
+            actual = direct_fn()
+            timings = {}
+            for path, fn in (("predict", predict_fn), ("direct", direct_fn)):
+                samples = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    fn()
+                    samples.append(time.perf_counter() - start)
+                timings[path] = 1000 * float(np.median(samples))
+            report[name] = {
+                "predict_ms": round(timings["predict"], 3),
+                "direct_ms": round(timings["direct"], 3),
+                "speedup": round(timings["predict"] / timings["direct"], 2) if timings["direct"] > 0 else None,
+                "max_abs_diff": float(np.max(np.abs(np.asarray(expected) - actual))),
+            }
+            tolerance = SELF_CHECK_TOLERANCE_FLOAT16 if float16_fusion and name in ("fusion", "text_only_fusion") else SELF_CHECK_TOLERANCE
+            report[name]["ok"] = report[name]["max_abs_diff"] <= tolerance
+            logging.info(
+                f"Self-check [{name}]: predict {report[name]['predict_ms']} ms, direct {report[name]['direct_ms']} ms "
+                f"(x{report[name]['speedup']}), max |diff| {report[name]['max_abs_diff']:.2e}"
+            )
+            if not report[name]["ok"]:
+                logging.error(
+                    f"Self-check [{name}]: fast path differs from predict() by {report[name]['max_abs_diff']:.2e} "
+                    f"(tolerance {tolerance:.0e})."
+                )
+        self.self_check_report = report
+        return report
@@ -10,19 +10,29 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import tensorflow as tf
 import numpy as np
+import librosa
 import random
 import time
 
 # Import all modules using absolute paths
 from emotional_ai_llm.text_encoder import build_cnn_text_encoder, get_cnn_text_embeddings
-from emotional_ai_llm.audio_encoder import build_audio_cnn_encoder, get_audio_embeddings_cnn_model
-from emotional_ai_llm.vision_encoder import build_mobilenet_vision_encoder, get_vision_embeddings
+from emotional_ai_llm.audio_encoder import (
+    build_audio_cnn_encoder, get_audio_embeddings_cnn_model, window_weights, pool_window_embeddings,
+    DEFAULT_WINDOW_HOP_FRAMES, DEFAULT_MAX_WINDOWS,
+)
+from emotional_ai_llm.vision_encoder import (
+    build_mobilenet_vision_encoder, get_vision_embeddings, vision_tier_model_path, VISION_TIERS, DEFAULT_VISION_TIER,
+)
 from emotional_ai_llm.fusion_module import build_fusion_model
+from emotional_ai_llm.inference_session import InferenceSession
 from emotional_ai_llm.conversation_memory import ConversationMemory
 from emotional_ai_llm.response_planner import ResponsePlanner
 from emotional_ai_llm.safety_layer import SafetyLayer
 from emotional_ai_llm.output_actions import OutputActions
-from emotional_ai_llm.utils import create_text_tokenizer, texts_to_sequences_and_pad, extract_mel_spectrogram
+from emotional_ai_llm.utils import load_text_data, decode_audio_bytes
+from emotional_ai_llm.audio_frontend import MelFrontend, VoiceActivityStats, trim_silence, VAD_ENERGY_THRESHOLD_DBFS
+from emotional_ai_llm.text_vectorizer import TextVectorizer, fit_text_vectorizer
+from emotional_ai_llm.model_registry import get_model_registry
 
 # Define paths to saved models
 MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'models'))
@@ -30,6 +40,8 @@ TEXT_ENCODER_MODEL_PATH = os.path.join(MODELS_DIR, "cnn_text_encoder.keras")
 AUDIO_ENCODER_MODEL_PATH = os.path.join(MODELS_DIR, "audio_cnn_encoder.keras")
 VISION_ENCODER_MODEL_PATH = os.path.join(MODELS_DIR, "vision_mobilenet_encoder.keras")
 FUSION_MODEL_PATH = os.path.join(MODELS_DIR, "fusion_mlp_model.keras")
+TEXT_TOKENIZER_PATH = os.path.join(MODELS_DIR, "cnn_text_tokenizer.json")
+TEXT_CORPUS_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'raw', 'goemotions_1.csv'))
 
 # Constants (should ideally be imported from individual modules or a config file)
 # For simplicity, redefining some key constants here for the orchestration script.
@@ -39,6 +51,13 @@ TEXT_EMBEDDING_DIM = 128
 
 INPUT_SHAPE_AUDIO = (128, 44, 1) # (Mel bands, frames, channels)
 AUDIO_EMBEDDING_DIM = 128
+# Long clips are split into INPUT_SHAPE_AUDIO windows (hop in frames), encoded and pooled
+AUDIO_WINDOW_HOP_FRAMES = int(os.environ.get("NOVA_AUDIO_WINDOW_HOP", DEFAULT_WINDOW_HOP_FRAMES))
+AUDIO_MAX_WINDOWS = int(os.environ.get("NOVA_AUDIO_MAX_WINDOWS", DEFAULT_MAX_WINDOWS))
+AUDIO_POOLING = os.environ.get("NOVA_AUDIO_POOLING", "mean")
+# Voice-activity detection trims silence before feature extraction; silent clips are treated as no audio
+VAD_ENABLED = os.environ.get("NOVA_VAD_ENABLED", "1") == "1"
+VAD_THRESHOLD_DBFS = float(os.environ.get("NOVA_VAD_THRESHOLD_DB", VAD_ENERGY_THRESHOLD_DBFS))
 
 IMG_HEIGHT_VISION = 128
 IMG_WIDTH_VISION = 128
@@ -52,9 +71,49 @@ NUM_EMOTION_LABELS = len(EMOTION_LABELS)
 
 # Global model variables
 text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model = None, None, None, None
+text_vectorizer = None
+inference_session = None
+audio_frontend = None
+voice_activity_stats = VoiceActivityStats()
 
-def load_all_models():
-    """Loads all trained Keras models."""
+def load_vision_tier_models():
+    """
+    Loads the extra vision backbone tiers that have been exported to MODELS_DIR.
+
+    NOVA_VISION_TIERS (comma-separated) restricts which tiers are loaded; by default every
+    tier with a saved model is. Missing or broken tier models are skipped, not fatal.
+
+    Returns:
+        dict: {tier name: model} for the non-default tiers that were loaded.
+    """
+    requested = os.environ.get("NOVA_VISION_TIERS")
+    tiers = [tier.strip() for tier in requested.split(",")] if requested else list(VISION_TIERS)
+    models = {}
+    for tier in tiers:
+        if tier == DEFAULT_VISION_TIER or tier not in VISION_TIERS:
+            continue
+        path = vision_tier_model_path(tier, MODELS_DIR)
+        if not os.path.exists(path):
+            continue
+        try:
+            models[tier] = _load_keras_model(f"vision_{tier}", path)
+            logging.info(f"Loaded vision tier '{tier}' from {path}")
+        except Exception as e:
+            logging.error(f"Error loading vision tier '{tier}' from {path}: {e}")
+    return models
+
+def _load_keras_model(name, path):
+    """tf.keras.models.load_model, with the load time reported to the model registry."""
+    with get_model_registry().timed_load(name, origin="local"):
+        return tf.keras.models.load_model(path)
+
+def load_all_models(run_self_check=True):
+    """
+    Loads all trained Keras models and builds the InferenceSession used on the request path.
+
+    Returns:
+        tuple: (text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model, inference_session)
+    """
     logging.info("Loading models...")
     
     # Check for GPU availability for TensorFlow
@@ -71,16 +130,44 @@ def load_all_models():
         logging.info("TensorFlow did not detect any GPUs. Running on CPU.")
 
     try:
-        text_encoder_model = tf.keras.models.load_model(TEXT_ENCODER_MODEL_PATH)
-        audio_encoder_model = tf.keras.models.load_model(AUDIO_ENCODER_MODEL_PATH)
-        vision_encoder_model = tf.keras.models.load_model(VISION_ENCODER_MODEL_PATH)
-        fusion_model = tf.keras.models.load_model(FUSION_MODEL_PATH)
+        text_encoder_model = _load_keras_model("text_encoder", TEXT_ENCODER_MODEL_PATH)
+        audio_encoder_model = _load_keras_model("audio_encoder", AUDIO_ENCODER_MODEL_PATH)
+        vision_encoder_model = _load_keras_model("vision_encoder", VISION_ENCODER_MODEL_PATH)
+        fusion_model = _load_keras_model("fusion", FUSION_MODEL_PATH)
         logging.info("All models loaded successfully.")
-        return text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model
     except Exception as e:
         logging.error(f"Error loading models: {e}")
         sys.exit(1)
 
+    # Precision of the NumPy fusion runtime ("float32" or "float16")
+    fusion_dtype = np.dtype(os.environ.get("NOVA_FUSION_DTYPE", "float32"))
+    session = InferenceSession(
+        text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model,
+        fusion_dtype=fusion_dtype, audio_pooling=AUDIO_POOLING, vision_tier_models=load_vision_tier_models(),
+    )
+    if run_self_check:
+        # Warms up the traced graphs and logs predict() vs direct-call latency
+        session.self_check()
+    return text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model, session
+
+def load_text_vectorizer():
+    """
+    Loads the tokenizer artifact saved alongside the text encoder.
+    If it is missing, fits one on the training corpus and saves it for the next start.
+    """
+    if os.path.exists(TEXT_TOKENIZER_PATH):
+        logging.info(f"Loading text tokenizer artifact from {TEXT_TOKENIZER_PATH}")
+        return TextVectorizer.load(TEXT_TOKENIZER_PATH)
+
+    logging.warning(f"Text tokenizer artifact not found at {TEXT_TOKENIZER_PATH}. Fitting it on {TEXT_CORPUS_PATH}.")
+    texts, _ = load_text_data(TEXT_CORPUS_PATH, 'text', [])
+    if texts is None:
+        logging.error("Training corpus unavailable; every word will map to <unk>.")
+        return TextVectorizer([], MAX_LEN_TEXT, num_words=VOCAB_SIZE_TEXT)
+    vectorizer = fit_text_vectorizer(texts, VOCAB_SIZE_TEXT, MAX_LEN_TEXT)
+    vectorizer.save(TEXT_TOKENIZER_PATH)
+    return vectorizer
+
 def initialize_components():
     """Initializes other AI components."""
     logging.info("Initializing components...")
@@ -91,43 +178,134 @@ def initialize_components():
     logging.info("Components initialized successfully.")
     return memory, planner, safety_checker, output_handler
 
-def simulate_input_processing(text_input, audio_path=None, image_data=None, text_encoder_model=None, audio_encoder_model=None, vision_encoder_model=None):
-    """Simulates multimodal input processing."""
+def prepare_text_input(text_input, vectorizer=None):
+    """Tokenizes and pads a single text turn into a (1, MAX_LEN_TEXT) sequence for the CNN text encoder."""
+    global text_vectorizer
+    if vectorizer is None:
+        if text_vectorizer is None:
+            text_vectorizer = load_text_vectorizer()
+        vectorizer = text_vectorizer
+    return vectorizer.encode([text_input])
+
+def get_audio_frontend():
+    """Returns the shared mel frontend (filterbank and window are built on first use)."""
+    global audio_frontend
+    if audio_frontend is None:
+        audio_frontend = MelFrontend(n_mels=INPUT_SHAPE_AUDIO[0], n_frames=INPUT_SHAPE_AUDIO[1], hop_length=INPUT_SHAPE_AUDIO[1])
+    return audio_frontend
+
+def prepare_audio_input_with_stats(audio_path=None, audio_bytes=None):
+    """
+    Same as `prepare_audio_input`, but also returns the audio statistics of the clip.
+
+    Returns:
+        tuple: (audio_input dict or None, stats dict or None). The stats hold the
+               voice-activity fields of `trim_silence` (when VAD is enabled) plus
+               "encoded_s", "windows" and "coverage": the seconds of audio inside the
+               encoded mel windows, their count, and the fraction of the (silence-trimmed)
+               clip they cover. The stats are None when there is no audio.
+    """
+    frontend = get_audio_frontend()
+    try:
+        if audio_bytes:
+            y, _ = decode_audio_bytes(audio_bytes, sr=frontend.sr)
+        elif audio_path and os.path.exists(audio_path):
+            y, _ = librosa.load(audio_path, sr=frontend.sr)
+        else:
+            return None, None
+    except Exception as e:
+        logging.error(f"Error decoding audio input: {e}")
+        return None, None
+
+    stats = {"original_s": round(len(y) / frontend.sr, 3)}
+    if VAD_ENABLED:
+        y, vad_stats = trim_silence(y, frontend.sr, energy_threshold_dbfs=VAD_THRESHOLD_DBFS, hop_length=frontend.hop_length)
+        voice_activity_stats.record(vad_stats)
+        stats.update(vad_stats)
+        if y is None:
+            # Pure silence: skip the STFT and the audio CNN, the turn uses the zero audio embedding
+            stats.update(encoded_s=0.0, windows=0, coverage=0.0)
+            return None, stats
+
+    windows, energies, encoded_s = frontend.windows(y, hop_frames=AUDIO_WINDOW_HOP_FRAMES, max_windows=AUDIO_MAX_WINDOWS)
+    # Long clips only get AUDIO_MAX_WINDOWS windows; report how much of the clip they cover
+    stats.update(
+        encoded_s=round(encoded_s, 3),
+        windows=len(windows),
+        coverage=round(encoded_s * frontend.sr / len(y), 3) if len(y) else 1.0,
+    )
+    mel_spectrograms = np.zeros((1, AUDIO_MAX_WINDOWS, *INPUT_SHAPE_AUDIO), dtype=np.float32)
+    mel_spectrograms[0, :len(windows)] = windows
+    return {
+        "mel_spectrograms": mel_spectrograms,
+        "audio_window_weights": window_weights(energies, AUDIO_MAX_WINDOWS, AUDIO_POOLING)[np.newaxis],
+    }, stats
+
+def prepare_audio_input(audio_path=None, audio_bytes=None):
+    """
+    Converts an audio file, or encoded audio bytes held in memory, into mel windows for the
+    audio CNN: a dict with "mel_spectrograms" (1, AUDIO_MAX_WINDOWS, 128, 44, 1) and
+    "audio_window_weights" (1, AUDIO_MAX_WINDOWS), where weight 0 marks a padding slot.
+    Leading and trailing silence is trimmed first (NOVA_VAD_ENABLED).
+    Returns None when no usable audio is available, including clips that are pure silence.
+    """
+    return prepare_audio_input_with_stats(audio_path, audio_bytes)[0]
+
+def prepare_vision_input(image_data):
+    """
+    Adds a batch dimension to an already resized and normalized image.
+    Returns None when no image is available.
+    """
+    if image_data is None:
+        return None
+    return np.expand_dims(image_data, axis=0)
+
+def prepare_multimodal_inputs(text_input, audio_path=None, image_data=None, audio_bytes=None, vectorizer=None):
+    """
+    Builds the raw encoder inputs for one turn without running any model.
+    Audio may be given either as a file path or as encoded bytes held in memory.
+
+    Returns:
+        tuple: (text_sequence, audio_input dict or None, image_batch or None)
+    """
     logging.info(f"Processing user input: '{text_input}'")
+    return prepare_text_input(text_input, vectorizer), prepare_audio_input(audio_path, audio_bytes), prepare_vision_input(image_data)
+
+def simulate_input_processing(text_input, audio_path=None, image_data=None, text_encoder_model=None, audio_encoder_model=None, vision_encoder_model=None, inference_session=None):
+    """
+    Simulates multimodal input processing.
+    When an InferenceSession is given its pre-built graphs are used instead of the raw models.
+    """
+    text_sequence, audio_input, processed_image = prepare_multimodal_inputs(text_input, audio_path=audio_path, image_data=image_data)
 
     # Text Processing
-    dummy_texts = ["dummy text for tokenizer initialization"] # Dummy text to init tokenizer
-    text_tokenizer = create_text_tokenizer(dummy_texts, num_words=VOCAB_SIZE_TEXT) 
-    
-    text_sequence = texts_to_sequences_and_pad(text_tokenizer, [text_input], MAX_LEN_TEXT)
-    text_embedding = get_cnn_text_embeddings(text_encoder_model, text_sequence)
+    if inference_session is not None:
+        text_embedding = inference_session.text_embeddings(text_sequence)
+    else:
+        text_embedding = get_cnn_text_embeddings(text_encoder_model, text_sequence)
     logging.debug(f"Text embedding shape: {text_embedding.shape}")
 
-    # Audio Processing (Placeholder)
-    if audio_path and os.path.exists(audio_path):
-        mel_spec = extract_mel_spectrogram(audio_path, n_mels=INPUT_SHAPE_AUDIO[0], hop_length=INPUT_SHAPE_AUDIO[1])
-        if mel_spec is not None:
-            mel_spec = np.expand_dims(mel_spec, axis=0) # Add batch dim
-            mel_spec = np.expand_dims(mel_spec, axis=-1) # Add channel dim
-            if mel_spec.shape[2] > INPUT_SHAPE_AUDIO[1]:
-                mel_spec = tf.image.resize(mel_spec, (INPUT_SHAPE_AUDIO[0], INPUT_SHAPE_AUDIO[1]))
-            elif mel_spec.shape[2] < INPUT_SHAPE_AUDIO[1]:
-                pad_width = INPUT_SHAPE_AUDIO[1] - mel_spec.shape[2]
-                mel_spec = np.pad(mel_spec, ((0,0),(0,0),(0,pad_width),(0,0)), mode='constant')
-            audio_embedding = get_audio_embeddings_cnn_model(audio_encoder_model, mel_spec)
+    # Audio Processing (mel windows encoded in one batch and pooled into one embedding)
+    if audio_input is not None:
+        mel_windows, weights = audio_input["mel_spectrograms"], audio_input["audio_window_weights"]
+        if inference_session is not None:
+            audio_embedding = inference_session.pooled_audio_embeddings(mel_windows, weights)
         else:
-            # Use zeros for missing audio to avoid adding random noise to the fusion
-            audio_embedding = np.zeros((1, AUDIO_EMBEDDING_DIM), dtype=np.float32)
+            valid = weights[0] > 0
+            window_embeddings = get_audio_embeddings_cnn_model(audio_encoder_model, mel_windows[0][valid])
+            audio_embedding = pool_window_embeddings(window_embeddings, weights[0][valid], AUDIO_POOLING)[np.newaxis]
     else:
+        # Use zeros for missing audio to avoid adding random noise to the fusion
         audio_embedding = np.zeros((1, AUDIO_EMBEDDING_DIM), dtype=np.float32)
     logging.debug(f"Audio embedding shape: {audio_embedding.shape}")
 
     # Vision Processing (Real)
-    if image_data is not None:
+    if processed_image is not None:
         # Assuming image_data is already preprocessed (resized and normalized) from app.py
-        # Add batch dimension
-        processed_image = np.expand_dims(image_data, axis=0)
-        vision_embedding = get_vision_embeddings(vision_encoder_model, processed_image)
+        if inference_session is not None:
+            vision_embedding = inference_session.vision_embeddings(processed_image)
+        else:
+            vision_embedding = get_vision_embeddings(vision_encoder_model, processed_image)
     else:
         # Use zeros for missing vision to avoid adding random noise
         vision_embedding = np.zeros((1, VISION_EMBEDDING_DIM), dtype=np.float32)
@@ -137,8 +315,8 @@ def simulate_input_processing(text_input, audio_path=None, image_data=None, text
 
 def main_orchestrator():
     """Orchestrates the end-to-end functionality of the emotional AI LLM."""
-    global text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model # Declare global here
-    text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model = load_all_models()
+    global text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model, inference_session # Declare global here
+    text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model, inference_session = load_all_models()
     memory, planner, safety_checker, output_handler = initialize_components()
 
     logging.info("\n--- Starting Emotional AI Agent Conversation ---")
@@ -170,17 +348,13 @@ def main_orchestrator():
             user_input_text, 
             text_encoder_model=text_encoder_model, 
             audio_encoder_model=audio_encoder_model, 
-            vision_encoder_model=vision_encoder_model
+            vision_encoder_model=vision_encoder_model,
+            inference_session=inference_session
         )
         logging.debug("Multimodal embeddings generated.")
 
-        # 3. Fuse Embeddings
-        fused_embedding_input = {
-            "text_embedding_input": text_emb,
-            "audio_embedding_input": audio_emb,
-            "vision_embedding_input": vision_emb
-        }
-        fused_output_raw = fusion_model.predict(fused_embedding_input)
+        # 3. Fuse Embeddings (the console loop is text-only, so the folded text-only variant is used)
+        fused_output_raw = inference_session.fuse_text_only(text_emb)
         
         emotion_probabilities = fused_output_raw[0] if isinstance(fused_output_raw, list) else fused_output_raw[0]
         logging.debug(f"Fused emotion probabilities: {emotion_probabilities}")
@@ -0,0 +1,413 @@
+# emotional_ai_llm/model_registry.py
+
+# Local, offline-first store for the pretrained weights the server would otherwise fetch
+# from remote hubs at startup (Chat SLMs, the NLP emotion classifier, MobileNetV2 ImageNet
+# weights). A manifest records where every model came from and the checksum of each of its
+# files; `python -m emotional_ai_llm.model_registry populate` fills the store on a machine
+# with network access. Kept free of torch/TensorFlow imports at module level.
+
+import contextlib
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import threading
+import time
+
+# Defaults (overridable through environment variables, see ModelRegistry.from_env)
+DEFAULT_REGISTRY_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'models', 'registry'))
+DEFAULT_VERIFY_MODE = "size" # "none", "size" (file sizes) or "full" (SHA-256 of every file)
+VERIFY_MODES = ("none", "size", "full")
+
+MANIFEST_NAME = "manifest.json"
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# Local checkpoint produced by fine_tune_t5.py
+T5_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fine_tuned_empathetic_t5", "final_model")
+
+# Models the registry knows how to populate. Transformers classes are named, not imported,
+# so this module stays import-light.
+REGISTRY_MODELS = {
+    "blenderbot": {
+        "kind": "transformers", "source": "facebook/blenderbot-400M-distill",
+        "model_class": "BlenderbotForConditionalGeneration", "tokenizer_class": "BlenderbotTokenizer",
+    },
+    "t5": {
+        "kind": "transformers", "source": T5_MODEL_PATH,
+        "model_class": "AutoModelForSeq2SeqLM", "tokenizer_class": "AutoTokenizer",
+    },
+    "nlp_emotion": {
+        "kind": "transformers", "source": "j-hartmann/emotion-english-distilroberta-base",
+        "model_class": "AutoModelForSequenceClassification", "tokenizer_class": "AutoTokenizer",
+    },
+    "mobilenet_v2_imagenet": {"kind": "keras_weights", "source": "keras.applications.MobileNetV2(weights='imagenet')"},
+}
+
+# safetensors dtype codes -> torch dtype names
+SAFETENSORS_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+
+
+class ModelRegistryError(RuntimeError):
+    """Raised when a model is not available locally and the registry is offline."""
+
+
+def mobilenet_weights_filename(alpha, resolution):
+    """Registry file holding the ImageNet MobileNetV2 backbone (no top) for one width and input size."""
+    return f"mobilenet_v2_{float(alpha)}_{int(resolution)}_no_top.weights.h5"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_safetensors_mmap(path):
+    """
+    Reads a safetensors file into tensors that are views of a copy-on-write mmap of the file.
+
+    Pages stay in the shared page cache until a tensor is written to, so every process on
+    the node that loads the same file shares one copy of the weights.
+
+    Returns:
+        dict: {name: torch.Tensor}
+    """
+    import torch
+
+    with open(path, "rb") as f:
+        header_len = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_len))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    buffer = torch.frombuffer(mapped, dtype=torch.uint8)
+    data_start = 8 + header_len
+
+    state_dict = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        start, end = info["data_offsets"]
+        raw = buffer[data_start + start:data_start + end]
+        dtype = getattr(torch, SAFETENSORS_DTYPES[info["dtype"]])
+        try:
+            tensor = raw.view(dtype)
+        except RuntimeError:
+            # Offset not aligned to the element size: this tensor gets a private copy
+            tensor = raw.clone().view(dtype)
+        state_dict[name] = tensor.reshape(info["shape"])
+    return state_dict
+
+
+def load_pretrained(model_class, model_name_or_path, **kwargs):
+    """
+    `model_class.from_pretrained`, except that a local safetensors checkpoint (no extra
+    kwargs) is loaded without reading its weights: the model is built with its parameters
+    on the meta device and then assigned tensors backed by a shared mmap of the file (see
+    load_safetensors_mmap). Startup neither reads the weights twice nor holds two copies.
+
+    Hub names, other checkpoint formats and checkpoints that do not cover every parameter
+    (or are stored in another dtype) load normally.
+    """
+    weight_files = []
+    if not kwargs and os.path.isdir(model_name_or_path):
+        weight_files = sorted(name for name in os.listdir(model_name_or_path) if name.endswith(".safetensors"))
+    if not weight_files:
+        return model_class.from_pretrained(model_name_or_path, **kwargs)
+
+    import torch
+    from accelerate import init_empty_weights
+    from transformers import AutoConfig, GenerationConfig
+
+    state_dict = {}
+    for name in weight_files:
+        state_dict.update(load_safetensors_mmap(os.path.join(model_name_or_path, name)))
+    if any(tensor.is_floating_point() and tensor.dtype != torch.get_default_dtype() for tensor in state_dict.values()):
+        # from_pretrained would convert these, i.e. copy them anyway
+        return model_class.from_pretrained(model_name_or_path)
+
+    config = AutoConfig.from_pretrained(model_name_or_path)
+    with init_empty_weights(): # Parameters on the meta device; buffers are small and built normally
+        model = model_class.from_config(config) if hasattr(model_class, "from_config") else model_class(config)
+    model.load_state_dict(state_dict, strict=False, assign=True)
+    # Tied weights (e.g. lm_head <-> shared embeddings) are stored once and must be re-tied
+    model.tie_weights()
+    if any(parameter.is_meta for parameter in model.parameters()):
+        logging.warning(f"{model_name_or_path} does not cover every parameter; loading it without mmap.")
+        return model_class.from_pretrained(model_name_or_path)
+    if getattr(model, "generation_config", None) is not None:
+        try:
+            model.generation_config = GenerationConfig.from_pretrained(model_name_or_path)
+        except OSError:
+            pass # No generation_config.json: keep the defaults derived from the model config
+    return model.eval()
+
+
+class ModelRegistry:
+    def __init__(self, root=DEFAULT_REGISTRY_DIR, offline=False, verify=DEFAULT_VERIFY_MODE):
+        """
+        Directory of locally stored models with a manifest:
+
+            <root>/manifest.json
+            <root>/<name>/...   (save_pretrained output with safetensors weights, or Keras weight files)
+
+        `resolve` returns the local copy of a registered model, and otherwise the remote
+        source (or raises ModelRegistryError when `offline`). Local copies are checked
+        against the manifest before use; a copy that fails the check counts as missing.
+        Every component reports its load time here, for the startup report and /metrics.
+
+        Args:
+            root (str): Registry directory.
+            offline (bool): Never fall back to remote sources.
+            verify (str): Check done before a local copy is used: "none", "size" or "full" (SHA-256).
+        """
+        if verify not in VERIFY_MODES:
+            raise ValueError(f"Unknown verify mode '{verify}', expected one of {VERIFY_MODES}.")
+        self.root = root
+        self.offline = offline
+        self.verify_mode = verify
+        self._lock = threading.Lock()
+        self._verified = {} # name -> bool, so each model is checked once per process
+        self._origins = {} # name -> "registry", "local" or "remote", as last resolved
+        self._loads = {} # name -> {"seconds", "origin", "ok"}
+        self._manifest = self._read_manifest()
+
+    @classmethod
+    def from_env(cls):
+        """Builds a registry configured from NOVA_MODEL_REGISTRY_DIR, NOVA_OFFLINE and NOVA_MODEL_REGISTRY_VERIFY."""
+        return cls(
+            root=os.environ.get("NOVA_MODEL_REGISTRY_DIR", DEFAULT_REGISTRY_DIR),
+            offline=os.environ.get("NOVA_OFFLINE", "0") == "1",
+            verify=os.environ.get("NOVA_MODEL_REGISTRY_VERIFY", DEFAULT_VERIFY_MODE),
+        )
+
+    # --- Manifest ---
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, MANIFEST_NAME)
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {"models": {}}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
+
+    def model_dir(self, name):
+        return os.path.join(self.root, name)
+
+    def entries(self):
+        with self._lock:
+            return dict(self._manifest["models"])
+
+    def register(self, name, kind, source):
+        """Records the files currently in `<root>/<name>` (with sizes and SHA-256) in the manifest."""
+        directory = self.model_dir(name)
+        files = {}
+        for dirpath, _, filenames in os.walk(directory):
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                files[os.path.relpath(path, directory)] = {"bytes": os.path.getsize(path), "sha256": file_sha256(path)}
+        with self._lock:
+            self._manifest["models"][name] = {
+                "kind": kind, "source": source, "files": files, "registered_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            self._verified.pop(name, None)
+            self._write_manifest()
+
+    # --- Lookup ---
+
+    def verify(self, name, mode=None):
+        """
+        Checks a registered model's files against the manifest.
+
+        Returns:
+            bool: True if every file is present and matches (by size, or SHA-256 in "full" mode).
+        """
+        mode = mode or self.verify_mode
+        entry = self.entries().get(name)
+        if entry is None:
+            return False
+        directory = self.model_dir(name)
+        for relative_path, expected in entry["files"].items():
+            path = os.path.join(directory, relative_path)
+            if not os.path.exists(path):
+                logging.error(f"Model registry: '{name}' is missing {relative_path}.")
+                return False
+            if mode in ("size", "full") and os.path.getsize(path) != expected["bytes"]:
+                logging.error(f"Model registry: size mismatch for {name}/{relative_path}.")
+                return False
+            if mode == "full" and file_sha256(path) != expected["sha256"]:
+                logging.error(f"Model registry: checksum mismatch for {name}/{relative_path}.")
+                return False
+        return True
+
+    def _available(self, name):
+        with self._lock:
+            if name in self._verified:
+                return self._verified[name]
+        available = self.verify(name)
+        with self._lock:
+            self._verified[name] = available
+        return available
+
+    def resolve(self, name, source):
+        """
+        Where to load a model from.
+
+        Args:
+            name (str): Registry name (see REGISTRY_MODELS).
+            source (str): Hub name or path to use when the model is not registered.
+
+        Returns:
+            str: The local registry directory, or `source` (always allowed when it is a local path).
+        """
+        if self._available(name):
+            self._set_origin(name, "registry")
+            return self.model_dir(name)
+        if os.path.exists(source):
+            self._set_origin(name, "local")
+            return source
+        if self.offline:
+            raise ModelRegistryError(
+                f"Model '{name}' is not in the registry at {self.root} and NOVA_OFFLINE=1. "
+                f"Run `python -m emotional_ai_llm.model_registry populate --models {name}` on a connected machine."
+            )
+        logging.warning(f"Model '{name}' is not in the local registry; loading it from {source}.")
+        self._set_origin(name, "remote")
+        return source
+
+    def _set_origin(self, name, origin):
+        with self._lock:
+            self._origins[name] = origin
+
+    def file_path(self, name, filename):
+        """Path of one file of a registered model, or None if the model or file is not available."""
+        if not self._available(name):
+            return None
+        path = os.path.join(self.model_dir(name), filename)
+        return path if os.path.exists(path) else None
+
+    # --- Load timing ---
+
+    @contextlib.contextmanager
+    def timed_load(self, name, origin=None):
+        """Context manager recording how long a component took to load `name`, and where from."""
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            with self._lock:
+                origin = origin or self._origins.get(name, "remote")
+                self._loads[name] = {"seconds": round(time.perf_counter() - started, 3), "origin": origin, "ok": ok}
+
+    def log_load_report(self):
+        """Logs one line per loaded model, slowest first."""
+        with self._lock:
+            loads = sorted(self._loads.items(), key=lambda item: item[1]["seconds"], reverse=True)
+        for name, load in loads:
+            status = "" if load["ok"] else " (FAILED)"
+            logging.info(f"Model load: {name:<28} {load['seconds']:8.3f} s from {load['origin']}{status}")
+        logging.info(f"Model load total: {sum(load['seconds'] for _, load in loads):.3f} s")
+
+    def get_metrics(self):
+        with self._lock:
+            return {
+                "root": self.root,
+                "offline": self.offline,
+                "registered": sorted(self._manifest["models"]),
+                "loads": {name: dict(load) for name, load in self._loads.items()},
+            }
+
+    # --- Populating (needs network access) ---
+
+    def populate(self, name):
+        """Downloads (or copies) one of REGISTRY_MODELS into the registry and records it in the manifest."""
+        spec = REGISTRY_MODELS[name]
+        directory = self.model_dir(name)
+        partial = directory + ".partial"
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(partial)
+
+        if spec["kind"] == "transformers":
+            import transformers
+
+            model = getattr(transformers, spec["model_class"]).from_pretrained(spec["source"])
+            model.save_pretrained(partial, safe_serialization=True)
+            getattr(transformers, spec["tokenizer_class"]).from_pretrained(spec["source"]).save_pretrained(partial)
+        elif spec["kind"] == "keras_weights":
+            from tensorflow.keras.applications import MobileNetV2
+            from .vision_encoder import VISION_TIERS
+
+            for tier in VISION_TIERS.values():
+                filename = mobilenet_weights_filename(tier["alpha"], tier["resolution"])
+                if os.path.exists(os.path.join(partial, filename)):
+                    continue
+                resolution = tier["resolution"]
+                base_model = MobileNetV2(input_shape=(resolution, resolution, 3), alpha=tier["alpha"],
+                                         include_top=False, weights="imagenet")
+                base_model.save_weights(os.path.join(partial, filename))
+        else:
+            raise ValueError(f"Unknown model kind '{spec['kind']}'.")
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(partial, directory)
+        self.register(name, spec["kind"], spec["source"])
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_model_registry():
+    """The process-wide registry configured from the environment (see ModelRegistry.from_env)."""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = ModelRegistry.from_env()
+        return _default_registry
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Manage the local model registry used for offline startup.")
+    parser.add_argument("command", choices=["populate", "verify", "list"])
+    parser.add_argument("--models", nargs="+", default=list(REGISTRY_MODELS), choices=list(REGISTRY_MODELS))
+    parser.add_argument("--root", default=os.environ.get("NOVA_MODEL_REGISTRY_DIR", DEFAULT_REGISTRY_DIR))
+    args = parser.parse_args()
+
+    registry = ModelRegistry(root=args.root, verify="full")
+    if args.command == "populate":
+        for name in args.models:
+            print(f"Populating '{name}' from {REGISTRY_MODELS[name]['source']}...")
+            started = time.perf_counter()
+            try:
+                registry.populate(name)
+                print(f"  done in {time.perf_counter() - started:.1f} s")
+            except Exception as e:
+                print(f"  failed: {e}")
+    elif args.command == "verify":
+        for name in args.models:
+            print(f"{name:<24} {'ok' if registry.verify(name, 'full') else 'MISSING OR CORRUPT'}")
+    else:
+        for name, entry in registry.entries().items():
+            total_mb = sum(file["bytes"] for file in entry["files"].values()) / (1024 * 1024)
+            print(f"{name:<24} {total_mb:9.1f} MB  {len(entry['files'])} file(s)  from {entry['source']}  ({entry['registered_at']})")
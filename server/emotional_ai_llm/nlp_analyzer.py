@@ -1,11 +1,20 @@
-from transformers import pipeline
+from transformers import pipeline, AutoModelForSequenceClassification, AutoTokenizer
 import logging
 import torch
 
+from .embedding_cache import content_key, normalize_text
+from .model_registry import REGISTRY_MODELS, get_model_registry, load_pretrained
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class TextEmotionAnalyzer:
-    def __init__(self):
+    def __init__(self, cache=None):
+        """
+        Args:
+            cache (EmbeddingCache, optional): Caches probabilities per normalized text, so
+                                              repeated phrases skip the transformer.
+        """
+        self.cache = cache
         logging.info("Loading NLP-based emotion analysis pipeline...")
         
         # Determine device for pipeline (0 is GPU, -1 is CPU)
@@ -13,14 +22,18 @@ class TextEmotionAnalyzer:
         device = -1 
         logging.info(f"NLP emotion pipeline will run on device index: {device} (CPU)")
 
+        registry = get_model_registry()
         try:
-            # Use a small, fast model for emotion detection
-            self.nlp_pipeline = pipeline(
-                "text-classification", 
-                model="j-hartmann/emotion-english-distilroberta-base", 
-                top_k=None, # Return all scores
-                device=device
-            )
+            # Use a small, fast model for emotion detection, from the local model registry when populated
+            model_path = registry.resolve("nlp_emotion", REGISTRY_MODELS["nlp_emotion"]["source"])
+            with registry.timed_load("nlp_emotion"):
+                self.nlp_pipeline = pipeline(
+                    "text-classification",
+                    model=load_pretrained(AutoModelForSequenceClassification, model_path),
+                    tokenizer=AutoTokenizer.from_pretrained(model_path),
+                    top_k=None, # Return all scores
+                    device=device
+                )
             logging.info("NLP emotion pipeline loaded successfully.")
         except Exception as e:
             logging.error(f"Failed to load NLP emotion pipeline: {e}")
@@ -34,6 +47,12 @@ class TextEmotionAnalyzer:
         if not self.nlp_pipeline or not text:
             return {}
 
+        cache_key = content_key(normalize_text(text)) if self.cache is not None else None
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         try:
             results = self.nlp_pipeline(text)[0] # List of dicts [{'label': 'joy', 'score': 0.9}, ...]
             
@@ -50,7 +69,9 @@ class TextEmotionAnalyzer:
                 label = res['label']
                 mapped_label = label_map.get(label, label)
                 emotion_probs[mapped_label] = res['score']
-            
+
+            if cache_key is not None:
+                self.cache.put(cache_key, emotion_probs)
             return emotion_probs
         except Exception as e:
             logging.error(f"Error in NLP emotion analysis: {e}")
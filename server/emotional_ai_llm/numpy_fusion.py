@@ -0,0 +1,219 @@
+# emotional_ai_llm/numpy_fusion.py
+
+# TensorFlow-free runtime for the fusion MLP. The exporter needs a Keras model, but
+# loading the .npz and running inference only uses NumPy.
+
+import os
+import threading
+
+import numpy as np
+
+FUSION_WEIGHTS_PATH = "models/fusion_mlp_weights.npz"
+DEFAULT_MAX_BATCH_SIZE = 64
+
+SUPPORTED_ACTIVATIONS = ("linear", "relu", "sigmoid", "softmax")
+
+
+def _apply_activation_inplace(values, activation):
+    """Applies an activation to `values` without allocating new arrays (except for softmax)."""
+    if activation == "relu":
+        np.maximum(values, 0, out=values)
+    elif activation == "sigmoid":
+        # 1 / (1 + exp(-x)); exp overflow to inf correctly yields 0
+        with np.errstate(over="ignore"):
+            np.negative(values, out=values)
+            np.exp(values, out=values)
+        values += 1
+        np.reciprocal(values, out=values)
+    elif activation == "softmax":
+        values -= values.max(axis=-1, keepdims=True)
+        np.exp(values, out=values)
+        values /= values.sum(axis=-1, keepdims=True)
+
+
+def export_fusion_weights(fusion_model, output_path=FUSION_WEIGHTS_PATH):
+    """
+    Dumps the Dense layers of a fusion model (full or text-only variant) to a compact .npz.
+
+    Args:
+        fusion_model (tf.keras.Model): Model made of concatenated inputs followed by Dense layers.
+        output_path (str): Path of the .npz file.
+
+    Returns:
+        str: The path written.
+    """
+    from tensorflow.keras import layers # Only the exporter needs TensorFlow
+
+    input_names = [tensor.name.split(":")[0] for tensor in fusion_model.inputs]
+    input_dims = [int(tensor.shape[-1]) for tensor in fusion_model.inputs]
+    dense_layers = [layer for layer in fusion_model.layers if isinstance(layer, layers.Dense)]
+
+    arrays = {
+        "input_names": np.array(input_names),
+        "input_dims": np.array(input_dims, dtype=np.int64),
+        "activations": np.array([layer.activation.__name__ for layer in dense_layers]),
+    }
+    for i, layer in enumerate(dense_layers):
+        kernel, bias = layer.get_weights()
+        arrays[f"kernel_{i}"] = kernel.astype(np.float32)
+        arrays[f"bias_{i}"] = bias.astype(np.float32)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    np.savez(output_path, **arrays)
+    print(f"Fusion MLP weights exported to {output_path}")
+    return output_path
+
+
+class NumpyFusionMLP:
+    def __init__(self, input_names, input_dims, kernels, biases, activations, dtype=np.float32, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+        """
+        Vectorized NumPy inference for the fusion MLP.
+
+        Inputs are written straight into a preallocated (max_batch_size, sum(input_dims))
+        buffer instead of being concatenated, and every layer computes into its own
+        preallocated output buffer with in-place bias and activation. Buffers are kept per
+        thread, so one instance can be shared by the InferenceExecutor's workers. Larger
+        batches are processed in `max_batch_size` chunks.
+
+        Args:
+            input_names (list): Input names in concatenation order (e.g. "text_embedding_input").
+            input_dims (list): Width of each input.
+            kernels, biases (list): Dense weights, one entry per layer.
+            activations (list): Activation names, one per layer (see SUPPORTED_ACTIVATIONS).
+            dtype: np.float32 or np.float16 compute precision. Outputs are always float32.
+            max_batch_size (int): Rows per preallocated buffer.
+        """
+        for activation in activations:
+            if activation not in SUPPORTED_ACTIVATIONS:
+                raise ValueError(f"Unsupported activation '{activation}' in fusion MLP.")
+        self.input_names = [str(name) for name in input_names]
+        self.input_dims = [int(dim) for dim in input_dims]
+        self.dtype = np.dtype(dtype)
+        self.max_batch_size = max_batch_size
+        self.kernels = [np.ascontiguousarray(kernel, dtype=self.dtype) for kernel in kernels]
+        self.biases = [np.asarray(bias, dtype=self.dtype) for bias in biases]
+        self.activations = [str(activation) for activation in activations]
+        self.output_dim = self.kernels[-1].shape[1]
+        self._buffers = threading.local()
+
+    @classmethod
+    def load(cls, path=FUSION_WEIGHTS_PATH, dtype=np.float32, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+        """Loads weights written by `export_fusion_weights`."""
+        with np.load(path, allow_pickle=False) as data:
+            num_layers = len(data["activations"])
+            return cls(
+                data["input_names"].tolist(), data["input_dims"].tolist(),
+                [data[f"kernel_{i}"] for i in range(num_layers)],
+                [data[f"bias_{i}"] for i in range(num_layers)],
+                data["activations"].tolist(),
+                dtype=dtype, max_batch_size=max_batch_size,
+            )
+
+    @classmethod
+    def from_keras_model(cls, fusion_model, dtype=np.float32, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+        """Builds the runtime directly from a Keras fusion model (no file round-trip)."""
+        from tensorflow.keras import layers
+
+        dense_layers = [layer for layer in fusion_model.layers if isinstance(layer, layers.Dense)]
+        weights = [layer.get_weights() for layer in dense_layers]
+        return cls(
+            [tensor.name.split(":")[0] for tensor in fusion_model.inputs],
+            [int(tensor.shape[-1]) for tensor in fusion_model.inputs],
+            [kernel for kernel, _ in weights], [bias for _, bias in weights],
+            [layer.activation.__name__ for layer in dense_layers],
+            dtype=dtype, max_batch_size=max_batch_size,
+        )
+
+    def _thread_buffers(self):
+        buffers = getattr(self._buffers, "arrays", None)
+        if buffers is None:
+            widths = [sum(self.input_dims)] + [kernel.shape[1] for kernel in self.kernels]
+            buffers = [np.empty((self.max_batch_size, width), dtype=self.dtype) for width in widths]
+            self._buffers.arrays = buffers
+        return buffers
+
+    def _forward_chunk(self, inputs, start, stop):
+        rows = stop - start
+        buffers = self._thread_buffers()
+        activations = buffers[0][:rows]
+        offset = 0
+        for array, dim in zip(inputs, self.input_dims):
+            activations[:, offset:offset + dim] = array[start:stop]
+            offset += dim
+
+        for kernel, bias, activation, buffer in zip(self.kernels, self.biases, self.activations, buffers[1:]):
+            output = buffer[:rows]
+            np.matmul(activations, kernel, out=output)
+            output += bias
+            _apply_activation_inplace(output, activation)
+            activations = output
+        return activations
+
+    def predict(self, inputs):
+        """
+        Runs the MLP on a batch.
+
+        Args:
+            inputs (dict or np.array): Arrays keyed by input name (as passed to `fusion_model.predict`),
+                                       or a single array for single-input models.
+
+        Returns:
+            np.array: float32 array of shape (N, output_dim).
+        """
+        if isinstance(inputs, dict):
+            arrays = [np.asarray(inputs[name]) for name in self.input_names]
+        else:
+            arrays = [np.asarray(inputs)]
+        arrays = [array.reshape(len(array), -1) for array in arrays]
+        num_rows = len(arrays[0])
+
+        result = np.empty((num_rows, self.output_dim), dtype=np.float32)
+        for start in range(0, num_rows, self.max_batch_size):
+            stop = min(start + self.max_batch_size, num_rows)
+            result[start:stop] = self._forward_chunk(arrays, start, stop)
+        return result
+
+    __call__ = predict
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    import tensorflow as tf
+
+    parser = argparse.ArgumentParser(description="Export the fusion MLP to .npz and compare NumPy vs Keras inference.")
+    parser.add_argument("--model", default="models/fusion_mlp_model.keras")
+    parser.add_argument("--output", default=FUSION_WEIGHTS_PATH)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    fusion_model = tf.keras.models.load_model(args.model)
+    export_fusion_weights(fusion_model, args.output)
+
+    def median_ms(fn):
+        fn() # Warm-up
+        samples = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        return 1000 * float(np.median(samples))
+
+    rng = np.random.default_rng(0)
+    for batch_size in (1, 16, 64):
+        inputs = {
+            name: rng.random((batch_size, int(tensor.shape[-1])), dtype=np.float32)
+            for name, tensor in zip((t.name.split(":")[0] for t in fusion_model.inputs), fusion_model.inputs)
+        }
+        expected = fusion_model.predict(inputs, verbose=0)
+        keras_ms = median_ms(lambda: fusion_model.predict(inputs, verbose=0))
+        direct_ms = median_ms(lambda: fusion_model(inputs, training=False))
+        for dtype in (np.float32, np.float16):
+            runtime = NumpyFusionMLP.load(args.output, dtype=dtype)
+            diff = float(np.max(np.abs(runtime.predict(inputs) - expected)))
+            numpy_ms = median_ms(lambda: runtime.predict(inputs))
+            print(
+                f"batch={batch_size:>3} {np.dtype(dtype).name}: max |diff| {diff:.2e} | "
+                f"predict {keras_ms:.3f} ms, model() {direct_ms:.3f} ms, numpy {numpy_ms:.3f} ms"
+            )
@@ -0,0 +1,251 @@
+# emotional_ai_llm/preprocessing.py
+
+# Request-path decoding helpers. Kept free of TensorFlow imports so they can be
+# shipped to the InferenceExecutor's preprocessing process pool cheaply.
+
+import base64
+import os
+import struct
+
+import cv2
+import numpy as np
+
+# Payload limits, checked before any pixel is decoded
+MAX_IMAGE_BYTES = int(os.environ.get("NOVA_MAX_IMAGE_BYTES", 8 * 1024 * 1024))
+MAX_IMAGE_PIXELS = int(os.environ.get("NOVA_MAX_IMAGE_PIXELS", 4096 * 4096))
+
+# cv2.imdecode flags decoding at 1/2, 1/4 and 1/8 scale (DCT-domain scaling for JPEG)
+REDUCED_DECODE_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+# Face crop: frames are decoded at FACE_DECODE_SCALE x the encoder input so the face ROI keeps
+# enough resolution, and the largest Haar-cascade detection is cropped with a relative margin
+FACE_CROP_ENABLED = os.environ.get("NOVA_FACE_CROP", "1") == "1"
+FACE_DECODE_SCALE = 2
+FACE_CROP_MARGIN = 0.25
+FACE_CASCADE_PATH = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+
+_face_cascade = None # Loaded lazily, once per (preprocessing) process
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, ...) carry the image size
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image payload exceeds MAX_IMAGE_BYTES or MAX_IMAGE_PIXELS."""
+
+
+def strip_data_url(payload):
+    """
+    Removes a `data:<mime>;base64,` prefix from a base64 payload if present.
+
+    Args:
+        payload (str): Base64 string, optionally in data-URL form.
+
+    Returns:
+        str: The bare base64 string.
+    """
+    if "base64," in payload:
+        _, payload = payload.split("base64,", 1)
+    return payload
+
+
+def image_dimensions(image_bytes):
+    """
+    Reads the width and height of a JPEG or PNG from its header, without decoding it.
+
+    Args:
+        image_bytes (bytes): Encoded image file contents.
+
+    Returns:
+        tuple: (width, height), or None for other formats or an unreadable header.
+    """
+    if image_bytes[:8] == b"\x89PNG\r\n\x1a\n" and len(image_bytes) >= 24:
+        return struct.unpack(">II", image_bytes[16:24])
+    if image_bytes[:2] != b"\xff\xd8":
+        return None
+    offset = 2
+    while offset + 4 <= len(image_bytes):
+        if image_bytes[offset] != 0xFF:
+            return None
+        marker = image_bytes[offset + 1]
+        if marker == 0xFF: # Fill byte
+            offset += 1
+            continue
+        if marker in (0x01, *range(0xD0, 0xD8)): # Markers without a length field
+            offset += 2
+            continue
+        (segment_length,) = struct.unpack(">H", image_bytes[offset + 2:offset + 4])
+        if marker in JPEG_SOF_MARKERS and offset + 9 <= len(image_bytes):
+            height, width = struct.unpack(">HH", image_bytes[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + segment_length
+    return None
+
+
+def check_image_payload(image_bytes):
+    """
+    Rejects oversize images before decoding.
+
+    Args:
+        image_bytes (bytes): Encoded image file contents.
+
+    Returns:
+        tuple: (width, height) from the header, or None if the format does not expose it.
+
+    Raises:
+        ImageTooLargeError: If the payload or its pixel count exceeds the configured limits.
+    """
+    if len(image_bytes) > MAX_IMAGE_BYTES:
+        raise ImageTooLargeError(f"Image payload of {len(image_bytes)} bytes exceeds the {MAX_IMAGE_BYTES} byte limit.")
+    dimensions = image_dimensions(image_bytes)
+    if dimensions is not None and dimensions[0] * dimensions[1] > MAX_IMAGE_PIXELS:
+        raise ImageTooLargeError(f"Image of {dimensions[0]}x{dimensions[1]} pixels exceeds the {MAX_IMAGE_PIXELS} pixel limit.")
+    return dimensions
+
+
+def _reduced_decode_flag(dimensions, target_width, target_height):
+    """Picks the strongest cv2 reduced decode that still leaves at least the target resolution."""
+    if dimensions is None:
+        return cv2.IMREAD_COLOR
+    width, height = dimensions
+    for scale, flag in REDUCED_DECODE_FLAGS:
+        if width // scale >= target_width and height // scale >= target_height:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def _get_face_cascade():
+    global _face_cascade
+    if _face_cascade is None:
+        cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
+        _face_cascade = cascade if not cascade.empty() else False
+    return _face_cascade or None
+
+
+def crop_face(image_array, margin=FACE_CROP_MARGIN):
+    """
+    Crops the largest detected face, as a square with `margin` of context on each side.
+
+    Args:
+        image_array (np.array): uint8 BGR image.
+        margin (float): Context added around the detection, relative to its size.
+
+    Returns:
+        tuple: (cropped BGR view, True) or (the whole image, False) if no face was found.
+    """
+    cascade = _get_face_cascade()
+    if cascade is None:
+        return image_array, False
+    height, width = image_array.shape[:2]
+    min_face = max(24, min(height, width) // 8)
+    faces = cascade.detectMultiScale(
+        cv2.cvtColor(image_array, cv2.COLOR_BGR2GRAY), scaleFactor=1.1, minNeighbors=5, minSize=(min_face, min_face))
+    if len(faces) == 0:
+        return image_array, False
+
+    x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+    size = min(int(max(w, h) * (1 + 2 * margin)), height, width)
+    left = min(max(0, x + w // 2 - size // 2), width - size)
+    top = min(max(0, y + h // 2 - size // 2), height - size)
+    return image_array[top:top + size, left:left + size], True
+
+
+def decode_image_bytes(image_bytes, target_shape, out=None, face_crop=False):
+    """
+    Decodes an encoded image straight from memory and prepares it for the vision encoder.
+
+    Oversize payloads are rejected from their byte length and header before decoding.
+    Large images are decoded close to the target size (DCT-scaled for JPEG, so a 1080p
+    frame is decoded at 1/8 resolution), then resized, and the BGR->RGB swap and [0, 1]
+    scaling are done in one pass into the float32 output buffer.
+
+    With `face_crop`, the frame is decoded at FACE_DECODE_SCALE x the target size and only
+    the largest detected face (see `crop_face`) is resized to the target. Frames without
+    a detectable face fall back to the whole frame.
+
+    Args:
+        image_bytes (bytes): Encoded image file contents (JPEG, PNG, ...).
+        target_shape (tuple): (height, width, channels) expected by the vision encoder.
+        out (np.array, optional): Preallocated float32 buffer of shape `target_shape`
+                                  (e.g. a row of a batch) to write into.
+        face_crop (bool): Feed the vision encoder the face region only.
+
+    Returns:
+        np.array: float32 RGB image of shape `target_shape`, scaled to [0, 1].
+
+    Raises:
+        ImageTooLargeError: If the image exceeds MAX_IMAGE_BYTES or MAX_IMAGE_PIXELS.
+        ValueError: If the data cannot be decoded.
+    """
+    target_height, target_width, _ = target_shape
+    dimensions = check_image_payload(image_bytes)
+
+    # The IMREAD_*COLOR flags always yield 3-channel BGR, dropping alpha and expanding grayscale
+    decode_scale = FACE_DECODE_SCALE if face_crop else 1
+    flag = _reduced_decode_flag(dimensions, target_width * decode_scale, target_height * decode_scale)
+    image_array = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), flag)
+    if image_array is None:
+        raise ValueError("Unsupported or corrupt image data.")
+    if face_crop:
+        image_array, _ = crop_face(image_array)
+
+    if image_array.shape[:2] != (target_height, target_width):
+        image_array = cv2.resize(image_array, (target_width, target_height))
+    if out is None:
+        out = np.empty(target_shape, dtype=np.float32)
+    np.multiply(image_array[..., ::-1], np.float32(1.0 / 255.0), out=out, dtype=np.float32)
+    return out
+
+
+def decode_image_base64(image_base64, target_shape, face_crop=False):
+    """
+    Decodes a base64 image and prepares it for the vision encoder.
+
+    Args:
+        image_base64 (str): Base64 (or data-URL) encoded image.
+        target_shape (tuple): (height, width, channels) expected by the vision encoder.
+        face_crop (bool): Feed the vision encoder the face region only (see `decode_image_bytes`).
+
+    Returns:
+        np.array: float32 RGB image of shape `target_shape`, scaled to [0, 1].
+
+    Raises:
+        ImageTooLargeError: If the image exceeds MAX_IMAGE_BYTES or MAX_IMAGE_PIXELS.
+    """
+    image_base64 = strip_data_url(image_base64)
+    # Every 4 base64 characters carry 3 bytes: reject before decoding the payload at all
+    if len(image_base64) // 4 * 3 > MAX_IMAGE_BYTES + 2:
+        raise ImageTooLargeError(f"Image payload exceeds the {MAX_IMAGE_BYTES} byte limit.")
+    return decode_image_bytes(base64.b64decode(image_base64), target_shape, face_crop=face_crop)
+
+
+if __name__ == "__main__":
+    import time
+
+    print("Running image decode benchmark:")
+
+    # Synthetic 1080p camera frame with some texture, JPEG-encoded like a browser would send it
+    rows, cols = np.mgrid[0:1080, 0:1920]
+    frame = np.stack([(rows // 4) % 256, (cols // 8) % 256, ((rows + cols) // 6) % 256], axis=-1).astype(np.uint8)
+    jpeg_bytes = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+    target_shape = (128, 128, 3)
+
+    def full_decode():
+        image_array = cv2.imdecode(np.frombuffer(jpeg_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        image_array = cv2.cvtColor(cv2.resize(image_array, (128, 128)), cv2.COLOR_BGR2RGB)
+        return np.multiply(image_array, np.float32(1.0 / 255.0), dtype=np.float32)
+
+    def median_ms(fn, repeats=50):
+        fn()
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        return 1000 * float(np.median(samples))
+
+    buffer = np.empty(target_shape, dtype=np.float32)
+    diff = float(np.mean(np.abs(decode_image_bytes(jpeg_bytes, target_shape) - full_decode())))
+    print(f"Header dimensions: {image_dimensions(jpeg_bytes)}, mean |diff| vs full decode: {diff:.4f}")
+    print(f"Full decode + resize: {median_ms(full_decode):.2f} ms")
+    print(f"Reduced decode:       {median_ms(lambda: decode_image_bytes(jpeg_bytes, target_shape, out=buffer)):.2f} ms")
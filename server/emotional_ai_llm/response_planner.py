@@ -3,34 +3,118 @@
 import numpy as np
 import random
 import logging
-from transformers import BlenderbotTokenizer, BlenderbotForConditionalGeneration
+import asyncio
+from transformers import AsyncTextIteratorStreamer
 import torch
 import os
+import re
+import threading
+import time
+
+from .chat_generators import ChatGenerator, GENERATOR_REGISTRY
+from .generation_backends import backend_from_env
+from .generator_routing import GeneratorRoutingPolicy
+from .inference_executor import InferenceQueueFullError
+
+# Decode concurrent chats together (see generation_scheduler.py); 0 falls back to one generate() call per chat
+GENERATION_BATCHING_ENABLED = os.environ.get("NOVA_GENERATION_BATCHING", "1") != "0"
+# Chat generators to load (see chat_generators.GENERATOR_REGISTRY); the first one is the default
+DEFAULT_CHAT_GENERATORS = "blenderbot,t5"
+
+# Time a turn may take before its reply must be complete (from the request's arrival); 0 = unbounded
+DEFAULT_REPLY_BUDGET_MS = 8000
+REPLY_BUDGET_MS = float(os.environ.get("NOVA_REPLY_BUDGET_MS", DEFAULT_REPLY_BUDGET_MS))
+# A turn whose remaining budget cannot fit this many tokens gets a template reply instead
+MIN_REPLY_TOKENS = 8
+# Shortest max_length a reply is given after adapting it to the emotion and input length
+MIN_REPLY_LENGTH = 32
+
+# Share of the generator's max_length used per detected emotion: distress gets room for a
+# fuller answer, light turns stay short
+EMOTION_LENGTH_FACTORS = {
+    'sad': 1.0,
+    'fear': 1.0,
+    'anger': 1.0,
+    'disgust': 0.8,
+    'surprise': 0.6,
+    'happy': 0.6,
+    'neutral': 0.6,
+}
+
+
+def reply_deadline(reply_budget_ms=None, started_at=None):
+    """
+    Converts a turn's latency budget into a deadline for its reply.
+
+    Args:
+        reply_budget_ms (float, optional): Budget of the turn. Defaults to NOVA_REPLY_BUDGET_MS.
+        started_at (float, optional): time.monotonic() at which the turn arrived. Defaults to now.
+
+    Returns:
+        float or None: time.monotonic() deadline, or None for an unbounded turn.
+    """
+    budget_ms = REPLY_BUDGET_MS if reply_budget_ms is None else reply_budget_ms
+    if budget_ms <= 0:
+        return None
+    return (time.monotonic() if started_at is None else started_at) + budget_ms / 1000.0
+
+
+SENTENCE_END = re.compile(r"[.!?](\s|$)")
+
+def _trim_to_sentence(text):
+    """Cuts a reply that was stopped early back to its last complete sentence, if it has one."""
+    ends = [match.end() for match in SENTENCE_END.finditer(text)]
+    return text[:ends[-1]].strip() if ends else text
+
+def _unfinished_sentence(text):
+    """
+    The text after the last complete sentence, i.e. what `_trim_to_sentence` cuts off
+    (including the whitespace leading into it). Empty when `text` has no complete sentence.
+    """
+    ends = [match.start() + 1 for match in SENTENCE_END.finditer(text)]
+    return text[ends[-1]:] if ends else ""
 
 class ResponsePlanner:
-    def __init__(self, emotion_labels, detection_threshold=0.5):
+    def __init__(self, emotion_labels, detection_threshold=0.5, backend=None, generator_names=None):
         """
-        Initializes the ResponsePlanner with a dedicated Chat SLM (BlenderBot).
+        Initializes the ResponsePlanner with its Chat SLMs.
+
+        BlenderBot - a model specifically trained for interactive, friendly chat - answers by
+        default. The local fine-tuned T5 (fine_tuned_empathetic_t5/final_model) is a smaller,
+        faster tier that GeneratorRoutingPolicy uses for short messages and under load.
+        A generator that fails to load is skipped, except the default one.
+
+        Args:
+            backend (str, optional): Runtime for the Chat SLMs, one of generation_backends.GENERATION_BACKENDS
+                                     ("torch", "int8", "onnx"). Defaults to NOVA_GENERATION_BACKEND.
+            generator_names (list, optional): Registry names of the generators to load, default first.
+                                              Defaults to NOVA_CHAT_GENERATORS.
         """
         self.emotion_labels = emotion_labels
         self.detection_threshold = detection_threshold
-        
-        # Switch to BlenderBot - a model specifically trained for interactive, friendly chat
-        self.model_name = "facebook/blenderbot-400M-distill"
+        if generator_names is None:
+            generator_names = [name.strip() for name in os.environ.get("NOVA_CHAT_GENERATORS", DEFAULT_CHAT_GENERATORS).split(",") if name.strip()]
+        backend = backend or backend_from_env()
 
-        logging.info(f"Loading Chat SLM: {self.model_name}")
-        
-        # Determine device
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        logging.info(f"Chat SLM will run on device: {self.device}")
+        # Determine device (the int8 and onnx backends always run on CPU)
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-        try:
-            self.tokenizer = BlenderbotTokenizer.from_pretrained(self.model_name)
-            self.model = BlenderbotForConditionalGeneration.from_pretrained(self.model_name).to(self.device)
-            logging.info("Chat SLM loaded successfully.")
-        except Exception as e:
-            logging.error(f"Failed to load Chat SLM: {e}")
-            raise
+        self.generators = {}
+        for index, name in enumerate(generator_names):
+            try:
+                self.generators[name] = ChatGenerator(name, GENERATOR_REGISTRY[name], backend, device, GENERATION_BATCHING_ENABLED)
+            except Exception as e:
+                if index == 0:
+                    logging.error(f"Failed to load Chat SLM '{name}': {e}")
+                    raise
+                logging.warning(f"Chat generator '{name}' not available, routing everything to '{generator_names[0]}': {e}")
+        self.default_generator = generator_names[0]
+        fast_generators = [name for name in generator_names[1:] if name in self.generators]
+        self.routing_policy = GeneratorRoutingPolicy.from_env(self.default_generator, fast_generators[0] if fast_generators else None)
+
+        # How each reply was produced: model to EOS/max_length, stopped by the deadline, template, error
+        self._reply_paths = {"full": 0, "deadline_truncated": 0, "template": 0, "error": 0}
+        self._reply_paths_lock = threading.Lock()
 
         # --- Therapist Persona Layers ---
         # We will still use these to wrap the chat model's output, 
@@ -91,29 +175,50 @@ class ResponsePlanner:
         
         return ", ".join(dominant_emotions) if dominant_emotions else "neutral"
     
+    def _choose_intro(self, primary_emotion):
+        """Picks the validating opening line for the detected emotion."""
+        intros = self.empathetic_intros.get(primary_emotion, self.empathetic_intros['neutral'])
+        return random.choice(intros)
+
+    def _format_content(self, chat_model_response):
+        """Cleans up the Chat SLM's reply so it reads well between intro and closing."""
+        content = chat_model_response.strip()
+        if content and content[0].islower():
+            content = content[0].upper() + content[1:]
+        return content
+
+    def _choose_closing(self):
+        """Picks the inviting closing question."""
+        return random.choice(self.supportive_closings)
+
     def _construct_therapist_response(self, primary_emotion, chat_model_response):
         """
         Wraps the Chat SLM's response in a 'Therapist Persona'.
         """
         # 1. Validation (The Intro)
-        intros = self.empathetic_intros.get(primary_emotion, self.empathetic_intros['neutral'])
-        intro = random.choice(intros)
+        intro = self._choose_intro(primary_emotion)
         
         # 2. The Chat (The Model's Content)
         # BlenderBot is good, but sometimes we want to soften it or ensure it fits.
         # For now, we trust the model's "chat" ability.
-        content = chat_model_response.strip()
-        if content and content[0].islower():
-            content = content[0].upper() + content[1:]
+        content = self._format_content(chat_model_response)
             
         # 3. The Invitation (The Closing)
-        closing = random.choice(self.supportive_closings)
+        closing = self._choose_closing()
         
         return f"{intro} {content} {closing}"
 
-    def generate_empathetic_response(self, user_input_text, current_emotion_probabilities, conversation_context_vector, user_facial_emotion: str = "neutral"):
+    def _choose_generator(self, user_input_text):
+        """Routes a turn to the default or the fast chat generator."""
+        name = self.routing_policy.choose(user_input_text, self.generators[self.default_generator].load())
+        return self.generators[name]
+
+    def _plan_chat_input(self, user_input_text, current_emotion_probabilities, generator):
         """
-        Generates a response using the Chat SLM (BlenderBot), influenced by the Analysis SLM (Emotion Detector).
+        Runs the analysis layer and builds the prompt for the chosen Chat SLM.
+
+        Returns:
+            tuple: (primary_emotion, augmented_input)
         """
         # 1. ANALYSIS LAYER (From your other "SLM")
         dominant_emotions_str = self._get_dominant_emotions(current_emotion_probabilities)
@@ -121,42 +226,201 @@ class ResponsePlanner:
         
         logging.info(f"Chat Planner received Analysis: Emotion='{primary_emotion}'")
 
+        # --- INTERCONNECTION: Analysis SLM -> Chat SLM ---
+        # Explicitly tell the Chat SLM about the detected emotion to guide its response.
+        # This "mingles" the two models: Analysis sets the context, Chat generates the content.
+        # Each generator phrases it the way it was trained (see chat_generators.py)
+        augmented_input = generator.build_prompt(user_input_text, primary_emotion)
+        if augmented_input != user_input_text:
+            logging.info(f"Augmented Input for Chat SLM '{generator.name}': '{augmented_input}'")
+        return primary_emotion, augmented_input
+
+    def _record_reply_path(self, path):
+        with self._reply_paths_lock:
+            self._reply_paths[path] += 1
+
+    def _reply_max_length(self, generator, primary_emotion, user_input_text):
+        """Scales the generator's max_length by the detected emotion and the length of the user's message."""
+        words = len(user_input_text.split())
+        factor = EMOTION_LENGTH_FACTORS.get(primary_emotion, 0.8) * min(1.0, 0.5 + words / 40)
+        return max(MIN_REPLY_LENGTH, int(generator.generation_params["max_length"] * factor))
+
+    def _plan_reply(self, user_input_text, current_emotion_probabilities, deadline):
+        """
+        Picks the generator, prompt and reply length for a turn.
+
+        Returns:
+            tuple: (generator, primary_emotion, augmented_input, max_length). generator is None
+                   when the remaining budget cannot fit MIN_REPLY_TOKENS and a template reply
+                   should be used instead.
+        """
+        generator = self._choose_generator(user_input_text)
+        primary_emotion, augmented_input = self._plan_chat_input(user_input_text, current_emotion_probabilities, generator)
+        if deadline is not None and deadline - time.monotonic() <= MIN_REPLY_TOKENS * generator.seconds_per_token():
+            logging.info("Reply budget exhausted before generation, using a template reply.")
+            return None, primary_emotion, augmented_input, None
+        return generator, primary_emotion, augmented_input, self._reply_max_length(generator, primary_emotion, user_input_text)
+
+    def _template_response(self, primary_emotion):
+        """Reply composed only from the persona layers, used when there is no time to run the Chat SLM."""
+        self._record_reply_path("template")
+        return f"{self._choose_intro(primary_emotion)} {self._choose_closing()}"
+
+    def _finish_response(self, primary_emotion, generator, reply_ids, max_length):
+        """Decodes a Chat SLM reply and wraps it in the therapist persona."""
+        chat_response = generator.tokenizer.decode(reply_ids, skip_special_tokens=True)
+        if generator.stop_reason(reply_ids, max_length) == "deadline":
+            self._record_reply_path("deadline_truncated")
+            chat_response = _trim_to_sentence(chat_response)
+        else:
+            self._record_reply_path("full")
+        logging.info(f"Chat SLM Raw Output ({generator.name}): {chat_response}")
+
+        # 3. STABILIZATION LAYER (Therapist Wrapper)
+        # We take the "friendly chat" from the SLM and wrap it in "emotional stability" logic.
+        return self._construct_therapist_response(primary_emotion, chat_response)
+
+    def _fallback_response(self, error):
+        logging.error(f"Error in Chat SLM: {error}")
+        self._record_reply_path("error")
+        return "I'm here with you. I'm having a little trouble finding the right words, but I'm listening. Please continue."
+
+    def generate_empathetic_response(self, user_input_text, current_emotion_probabilities, conversation_context_vector,
+                                     user_facial_emotion: str = "neutral", session_id=None, deadline=None):
+        """
+        Generates a response using a Chat SLM (BlenderBot or the fast T5 tier), influenced by the Analysis SLM (Emotion Detector).
+
+        Blocks until the reply is decoded; async callers should use agenerate_empathetic_response,
+        which waits for the scheduler without holding a worker thread.
+
+        Args:
+            deadline (float, optional): time.monotonic() by which the reply must be ready (see
+                                        reply_deadline). Decoding stops early to meet it, and a
+                                        template reply is used if no time is left at all.
+        """
+        generator, primary_emotion, augmented_input, max_length = self._plan_reply(
+            user_input_text, current_emotion_probabilities, deadline)
+        if generator is None:
+            return self._template_response(primary_emotion)
+
         # 2. CHAT LAYER (The Interactive SLM)
         try:
-            # --- INTERCONNECTION: Analysis SLM -> Chat SLM ---
-            # Explicitly tell the Chat SLM about the detected emotion to guide its response.
-            # This "mingles" the two models: Analysis sets the context, Chat generates the content.
-            augmented_input = user_input_text
-            if primary_emotion in ['sad', 'anger', 'fear', 'happy', 'disgust']:
-                # Prepend the emotion as a statement so BlenderBot responds to it
-                augmented_input = f"I feel {primary_emotion}. {user_input_text}"
-                logging.info(f"Augmented Input for Chat SLM: '{augmented_input}'")
-
-            inputs = self.tokenizer([augmented_input], return_tensors="pt").to(self.device)
-            
-            reply_ids = self.model.generate(
-                **inputs,
-                max_length=128,
-                do_sample=True,
-                top_p=0.9,      # Nucleus sampling for more natural text
-                temperature=0.8 # Slight creativity
-            )
-            
-            chat_response = self.tokenizer.batch_decode(reply_ids, skip_special_tokens=True)[0]
-            logging.info(f"Chat SLM Raw Output: {chat_response}")
-            
-            # 3. STABILIZATION LAYER (Therapist Wrapper)
-            # We take the "friendly chat" from the SLM and wrap it in "emotional stability" logic.
-            final_response = self._construct_therapist_response(primary_emotion, chat_response)
-            
+            reply_ids = generator.generate(augmented_input, session_id=session_id, max_length=max_length, deadline=deadline)
+            return self._finish_response(primary_emotion, generator, reply_ids, max_length)
+        except Exception as e:
+            return self._fallback_response(e)
+
+    async def agenerate_empathetic_response(self, user_input_text, current_emotion_probabilities, conversation_context_vector,
+                                            user_facial_emotion: str = "neutral", session_id=None, run_blocking=None, deadline=None):
+        """
+        Async variant of generate_empathetic_response.
+
+        With the generation scheduler, the prompt is decoded together with those of other
+        concurrent chats. Without it, the blocking generate() call is handed to `run_blocking`
+        (e.g. InferenceExecutor.run; defaults to asyncio.to_thread).
+        """
+        generator, primary_emotion, augmented_input, max_length = self._plan_reply(
+            user_input_text, current_emotion_probabilities, deadline)
+        if generator is None:
+            return self._template_response(primary_emotion)
+        try:
+            reply_ids = await generator.agenerate_ids(
+                augmented_input, session_id=session_id, run_blocking=run_blocking, max_length=max_length, deadline=deadline)
+            return self._finish_response(primary_emotion, generator, reply_ids, max_length)
+        except InferenceQueueFullError:
+            raise
+        except Exception as e:
+            return self._fallback_response(e)
+
+    async def stream_empathetic_response(self, user_input_text, current_emotion_probabilities, conversation_context_vector,
+                                         user_facial_emotion: str = "neutral", run_blocking=None, session_id=None, deadline=None):
+        """
+        Streams the same therapist-style response as generate_empathetic_response, piece by piece.
+
+        Yields ("intro", text), then one ("token", text) per decoded chunk from the Chat SLM, then
+        ("closing", text). Concatenating all yielded texts gives the complete response. When the
+        deadline stopped the reply mid-sentence, ("trim", text) follows the last token: the
+        unfinished sentence, already streamed, that generate_empathetic_response would cut off
+        and that the final response leaves out. Without time left for the Chat SLM, no "token"
+        events are yielded.
+
+        Args:
+            run_blocking (callable, optional): Awaitable runner for the blocking generate call, e.g.
+                                               InferenceExecutor.run. Defaults to asyncio.to_thread.
+                                               Unused when the generation scheduler decodes the reply.
+            session_id (str, optional): Chat session, for the scheduler's per-session fairness cap.
+            deadline (float, optional): time.monotonic() by which decoding must stop.
+        """
+        generator, primary_emotion, augmented_input, max_length = self._plan_reply(
+            user_input_text, current_emotion_probabilities, deadline)
+
+        yield "intro", self._choose_intro(primary_emotion)
+
+        if generator is None:
+            self._record_reply_path("template")
+            yield "closing", " " + self._choose_closing()
+            return
+
+        streamer = AsyncTextIteratorStreamer(generator.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        generation = asyncio.ensure_future(generator.agenerate_ids(
+            augmented_input, session_id=session_id, streamer=streamer, run_blocking=run_blocking,
+            max_length=max_length, deadline=deadline))
+
+        def _unblock_streamer(task):
+            # generate() only ends the streamer when it finishes normally (the scheduler always ends it)
+            if not task.cancelled() and task.exception() is not None:
+                streamer.end()
+        generation.add_done_callback(_unblock_streamer)
+
+        emitted_content = False
+        streamed = "" # Chat SLM text yielded so far
+        try:
+            async for text in streamer:
+                if not emitted_content:
+                    text = self._format_content(text)
+                    if not text:
+                        continue
+                    text = " " + text
+                    emitted_content = True
+                streamed += text
+                yield "token", text
+            reply_ids = await generation
+            truncated = generator.stop_reason(reply_ids, max_length) == "deadline"
+            self._record_reply_path("deadline_truncated" if truncated else "full")
+            unfinished = _unfinished_sentence(streamed.rstrip()) if truncated else ""
+            if unfinished:
+                yield "trim", unfinished
         except Exception as e:
             logging.error(f"Error in Chat SLM: {e}")
-            final_response = "I'm here with you. I'm having a little trouble finding the right words, but I'm listening. Please continue."
+            self._record_reply_path("error")
+            if not emitted_content:
+                yield "token", " I'm having a little trouble finding the right words, but I'm listening."
+        finally:
+            if not generation.done():
+                generation.cancel()
+
+        yield "closing", " " + self._choose_closing()
+
+    def get_generation_metrics(self):
+        """
+        Per-generator backend, smoke test, latency histogram and scheduler load, plus routing
+        counts and how often each reply path (full, deadline_truncated, template, error) fired.
+        """
+        with self._reply_paths_lock:
+            reply_paths = dict(self._reply_paths)
+        return {
+            "generators": {name: generator.get_metrics() for name, generator in self.generators.items()},
+            "routing": self.routing_policy.get_metrics(),
+            "reply_paths": reply_paths,
+        }
 
-        return final_response
+    def close(self):
+        """Stops the generation schedulers."""
+        for generator in self.generators.values():
+            generator.close()
 
 if __name__ == "__main__":
-    print("Initializing Chat SLM (BlenderBot)...")
+    print("Initializing Chat SLMs (BlenderBot, fine-tuned T5)...")
     # Dummy labels
     labels = ['anger', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
     planner = ResponsePlanner(labels)
@@ -168,4 +432,6 @@ if __name__ == "__main__":
     
     resp = planner.generate_empathetic_response(user_text, probs, None)
     print(f"User: {user_text}")
-    print(f"AI: {resp}")
\ No newline at end of file
+    print(f"AI: {resp}")
+    print(f"Generation metrics: {planner.get_generation_metrics()}")
+    planner.close()
\ No newline at end of file
@@ -0,0 +1,145 @@
+# emotional_ai_llm/session_store.py
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .conversation_memory import ConversationMemory
+
+# Defaults (overridable through environment variables, see SessionMemoryStore.from_env)
+DEFAULT_MAX_SESSIONS = 50000
+DEFAULT_SESSION_TTL_S = 30 * 60
+DEFAULT_SESSION_MEMORY_MB = 512
+
+
+class SessionMemoryStore:
+    def __init__(self, embedding_dim, max_memory_length=10, max_sessions=DEFAULT_MAX_SESSIONS,
+                 idle_ttl_s=DEFAULT_SESSION_TTL_S, max_memory_mb=DEFAULT_SESSION_MEMORY_MB):
+        """
+        Holds one ConversationMemory per chat session in a bounded LRU store.
+
+        Sessions idle for longer than `idle_ttl_s` are dropped, and the least recently used
+        session is evicted whenever the store is full. The session cap is derived from
+        `max_memory_mb` assuming every session's memory is full, so the store can never
+        exceed that budget regardless of traffic.
+
+        Args:
+            embedding_dim (int): Dimension of the per-turn multimodal embeddings.
+            max_memory_length (int): Turns kept per session (see ConversationMemory).
+            max_sessions (int): Upper bound on the number of live sessions.
+            idle_ttl_s (float): Seconds without activity after which a session expires.
+            max_memory_mb (float): Hard cap on the embedding memory held by all sessions.
+        """
+        self.embedding_dim = embedding_dim
+        self.max_memory_length = max_memory_length
+        self.idle_ttl_s = idle_ttl_s
+
+        bytes_per_session = max_memory_length * embedding_dim * 4 # float32 context vectors
+        self.max_sessions = max(1, min(max_sessions, int(max_memory_mb * 1024 * 1024 // bytes_per_session)))
+
+        self._sessions = OrderedDict() # session_id -> (ConversationMemory, last_access)
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "hits": 0, "evicted_lru": 0, "evicted_ttl": 0}
+        logging.info(
+            f"SessionMemoryStore initialized: up to {self.max_sessions} sessions, idle TTL {idle_ttl_s}s, "
+            f"~{bytes_per_session} bytes per full session."
+        )
+
+    @classmethod
+    def from_env(cls, embedding_dim, max_memory_length=10):
+        """
+        Builds a store configured from environment variables:
+        NOVA_MAX_SESSIONS, NOVA_SESSION_TTL_S and NOVA_SESSION_MEMORY_MB.
+        """
+        return cls(
+            embedding_dim,
+            max_memory_length=max_memory_length,
+            max_sessions=int(os.environ.get("NOVA_MAX_SESSIONS", DEFAULT_MAX_SESSIONS)),
+            idle_ttl_s=float(os.environ.get("NOVA_SESSION_TTL_S", DEFAULT_SESSION_TTL_S)),
+            max_memory_mb=float(os.environ.get("NOVA_SESSION_MEMORY_MB", DEFAULT_SESSION_MEMORY_MB)),
+        )
+
+    def _evict_expired(self, now):
+        """Drops idle sessions. The OrderedDict is in access order, so they sit at the front."""
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if now - last_access <= self.idle_ttl_s:
+                break
+            del self._sessions[session_id]
+            self._stats["evicted_ttl"] += 1
+
+    def get_memory(self, session_id):
+        """
+        Returns the ConversationMemory for a session, creating it if needed.
+
+        Args:
+            session_id (str or None): Client-provided session identifier. Requests without one
+                                      get a fresh memory that is not retained between turns.
+
+        Returns:
+            ConversationMemory: The memory belonging to this session.
+        """
+        if not session_id:
+            return ConversationMemory(max_memory_length=self.max_memory_length, embedding_dim=self.embedding_dim)
+
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                memory = entry[0]
+                self._sessions.move_to_end(session_id)
+                self._stats["hits"] += 1
+            else:
+                while len(self._sessions) >= self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self._stats["evicted_lru"] += 1
+                memory = ConversationMemory(max_memory_length=self.max_memory_length, embedding_dim=self.embedding_dim)
+                self._stats["created"] += 1
+            self._sessions[session_id] = (memory, now)
+        return memory
+
+    def drop_session(self, session_id):
+        """Forgets a session's memory, e.g. when the user deletes the conversation."""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def get_metrics(self):
+        """
+        Returns the live session count, capacity and eviction counters.
+
+        Returns:
+            dict: Session store metrics.
+        """
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            return {
+                "active_sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "idle_ttl_s": self.idle_ttl_s,
+                **self._stats,
+            }
+
+
+if __name__ == "__main__":
+    import numpy as np
+
+    print("Running SessionMemoryStore module development example:")
+
+    store = SessionMemoryStore(embedding_dim=4, max_memory_length=3, max_sessions=2, idle_ttl_s=0.2)
+
+    store.get_memory("alice").add_context(np.ones(4, dtype=np.float32))
+    store.get_memory("bob").add_context(np.full(4, 2.0, dtype=np.float32))
+    print(f"Alice context: {store.get_memory('alice').get_weighted_context()}")
+    print(f"Bob context:   {store.get_memory('bob').get_weighted_context()}")
+
+    # A third session evicts the least recently used one (alice)
+    store.get_memory("carol")
+    print(f"After adding carol: {store.get_metrics()}")
+
+    time.sleep(0.3)
+    print(f"After idle TTL: {store.get_metrics()}")
+
+    print("\nSessionMemoryStore module development example finished.")
@@ -0,0 +1,288 @@
+# emotional_ai_llm/streaming_audio.py
+
+# Incremental audio frontend for voice streamed over a WebSocket, plus the store that
+# hands the resulting embeddings to the next text turn. Kept free of TensorFlow imports.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from math import gcd
+
+import numpy as np
+import scipy.fft
+from scipy.signal import resample_poly
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .audio_frontend import AMIN
+
+# Defaults (overridable through environment variables, see StreamedAudioEmbeddings.from_env)
+DEFAULT_STREAM_EMBEDDING_TTL_S = 120
+DEFAULT_MAX_STREAMS = 10000
+
+PCM_FORMATS = {"pcm_s16le": np.dtype("<i2"), "pcm_f32le": np.dtype("<f4")}
+
+
+def decode_pcm_chunk(data, sample_format="pcm_s16le"):
+    """
+    Converts a raw little-endian mono PCM chunk into float32 samples in [-1, 1].
+
+    A trailing partial sample is ignored; `StreamingAudioEncoder.push_pcm` keeps those
+    bytes and completes the sample with the next chunk.
+
+    Args:
+        data (bytes): Raw PCM bytes.
+        sample_format (str): One of PCM_FORMATS.
+
+    Returns:
+        np.array: float32 samples.
+    """
+    dtype = PCM_FORMATS[sample_format]
+    usable = len(data) - len(data) % dtype.itemsize
+    samples = np.frombuffer(data[:usable], dtype=dtype)
+    if dtype.kind == "i":
+        return samples.astype(np.float32) / 32768.0
+    return samples.astype(np.float32)
+
+
+class StreamingAudioEncoder:
+    def __init__(self, frontend, hop_frames, input_sample_rate=None, sample_format="pcm_s16le"):
+        """
+        Turns a stream of PCM chunks into audio encoder windows as soon as they complete.
+
+        Pending samples live in a small buffer holding only the part of the signal that no
+        STFT frame has consumed yet, and the last `n_frames` mel power frames are kept in a
+        second buffer. Each pushed chunk computes just the new STFT frames, so overlapping
+        frames are never recomputed. A window is emitted every `hop_frames` frames once
+        `n_frames` frames are available, and `flush` emits the tail of the utterance.
+
+        Each window is converted to dB against its own maximum (a window is the ~88 ms,
+        44-frame input the audio CNN was trained on), since the maximum of the whole
+        utterance is not known while it is being streamed.
+
+        Window embeddings are pooled into a running utterance embedding (see `add_embeddings`).
+
+        Args:
+            frontend (MelFrontend): Provides the STFT/mel configuration, window and filterbank.
+            hop_frames (int): Frames between successive windows.
+            input_sample_rate (int, optional): Sample rate of the incoming PCM. Chunks are
+                                               resampled to `frontend.sr` if it differs
+                                               (per chunk, so slightly approximate at chunk edges).
+            sample_format (str): PCM_FORMATS entry of the raw chunks given to `push_pcm`.
+        """
+        self.frontend = frontend
+        self.hop_frames = hop_frames
+        self.sample_format = sample_format
+        self.input_sample_rate = input_sample_rate or frontend.sr
+        rate_gcd = gcd(int(self.input_sample_rate), int(frontend.sr))
+        self._resample_up, self._resample_down = frontend.sr // rate_gcd, int(self.input_sample_rate) // rate_gcd
+        self.reset()
+
+    def reset(self):
+        """Starts a new utterance."""
+        # librosa's centred STFT pads the start of the signal with n_fft // 2 zeros
+        self._pending = np.zeros(self.frontend.n_fft // 2, dtype=np.float32)
+        self._partial_sample = b""
+        self._recent_frames = np.zeros((0, self.frontend.n_mels), dtype=np.float32)
+        self._total_frames = 0
+        self._last_window_start = None
+        self._flushed = False
+        self.num_samples = 0
+        self.num_windows = 0
+        self._weighted_sum = np.zeros(0, dtype=np.float32)
+        self._weight_total = 0.0
+        self._max_embedding = None
+        self.latest_embedding = None
+
+    def _new_frames(self, final=False):
+        """Computes every STFT frame the pending samples complete, and consumes their hop."""
+        frontend = self.frontend
+        if final:
+            self._pending = np.concatenate([self._pending, np.zeros(frontend.n_fft // 2, dtype=np.float32)])
+        if len(self._pending) < frontend.n_fft:
+            return np.zeros((0, frontend.n_mels), dtype=np.float32)
+        count = 1 + (len(self._pending) - frontend.n_fft) // frontend.hop_length
+        frames = sliding_window_view(self._pending, frontend.n_fft)[::frontend.hop_length][:count]
+        spectrum = scipy.fft.rfft(frames * frontend.window, axis=-1)
+        power = (np.square(spectrum.real) + np.square(spectrum.imag)) @ frontend.mel_basis
+        self._pending = self._pending[count * frontend.hop_length:].copy()
+        return power.astype(np.float32)
+
+    def _to_window(self, frames_power):
+        """(frames, n_mels) mel power -> (n_mels, n_frames, 1) dB window, zero-padded if short."""
+        ref_db = 10.0 * np.log10(max(float(frames_power.max()), AMIN))
+        power_db = np.maximum(10.0 * np.log10(np.maximum(frames_power, AMIN)) - ref_db, -self.frontend.top_db)
+        window = np.zeros((self.frontend.n_mels, self.frontend.n_frames), dtype=np.float32)
+        window[:, :len(frames_power)] = power_db.T
+        return window[..., np.newaxis]
+
+    def _append_frames(self, power):
+        """Adds new mel frames and returns the windows they complete."""
+        n_frames = self.frontend.n_frames
+        history = np.concatenate([self._recent_frames, power])
+        history_start = self._total_frames + len(power) - len(history) # Global index of history[0]
+        windows, energies = [], []
+        for end in range(self._total_frames + 1, self._total_frames + len(power) + 1):
+            start = end - n_frames
+            if start >= 0 and start % self.hop_frames == 0:
+                frames_power = history[start - history_start:end - history_start]
+                windows.append(self._to_window(frames_power))
+                energies.append(frames_power.mean())
+                self._last_window_start = start
+        self._total_frames += len(power)
+        self._recent_frames = history[-n_frames:]
+        return windows, energies
+
+    def _result(self, windows, energies):
+        self.num_windows += len(windows)
+        if not windows:
+            return None, None
+        return np.stack(windows), np.array(energies, dtype=np.float32)
+
+    def push(self, samples):
+        """
+        Feeds a chunk of PCM samples.
+
+        Args:
+            samples (np.array): float32 mono samples at `input_sample_rate`.
+
+        Returns:
+            tuple: (windows, energies) for the windows this chunk completed, shaped
+                   (W, n_mels, n_frames, 1) and (W,), or (None, None) if none completed.
+        """
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if self._resample_up != self._resample_down:
+            samples = resample_poly(samples, self._resample_up, self._resample_down).astype(np.float32)
+        self.num_samples += len(samples)
+        self._pending = np.concatenate([self._pending, samples])
+        return self._result(*self._append_frames(self._new_frames()))
+
+    def push_pcm(self, data):
+        """
+        Feeds a raw PCM chunk in `sample_format`.
+
+        Transports may split the stream at any byte, so the bytes of a trailing partial
+        sample are kept and prepended to the next chunk instead of being dropped.
+
+        Args:
+            data (bytes): Raw little-endian mono PCM bytes.
+
+        Returns:
+            tuple: (windows, energies) as in `push`.
+        """
+        data = self._partial_sample + bytes(data)
+        usable = len(data) - len(data) % PCM_FORMATS[self.sample_format].itemsize
+        self._partial_sample = data[usable:]
+        return self.push(decode_pcm_chunk(data[:usable], self.sample_format))
+
+    def flush(self):
+        """
+        Ends the utterance: computes the final frames and emits the remaining window.
+
+        Utterances shorter than one window give a single zero-padded window, and a tail not
+        covered by the last window gives one end-aligned window, as `MelFrontend.windows` does.
+
+        Returns:
+            tuple: (windows, energies) as in `push`.
+        """
+        if self._flushed:
+            return None, None
+        self._flushed = True
+        windows, energies = self._append_frames(self._new_frames(final=True))
+        n_frames = self.frontend.n_frames
+        if self._total_frames == 0:
+            return self._result(windows, energies)
+        if self._total_frames < n_frames or self._last_window_start != self._total_frames - n_frames:
+            windows.append(self._to_window(self._recent_frames))
+            energies.append(self._recent_frames.mean())
+        return self._result(windows, energies)
+
+    def add_embeddings(self, embeddings, energies, pooling="mean"):
+        """
+        Folds window embeddings into the running utterance embedding.
+
+        Args:
+            embeddings (np.array): (W, 128) embeddings of the windows returned by `push`/`flush`.
+            energies (np.array): (W,) window energies returned alongside them.
+            pooling (str): "mean", "energy" (energy-weighted mean) or "max".
+
+        Returns:
+            np.array: (128,) pooled embedding of the utterance so far (also kept as `latest_embedding`).
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if pooling == "max":
+            window_max = embeddings.max(axis=0)
+            self._max_embedding = window_max if self._max_embedding is None else np.maximum(self._max_embedding, window_max)
+            self.latest_embedding = self._max_embedding
+        else:
+            weights = np.maximum(energies, AMIN) if pooling == "energy" else np.ones(len(embeddings), dtype=np.float32)
+            weighted = (embeddings * weights[:, np.newaxis]).sum(axis=0)
+            self._weighted_sum = weighted if self._weighted_sum.size == 0 else self._weighted_sum + weighted
+            self._weight_total += float(weights.sum())
+            self.latest_embedding = self._weighted_sum / self._weight_total
+        return self.latest_embedding
+
+
+class StreamedAudioEmbeddings:
+    def __init__(self, ttl_s=DEFAULT_STREAM_EMBEDDING_TTL_S, max_streams=DEFAULT_MAX_STREAMS):
+        """
+        Latest streamed audio embedding per chat session, waiting for the session's next text turn.
+
+        Entries older than `ttl_s` are ignored (the voice no longer belongs to the turn) and
+        the least recently updated entry is evicted once `max_streams` sessions are stored.
+
+        Args:
+            ttl_s (float): Seconds an embedding stays usable after its last update.
+            max_streams (int): Maximum number of sessions with a pending embedding.
+        """
+        self.ttl_s = ttl_s
+        self.max_streams = max_streams
+        self._embeddings = OrderedDict() # session_id -> (embedding, updated_at)
+        self._lock = threading.Lock()
+        self._stats = {"updates": 0, "taken": 0, "expired": 0}
+
+    @classmethod
+    def from_env(cls):
+        """Builds a store configured from NOVA_STREAM_EMBEDDING_TTL_S and NOVA_MAX_AUDIO_STREAMS."""
+        return cls(
+            ttl_s=float(os.environ.get("NOVA_STREAM_EMBEDDING_TTL_S", DEFAULT_STREAM_EMBEDDING_TTL_S)),
+            max_streams=int(os.environ.get("NOVA_MAX_AUDIO_STREAMS", DEFAULT_MAX_STREAMS)),
+        )
+
+    def put(self, session_id, embedding):
+        """Stores the latest pooled embedding of a session's current utterance."""
+        with self._lock:
+            self._embeddings.pop(session_id, None)
+            self._embeddings[session_id] = (np.asarray(embedding, dtype=np.float32), time.monotonic())
+            while len(self._embeddings) > self.max_streams:
+                self._embeddings.popitem(last=False)
+            self._stats["updates"] += 1
+
+    def take(self, session_id):
+        """
+        Removes and returns a session's pending embedding.
+
+        Returns:
+            np.array or None: (128,) embedding, or None if there is none or it expired.
+        """
+        if session_id is None:
+            return None
+        with self._lock:
+            entry = self._embeddings.pop(session_id, None)
+            if entry is None:
+                return None
+            embedding, updated_at = entry
+            if time.monotonic() - updated_at > self.ttl_s:
+                self._stats["expired"] += 1
+                return None
+            self._stats["taken"] += 1
+            return embedding
+
+    def drop_session(self, session_id):
+        """Forgets a session's pending embedding, e.g. when the user deletes the conversation."""
+        with self._lock:
+            self._embeddings.pop(session_id, None)
+
+    def get_metrics(self):
+        with self._lock:
+            return {"pending": len(self._embeddings), **self._stats}
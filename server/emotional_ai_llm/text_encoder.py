@@ -8,6 +8,7 @@ from sklearn.model_selection import train_test_split
 import numpy as np
 import os
 from .utils import load_text_data, create_text_tokenizer, texts_to_sequences_and_pad
+from .text_vectorizer import TextVectorizer
 
 # Define constants
 MAX_LEN = 128
@@ -18,6 +19,9 @@ KERNEL_SIZE = 5
 BATCH_SIZE = 32
 EPOCHS = 3
 
+# Padded lengths used for inference; each gets its own traced graph
+TEXT_LENGTH_BUCKETS = (16, 32, 64, MAX_LEN)
+
 def build_cnn_text_encoder(num_labels):
     """
     Builds a simple Convolutional Neural Network (CNN) for text emotion classification.
@@ -53,14 +57,66 @@ def train_text_encoder(model, train_sequences, train_labels, val_sequences, val_
     model.save(output_dir + ".keras") # Save as Keras Native format
     print(f"CNN text encoder model saved to {output_dir}")
 
+def build_text_embedding_extractor(model):
+    """
+    Builds the sub-model that outputs the GlobalMaxPooling1D layer's output.
+    Build it once and reuse it; constructing it per request is expensive.
+    The extractor shares the trained layers but accepts any sequence length, so it
+    can run on length-bucketed inputs.
+    """
+    # The GlobalMaxPooling1D layer is at index 2 (0:Embedding, 1:Conv1D, 2:GlobalMaxPooling1D)
+    sequence_input = layers.Input(shape=(None,), dtype="int32", name="text_sequence_input")
+    x = sequence_input
+    for layer in model.layers[:3]:
+        x = layer(x)
+    return Model(inputs=sequence_input, outputs=x, name="text_embedding_extractor")
+
+def sequence_lengths(sequences):
+    """Number of tokens before the post-padding in each row of a padded sequence batch."""
+    sequences = np.asarray(sequences)
+    positions = np.arange(1, sequences.shape[1] + 1)
+    return np.max(np.where(sequences > 0, positions, 0), axis=1)
+
+def bucket_for_length(length, kernel_size=KERNEL_SIZE, buckets=TEXT_LENGTH_BUCKETS):
+    """
+    Returns the shortest bucket that yields the same embedding as the full-length sequence.
+
+    After the Conv1D, GlobalMaxPooling1D sees every window touching a real token plus the
+    constant all-padding window. A bucket reproduces that set exactly when it still holds
+    `length + kernel_size` positions; otherwise the full length is used.
+    """
+    for bucket in buckets:
+        if bucket >= length + kernel_size:
+            return bucket
+    return buckets[-1]
+
+def bucket_boundary_lengths(kernel_size=KERNEL_SIZE, buckets=TEXT_LENGTH_BUCKETS):
+    """
+    Sequence lengths on both sides of every bucket boundary (`bucket - kernel_size`, the longest
+    length a bucket serves, and one more), plus the empty and the full-length sequence.
+    These are the lengths where a wrong bucket choice would change the embedding.
+    """
+    lengths = {0, buckets[-1]}
+    for bucket in buckets:
+        lengths.update(length for length in (bucket - kernel_size, bucket - kernel_size + 1) if 0 <= length <= buckets[-1])
+    return tuple(sorted(lengths))
+
+def group_by_length_bucket(sequences, kernel_size=KERNEL_SIZE, buckets=TEXT_LENGTH_BUCKETS):
+    """
+    Groups the rows of a padded (N, MAX_LEN) batch by length bucket.
+
+    Returns:
+        dict: {bucket: np.array of row indices}, so each group can run as `sequences[rows, :bucket]`.
+    """
+    row_buckets = np.array([bucket_for_length(length, kernel_size, buckets) for length in sequence_lengths(sequences)])
+    return {int(bucket): np.flatnonzero(row_buckets == bucket) for bucket in np.unique(row_buckets)}
+
 def get_cnn_text_embeddings(model, sequences):
     """
     Generates embeddings for input sequences using the CNN model.
     We'll use the output of the GlobalMaxPooling1D layer as embeddings.
     """
-    # Create a sub-model that outputs the GlobalMaxPooling1D layer's output
-    # The GlobalMaxPooling1D layer is at index 2 (0:Embedding, 1:Conv1D, 2:GlobalMaxPooling1D)
-    embedding_model = Model(inputs=model.inputs, outputs=model.layers[2].output)
+    embedding_model = build_text_embedding_extractor(model)
     embeddings = embedding_model.predict(sequences)
     print(f"Generated text embeddings from CNN model. Shape: {embeddings.shape}")
     return embeddings
@@ -94,8 +150,21 @@ if __name__ == "__main__":
         model = build_cnn_text_encoder(num_labels)
         train_text_encoder(model, train_sequences, train_labels, val_sequences, val_labels)
 
+        # Save the fitted tokenizer next to the model so serving uses the same ids
+        TextVectorizer.from_keras_tokenizer(tokenizer, MAX_LEN).save(os.path.join("models", "cnn_text_tokenizer.json"))
+
         # Test embedding generation
         sample_texts = ["This is a test sentence.", "I am very happy with this result."]
         sample_sequences = texts_to_sequences_and_pad(tokenizer, sample_texts, MAX_LEN)
         embeddings = get_cnn_text_embeddings(model, sample_sequences)
         print(f"Sample embeddings shape: {embeddings.shape}")
+
+        # Bucketed inference must reproduce the fixed-length embeddings exactly
+        extractor = build_text_embedding_extractor(model)
+        check_sequences = val_sequences[:256]
+        fixed_embeddings = extractor.predict(check_sequences, verbose=0)
+        bucketed_embeddings = np.empty_like(fixed_embeddings)
+        for bucket, rows in group_by_length_bucket(check_sequences).items():
+            bucketed_embeddings[rows] = extractor.predict(check_sequences[rows, :bucket], verbose=0)
+            print(f"Bucket {bucket}: {len(rows)} sequences")
+        print(f"Bucketed vs fixed-length max |diff|: {np.max(np.abs(bucketed_embeddings - fixed_embeddings)):.2e}")
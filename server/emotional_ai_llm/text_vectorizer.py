@@ -0,0 +1,150 @@
+# emotional_ai_llm/text_vectorizer.py
+
+import json
+import os
+import re
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import layers
+
+from .utils import load_text_data, create_text_tokenizer, texts_to_sequences_and_pad
+
+# Same defaults as tf.keras.preprocessing.text.Tokenizer, so ids match the training pipeline
+DEFAULT_FILTERS = '!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~\t\n'
+OOV_TOKEN = "<unk>"
+
+
+class TextVectorizer:
+    def __init__(self, vocabulary, max_len, filters=DEFAULT_FILTERS, num_words=None):
+        """
+        In-graph replacement for a fitted Keras Tokenizer + pad_sequences.
+
+        Token ids are identical to `Tokenizer(num_words, oov_token="<unk>")` followed by
+        `pad_sequences(padding='post', truncating='post')`: 0 is padding, 1 is the OOV token
+        and vocabulary words start at 2. Standardization, splitting and the vocabulary lookup
+        all run as TensorFlow ops, so a whole batch is encoded without Python per-word loops.
+
+        Args:
+            vocabulary (list): Words ordered by token id, starting at id 2.
+            max_len (int): Length every sequence is padded or truncated to.
+            filters (str): Characters replaced by spaces before splitting.
+            num_words (int, optional): The `num_words` the tokenizer was fitted with (metadata only).
+        """
+        self.vocabulary = list(vocabulary)
+        self.max_len = max_len
+        self.filters = filters
+        self.num_words = num_words
+
+        filters_pattern = "[" + re.escape(filters) + "]"
+
+        def standardize(texts):
+            return tf.strings.regex_replace(tf.strings.lower(texts, encoding="utf-8"), filters_pattern, " ")
+
+        self._layer = layers.TextVectorization(
+            standardize=standardize,
+            split="whitespace",
+            output_mode="int",
+            output_sequence_length=max_len,
+            vocabulary=self.vocabulary if self.vocabulary else None,
+        )
+        if not self.vocabulary:
+            # Keep the layer usable with an empty vocabulary: every word maps to OOV
+            self._layer.set_vocabulary(["<empty>"])
+        self._encode_fn = tf.function(
+            lambda texts: self._layer(texts),
+            input_signature=[tf.TensorSpec(shape=[None], dtype=tf.string)],
+        )
+        print(f"TextVectorizer ready. Vocabulary size: {len(self.vocabulary)}, max length: {max_len}")
+
+    @classmethod
+    def from_keras_tokenizer(cls, tokenizer, max_len):
+        """
+        Builds a vectorizer that reproduces a fitted Keras Tokenizer's ids.
+
+        Args:
+            tokenizer (Tokenizer): Tokenizer fitted with oov_token="<unk>".
+            max_len (int): Sequence length used when training the text encoder.
+        """
+        num_words = tokenizer.num_words
+        ordered_words = sorted(tokenizer.word_index.items(), key=lambda item: item[1])
+        vocabulary = [
+            word for word, index in ordered_words
+            if word != OOV_TOKEN and (num_words is None or index < num_words)
+        ]
+        return cls(vocabulary, max_len, filters=tokenizer.filters, num_words=num_words)
+
+    @classmethod
+    def load(cls, path):
+        """Loads a vectorizer artifact written by `save`."""
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        return cls(config["vocabulary"], config["max_len"], filters=config["filters"], num_words=config.get("num_words"))
+
+    def save(self, path):
+        """Saves the vocabulary and settings as a JSON artifact next to the text encoder."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "max_len": self.max_len,
+                "num_words": self.num_words,
+                "filters": self.filters,
+                "vocabulary": self.vocabulary,
+            }, f)
+        print(f"TextVectorizer saved to {path}")
+
+    def encode(self, texts):
+        """
+        Converts a batch of texts into padded token id sequences.
+
+        Args:
+            texts (list or np.array): Batch of strings.
+
+        Returns:
+            np.array: int32 array of shape (len(texts), max_len).
+        """
+        texts = tf.constant(np.asarray(texts, dtype=object).astype(str).reshape(-1))
+        return self._encode_fn(texts).numpy().astype(np.int32)
+
+
+def fit_text_vectorizer(texts, num_words, max_len):
+    """
+    Fits a Keras Tokenizer on the training corpus and converts it into a TextVectorizer.
+
+    Args:
+        texts (list): Training corpus.
+        num_words (int): Vocabulary size used for the text encoder.
+        max_len (int): Sequence length used for the text encoder.
+
+    Returns:
+        TextVectorizer: Vectorizer producing the same ids as the fitted tokenizer.
+    """
+    tokenizer = create_text_tokenizer(texts, num_words=num_words)
+    return TextVectorizer.from_keras_tokenizer(tokenizer, max_len)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fit the text tokenizer artifact on the training corpus.")
+    parser.add_argument("--corpus", default=os.path.join("data", "raw", "goemotions_1.csv"))
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--output", default=os.path.join("models", "cnn_text_tokenizer.json"))
+    parser.add_argument("--num-words", type=int, default=10000)
+    parser.add_argument("--max-len", type=int, default=128)
+    args = parser.parse_args()
+
+    texts, _ = load_text_data(args.corpus, args.text_column, [])
+    if texts is None:
+        raise SystemExit(f"Could not load training corpus from {args.corpus}")
+
+    vectorizer = fit_text_vectorizer(texts, args.num_words, args.max_len)
+    vectorizer.save(args.output)
+
+    # Parity check against the Keras Tokenizer path used for training
+    tokenizer = create_text_tokenizer(texts, num_words=args.num_words)
+    sample_texts = texts[:256] + ["Completely unseen words here!", ""]
+    expected = texts_to_sequences_and_pad(tokenizer, sample_texts, args.max_len)
+    actual = TextVectorizer.load(args.output).encode(sample_texts)
+    mismatches = int(np.sum(np.any(expected != actual, axis=1)))
+    print(f"Parity with Keras Tokenizer: {len(sample_texts) - mismatches}/{len(sample_texts)} sequences identical.")
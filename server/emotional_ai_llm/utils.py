@@ -4,6 +4,9 @@ import pandas as pd
 import librosa
 import librosa.display
 import numpy as np
+import soundfile as sf
+import tempfile
+from io import BytesIO
 import tensorflow as tf
 from tensorflow.keras.preprocessing.text import Tokenizer
 from tensorflow.keras.preprocessing.sequence import pad_sequences
@@ -86,8 +89,7 @@ def extract_mel_spectrogram(audio_path, sr=22050, n_mels=128, hop_length=512):
     """
     try:
         y, sr = librosa.load(audio_path, sr=sr)
-        mel_spectrogram = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=n_mels, hop_length=hop_length)
-        mel_spectrogram_db = librosa.power_to_db(mel_spectrogram, ref=np.max)
+        mel_spectrogram_db = mel_spectrogram_from_waveform(y, sr, n_mels=n_mels, hop_length=hop_length)
         print(f"Extracted mel-spectrogram from {os.path.basename(audio_path)}. Shape: {mel_spectrogram_db.shape}")
         return mel_spectrogram_db
     except FileNotFoundError:
@@ -97,6 +99,72 @@ def extract_mel_spectrogram(audio_path, sr=22050, n_mels=128, hop_length=512):
         print(f"Error extracting mel-spectrogram from {audio_path}: {e}")
         return None
 
+def mel_spectrogram_from_waveform(y, sr, n_mels=128, hop_length=512):
+    """
+    Computes a dB-scaled mel-spectrogram from an in-memory waveform.
+
+    Args:
+        y (np.array): Mono waveform.
+        sr (int): Sampling rate of `y`.
+        n_mels (int): Number of Mel bands to generate.
+        hop_length (int): The number of samples between successive frames.
+
+    Returns:
+        np.array: Mel-spectrogram in dB, shape (n_mels, frames).
+    """
+    mel_spectrogram = librosa.feature.melspectrogram(y=y, sr=sr, n_mels=n_mels, hop_length=hop_length)
+    return librosa.power_to_db(mel_spectrogram, ref=np.max)
+
+def decode_audio_bytes(audio_bytes, sr=22050):
+    """
+    Decodes an encoded audio clip (WAV, FLAC, OGG, ...) straight from memory.
+
+    Containers libsndfile cannot read (e.g. the WebM/Opus produced by browser MediaRecorder)
+    fall back to librosa's audioread backend, which needs a temporary file.
+
+    Args:
+        audio_bytes (bytes): Encoded audio file contents.
+        sr (int): Target sampling rate.
+
+    Returns:
+        tuple: (y, sr) mono float32 waveform and its sampling rate.
+    """
+    try:
+        y, native_sr = sf.read(BytesIO(audio_bytes), dtype='float32', always_2d=False)
+    except (RuntimeError, sf.LibsndfileError):
+        with tempfile.NamedTemporaryFile(suffix=".audio") as tmp:
+            tmp.write(audio_bytes)
+            tmp.flush()
+            return librosa.load(tmp.name, sr=sr)
+
+    if y.ndim > 1:
+        y = y.mean(axis=1) # Down-mix to mono like librosa.load
+    if native_sr != sr:
+        y = librosa.resample(y, orig_sr=native_sr, target_sr=sr)
+    return y, sr
+
+def extract_mel_spectrogram_from_bytes(audio_bytes, sr=22050, n_mels=128, hop_length=512):
+    """
+    Extracts mel-spectrogram features from encoded audio held in memory.
+
+    Args:
+        audio_bytes (bytes): Encoded audio file contents.
+        sr (int): Sampling rate.
+        n_mels (int): Number of Mel bands to generate.
+        hop_length (int): The number of samples between successive frames.
+
+    Returns:
+        np.array: Mel-spectrogram, or None if the audio could not be decoded.
+    """
+    try:
+        y, sr = decode_audio_bytes(audio_bytes, sr=sr)
+        mel_spectrogram_db = mel_spectrogram_from_waveform(y, sr, n_mels=n_mels, hop_length=hop_length)
+        print(f"Extracted mel-spectrogram from {len(audio_bytes)} in-memory bytes. Shape: {mel_spectrogram_db.shape}")
+        return mel_spectrogram_db
+    except Exception as e:
+        print(f"Error extracting mel-spectrogram from in-memory audio: {e}")
+        return None
+
 def extract_facial_embeddings_placeholder(image_path):
     """
     Placeholder for extracting facial expression embeddings from an image.
@@ -6,6 +6,8 @@ from tensorflow.keras.applications import MobileNetV2
 from sklearn.model_selection import train_test_split
 import numpy as np
 import os
+
+from .model_registry import get_model_registry, mobilenet_weights_filename
 # from utils import preprocess_image (Placeholder if needed later for actual image loading)
 
 # Define constants for vision encoder
@@ -16,30 +18,62 @@ INPUT_SHAPE = (IMG_HEIGHT, IMG_WIDTH, IMG_CHANNELS)
 BATCH_SIZE = 32
 EPOCHS = 3
 
-def build_mobilenet_vision_encoder(num_labels):
+# Backbone tiers, cheapest first: MobileNetV2 width multiplier and square input resolution.
+# Every tier ends in the same 128-d 'vision_embedding' layer; "default" is the original model.
+VISION_TIERS = {
+    "fast": {"alpha": 0.35, "resolution": 96},
+    "balanced": {"alpha": 0.75, "resolution": 128},
+    "default": {"alpha": 1.0, "resolution": 128},
+    "accurate": {"alpha": 1.0, "resolution": 160},
+}
+DEFAULT_VISION_TIER = "default"
+VISION_MODELS_DIR = "models"
+
+def vision_tier_input_shape(tier):
+    """(height, width, channels) expected by a backbone tier."""
+    resolution = VISION_TIERS[tier]["resolution"]
+    return (resolution, resolution, IMG_CHANNELS)
+
+def vision_tier_model_path(tier, models_dir=VISION_MODELS_DIR):
+    """Saved model path of a tier; the default tier keeps the original file name."""
+    suffix = "" if tier == DEFAULT_VISION_TIER else f"_{tier}"
+    return os.path.join(models_dir, f"vision_mobilenet_encoder{suffix}.keras")
+
+def build_mobilenet_vision_encoder(num_labels, alpha=1.0, input_shape=INPUT_SHAPE):
     """
     Builds a vision encoder using MobileNetV2 as a base and adds a custom classification head.
-    Attempts to load ImageNet weights, falls back to random initialization if weights cannot be loaded.
+    Loads ImageNet weights from the local model registry when present, otherwise downloads them
+    (unless offline); falls back to random initialization if weights cannot be loaded.
+    `alpha` (width multiplier) and `input_shape` select the backbone tier (see VISION_TIERS).
     """
+    registry = get_model_registry()
+    weights = registry.file_path("mobilenet_v2_imagenet", mobilenet_weights_filename(alpha, input_shape[0]))
+    if weights is None and not registry.offline:
+        weights = 'imagenet' # Download the pre-trained ImageNet weights
     try:
         base_model = MobileNetV2(
-            input_shape=INPUT_SHAPE,
+            input_shape=input_shape,
+            alpha=alpha,
             include_top=False, # Don't include the ImageNet classifier at the top
-            weights='imagenet' # Try to load pre-trained ImageNet weights
+            weights=weights
         )
-        print("MobileNetV2 base model loaded with ImageNet weights.")
+        if weights is None:
+            print("Offline and no registry copy of the ImageNet weights: MobileNetV2 base model uses random weights.")
+        else:
+            print(f"MobileNetV2 base model loaded with ImageNet weights ({'registry' if weights != 'imagenet' else 'download'}).")
     except Exception as e:
         print(f"Warning: Could not load MobileNetV2 with ImageNet weights due to: {e}")
         print("Initializing MobileNetV2 base model with random weights.")
         base_model = MobileNetV2(
-            input_shape=INPUT_SHAPE,
+            input_shape=input_shape,
+            alpha=alpha,
             include_top=False,
             weights=None # Fallback to random initialization
         )
 
     base_model.trainable = False # Freeze the base model for feature extraction
 
-    inputs = tf.keras.Input(shape=INPUT_SHAPE)
+    inputs = tf.keras.Input(shape=input_shape)
     x = tf.keras.applications.mobilenet_v2.preprocess_input(inputs) # Standard MobileNetV2 preprocessing
     x = base_model(x, training=False) # Ensure base model runs in inference mode
     x = layers.GlobalAveragePooling2D()(x)
@@ -53,6 +87,10 @@ def build_mobilenet_vision_encoder(num_labels):
     model.summary()
     return model
 
+def build_vision_tier(tier, num_labels):
+    """Builds the vision encoder of a backbone tier (see VISION_TIERS)."""
+    return build_mobilenet_vision_encoder(num_labels, alpha=VISION_TIERS[tier]["alpha"], input_shape=vision_tier_input_shape(tier))
+
 def train_vision_encoder(model, train_images, train_labels, val_images, val_labels, output_dir="models/vision_mobilenet_encoder"):
     """
     Trains the vision encoder model.
@@ -72,22 +110,66 @@ def train_vision_encoder(model, train_images, train_labels, val_images, val_labe
     model.save(output_dir + ".keras") # Save as Keras Native format
     print(f"Vision encoder model saved to {output_dir}.keras")
 
-def get_vision_embeddings(model, images):
-    """
-    Generates embeddings for input images using the vision encoder model.
-    We'll use the output of the 'vision_embedding' layer.
-    """
-    # Create a sub-model that outputs the embedding layer
+def _vision_embedding_output(model):
+    """Returns the output tensor of the 128-unit embedding layer."""
     try:
-        output_layer = model.get_layer('vision_embedding').output
+        return model.get_layer('vision_embedding').output
     except ValueError:
         # Fallback for models saved without the custom layer name
         # The error message indicated the layers are: ..., 'dense', 'dropout_1', 'dense_1'
         # 'dense' corresponds to the 128-unit embedding layer in the architecture.
         print("Warning: 'vision_embedding' layer not found. Falling back to 'dense' layer.")
-        output_layer = model.get_layer('dense').output
+        return model.get_layer('dense').output
+
+def build_vision_embedding_extractor(model):
+    """
+    Builds the sub-model that outputs the 'vision_embedding' layer.
+    Build it once and reuse it; constructing it per request is expensive.
+    """
+    return Model(inputs=model.inputs, outputs=_vision_embedding_output(model))
+
+def build_vision_embedding_and_head_model(model):
+    """
+    Builds a sub-model returning both the 'vision_embedding' layer and the classification
+    head's per-emotion scores, so one MobileNetV2 pass serves fusion and live feedback.
+    """
+    return Model(inputs=model.inputs, outputs={
+        "vision_embedding": _vision_embedding_output(model),
+        "vision_probabilities": model.outputs[0],
+    })
+
+def distill_vision_tier(student, teacher, images, epochs=EPOCHS, output_path=None):
+    """
+    Aligns a tier's embedding space with the default model the fusion MLP was trained on.
+
+    The student's 'vision_embedding' output is regressed (MSE) onto the teacher's
+    embeddings of the same images, resized to the student's resolution. Its classification
+    head is trained on the teacher's scores, so both stay interchangeable at serving time.
+
+    Args:
+        student (tf.keras.Model): Tier model from `build_vision_tier`.
+        teacher (tf.keras.Model): The default vision encoder.
+        images (np.array): Unlabelled face images at the teacher's resolution, in [0, 1].
+        epochs (int): Training epochs.
+        output_path (str, optional): Where to save the distilled student.
+    """
+    teacher_outputs = build_vision_embedding_and_head_model(teacher).predict(images, verbose=0)
+    student_inputs = tf.image.resize(images, student.input_shape[1:3]).numpy()
+    trainer = build_vision_embedding_and_head_model(student)
+    trainer.compile(optimizer="adam", loss={"vision_embedding": "mse", "vision_probabilities": "binary_crossentropy"})
+    trainer.fit(student_inputs, teacher_outputs, batch_size=BATCH_SIZE, epochs=epochs, verbose=2)
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        student.save(output_path)
+        print(f"Distilled vision tier saved to {output_path}")
+    return student
 
-    embedding_model = Model(inputs=model.inputs, outputs=output_layer)
+def get_vision_embeddings(model, images):
+    """
+    Generates embeddings for input images using the vision encoder model.
+    We'll use the output of the 'vision_embedding' layer.
+    """
+    embedding_model = build_vision_embedding_extractor(model)
     embeddings = embedding_model.predict(images)
     print(f"Generated vision embeddings. Shape: {embeddings.shape}")
     return embeddings
@@ -117,3 +199,16 @@ if __name__ == "__main__":
     sample_images = np.random.rand(2, IMG_HEIGHT, IMG_WIDTH, IMG_CHANNELS).astype(np.float32)
     embeddings = get_vision_embeddings(model, sample_images)
     print(f"Sample embeddings shape: {embeddings.shape}")
+
+    # Build and distill the other backbone tiers from the default model, then compare their latency
+    import time
+    for tier in VISION_TIERS:
+        tier_model = model if tier == DEFAULT_VISION_TIER else distill_vision_tier(
+            build_vision_tier(tier, num_labels), model, dummy_images, output_path=vision_tier_model_path(tier))
+        extractor = build_vision_embedding_extractor(tier_model)
+        frame = np.random.rand(1, *vision_tier_input_shape(tier)).astype(np.float32)
+        extractor(frame, training=False) # Warm-up
+        start = time.perf_counter()
+        for _ in range(20):
+            tier_embedding = extractor(frame, training=False)
+        print(f"Tier '{tier}' {VISION_TIERS[tier]}: embedding {tuple(tier_embedding.shape)}, {1000 * (time.perf_counter() - start) / 20:.2f} ms/frame")
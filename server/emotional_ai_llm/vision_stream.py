@@ -0,0 +1,191 @@
+# emotional_ai_llm/vision_stream.py
+
+# Building blocks for the live webcam stream: frame pacing, probability smoothing and the
+# store that hands the latest vision embedding to the session's text turns. Kept free of
+# TensorFlow imports.
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Defaults (overridable through environment variables, see StreamedVisionEmbeddings.from_env
+# and the NOVA_VISION_STREAM_* settings read by the FastAPI app)
+DEFAULT_VISION_STREAM_MAX_FPS = 10.0
+DEFAULT_VISION_STREAM_MIN_FPS = 1.0
+DEFAULT_VISION_SMOOTHING_S = 0.5
+DEFAULT_VISION_EMBEDDING_TTL_S = 10
+DEFAULT_MAX_VISION_STREAMS = 10000
+
+# Per stream, frames are spaced at least this many times their processing latency apart,
+# so one camera never keeps a worker busy all the time
+LATENCY_HEADROOM = 1.5
+
+
+class AdaptiveFrameRate:
+    def __init__(self, max_fps=DEFAULT_VISION_STREAM_MAX_FPS, min_fps=DEFAULT_VISION_STREAM_MIN_FPS, latency_smoothing=0.3):
+        """
+        Paces frame processing by the measured inference latency.
+
+        The interval between processed frames is LATENCY_HEADROOM x the smoothed processing
+        latency, clamped to [1 / max_fps, 1 / min_fps]. Frames arriving before the next slot
+        are not queued: the caller keeps only the newest one and drops the rest.
+
+        Args:
+            max_fps (float): Upper bound on processed frames per second.
+            min_fps (float): Lower bound, reached when inference is slow or rejected.
+            latency_smoothing (float): Weight of the newest latency sample in its moving average.
+        """
+        self.min_interval_s = 1.0 / max_fps
+        self.max_interval_s = 1.0 / min_fps
+        self.latency_smoothing = latency_smoothing
+        self.latency_s = 0.0
+        self.interval_s = self.min_interval_s
+        self._next_at = 0.0
+
+    def delay(self):
+        """Seconds to wait before the next frame may be processed."""
+        return max(0.0, self._next_at - time.monotonic())
+
+    def record(self, started_at, latency_s):
+        """Accounts for a processed frame that started at `started_at` (time.monotonic())."""
+        if self.latency_s == 0.0:
+            self.latency_s = latency_s
+        else:
+            self.latency_s += self.latency_smoothing * (latency_s - self.latency_s)
+        self.interval_s = min(max(self.latency_s * LATENCY_HEADROOM, self.min_interval_s), self.max_interval_s)
+        self._next_at = started_at + self.interval_s
+
+    def back_off(self):
+        """Halves the frame rate after the server rejected a frame as overloaded."""
+        self.interval_s = min(self.interval_s * 2, self.max_interval_s)
+        self._next_at = time.monotonic() + self.interval_s
+
+    @property
+    def fps(self):
+        return 1.0 / self.interval_s
+
+
+class ProbabilitySmoother:
+    def __init__(self, time_constant_s=DEFAULT_VISION_SMOOTHING_S):
+        """
+        Exponential moving average of per-emotion probabilities over wall-clock time.
+
+        The weight of a new frame depends on the time elapsed since the previous one
+        (1 - exp(-dt / time_constant_s)), so smoothing stays the same when the frame rate adapts.
+
+        Args:
+            time_constant_s (float): Smoothing time constant. 0 disables smoothing.
+        """
+        self.time_constant_s = time_constant_s
+        self.probabilities = None
+        self._updated_at = None
+
+    def update(self, probabilities, now=None):
+        """
+        Folds in the probabilities of a new frame.
+
+        Returns:
+            np.array: Smoothed probabilities, normalized to sum to 1.
+        """
+        now = time.monotonic() if now is None else now
+        probabilities = np.asarray(probabilities, dtype=np.float32)
+        total = probabilities.sum()
+        if total > 0:
+            probabilities = probabilities / total
+        if self.probabilities is None or self.time_constant_s <= 0:
+            self.probabilities = probabilities
+        else:
+            weight = 1.0 - math.exp(-(now - self._updated_at) / self.time_constant_s)
+            self.probabilities = self.probabilities + weight * (probabilities - self.probabilities)
+        self._updated_at = now
+        return self.probabilities
+
+
+class StreamedVisionEmbeddings:
+    def __init__(self, ttl_s=DEFAULT_VISION_EMBEDDING_TTL_S, max_streams=DEFAULT_MAX_VISION_STREAMS):
+        """
+        Latest vision embedding per chat session from the webcam stream.
+
+        Unlike streamed audio, an entry is not consumed by a text turn: the camera keeps
+        describing the user until the stream stops, so every turn within `ttl_s` of the last
+        processed frame reuses it. Frame counters of all streams are aggregated for /metrics.
+
+        Args:
+            ttl_s (float): Seconds an embedding stays usable after the last processed frame.
+            max_streams (int): Maximum number of sessions with a stored embedding.
+        """
+        self.ttl_s = ttl_s
+        self.max_streams = max_streams
+        self._embeddings = OrderedDict() # session_id -> (embedding, updated_at)
+        self._lock = threading.Lock()
+        self._stats = {"frames_received": 0, "frames_processed": 0, "frames_dropped": 0, "frames_rejected": 0, "reused": 0}
+
+    @classmethod
+    def from_env(cls):
+        """Builds a store configured from NOVA_VISION_EMBEDDING_TTL_S and NOVA_MAX_VISION_STREAMS."""
+        return cls(
+            ttl_s=float(os.environ.get("NOVA_VISION_EMBEDDING_TTL_S", DEFAULT_VISION_EMBEDDING_TTL_S)),
+            max_streams=int(os.environ.get("NOVA_MAX_VISION_STREAMS", DEFAULT_MAX_VISION_STREAMS)),
+        )
+
+    def put(self, session_id, embedding):
+        """Stores the embedding of a session's most recently processed frame."""
+        with self._lock:
+            self._embeddings.pop(session_id, None)
+            self._embeddings[session_id] = (np.asarray(embedding, dtype=np.float32), time.monotonic())
+            while len(self._embeddings) > self.max_streams:
+                self._embeddings.popitem(last=False)
+
+    def latest(self, session_id):
+        """
+        Returns a session's latest streamed embedding without removing it.
+
+        Returns:
+            np.array or None: (128,) embedding, or None if there is none or it is stale.
+        """
+        if session_id is None:
+            return None
+        with self._lock:
+            entry = self._embeddings.get(session_id)
+            if entry is None:
+                return None
+            embedding, updated_at = entry
+            if time.monotonic() - updated_at > self.ttl_s:
+                del self._embeddings[session_id]
+                return None
+            self._stats["reused"] += 1
+            return embedding
+
+    def count_frames(self, received=0, processed=0, dropped=0, rejected=0):
+        with self._lock:
+            self._stats["frames_received"] += received
+            self._stats["frames_processed"] += processed
+            self._stats["frames_dropped"] += dropped
+            self._stats["frames_rejected"] += rejected
+
+    def drop_session(self, session_id):
+        """Forgets a session's pending embedding, e.g. when the user deletes the conversation."""
+        with self._lock:
+            self._embeddings.pop(session_id, None)
+
+    def get_metrics(self):
+        with self._lock:
+            return {"active": len(self._embeddings), **self._stats}
+
+
+if __name__ == "__main__":
+    print("Running vision stream module development example:")
+
+    rate = AdaptiveFrameRate(max_fps=10)
+    for latency_s in (0.02, 0.05, 0.2, 0.2, 0.2):
+        rate.record(time.monotonic(), latency_s)
+        print(f"latency {latency_s * 1000:.0f} ms -> {rate.fps:.1f} fps")
+
+    smoother = ProbabilitySmoother(time_constant_s=0.5)
+    print(f"First frame:         {smoother.update([1, 0, 0], now=0.0)}")
+    print(f"Flip after 0.1 s:    {smoother.update([0, 1, 0], now=0.1)}")
+    print(f"Held for another 1 s: {smoother.update([0, 1, 0], now=1.1)}")
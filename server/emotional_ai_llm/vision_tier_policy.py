@@ -0,0 +1,96 @@
+# emotional_ai_llm/vision_tier_policy.py
+
+# Picks the vision backbone tier (see vision_encoder.VISION_TIERS) for each request from the
+# current load or the request's latency budget. Kept free of TensorFlow imports.
+
+import os
+import threading
+
+# Defaults (overridable through environment variables, see VisionTierPolicy.from_env)
+DEFAULT_QUEUE_STEP = 4 # Queued inference jobs per step down to a cheaper tier
+DEFAULT_LATENCY_SMOOTHING = 0.2
+
+
+class VisionTierPolicy:
+    def __init__(self, tiers, default_tier, latencies_ms, workers=1, queue_step=DEFAULT_QUEUE_STEP,
+                 latency_smoothing=DEFAULT_LATENCY_SMOOTHING):
+        """
+        Chooses a vision backbone tier per request.
+
+        Without a latency budget, requests use `default_tier` while the inference queue is
+        short and step down one (cheaper) tier for every `queue_step` queued jobs. With a
+        budget, the most accurate tier whose estimated latency fits is used, where the
+        estimate is the tier's measured frame latency scaled by the work queued per worker.
+        More expensive tiers than the default are only ever picked for a budget.
+
+        Args:
+            tiers (list): Available tier names, cheapest first.
+            default_tier (str): Tier used under normal load.
+            latencies_ms (dict): Initial per-frame latency of each tier (e.g. from
+                                 `InferenceSession.benchmark_vision_tiers`).
+            workers (int): Inference worker threads sharing the queue.
+            queue_step (int): Queued jobs per step down to a cheaper tier.
+            latency_smoothing (float): Weight of a new latency sample in the per-tier moving average.
+        """
+        self.tiers = list(tiers)
+        self.default_tier = default_tier
+        self.workers = max(1, workers)
+        self.queue_step = max(1, queue_step)
+        self.latency_smoothing = latency_smoothing
+        self._latency_ms = {tier: float(latencies_ms.get(tier, 0.0)) for tier in self.tiers}
+        self._lock = threading.Lock()
+        self._chosen = {tier: 0 for tier in self.tiers}
+
+    @classmethod
+    def from_env(cls, tiers, default_tier, latencies_ms, workers=1):
+        """Builds a policy with the queue step taken from NOVA_VISION_TIER_QUEUE_STEP."""
+        return cls(
+            tiers, default_tier, latencies_ms, workers=workers,
+            queue_step=int(os.environ.get("NOVA_VISION_TIER_QUEUE_STEP", DEFAULT_QUEUE_STEP)),
+        )
+
+    def choose(self, queue_depth, latency_budget_ms=None):
+        """
+        Args:
+            queue_depth (int): Inference jobs currently waiting for a worker.
+            latency_budget_ms (float, optional): Time the request may spend in the vision encoder.
+
+        Returns:
+            str: The tier to use.
+        """
+        with self._lock:
+            if latency_budget_ms is not None:
+                load_factor = 1.0 + queue_depth / self.workers
+                fitting = [tier for tier in self.tiers if self._latency_ms[tier] * load_factor <= latency_budget_ms]
+                tier = fitting[-1] if fitting else self.tiers[0]
+            else:
+                default_index = self.tiers.index(self.default_tier)
+                tier = self.tiers[max(0, default_index - queue_depth // self.queue_step)]
+            self._chosen[tier] += 1
+            return tier
+
+    def record(self, tier, latency_s):
+        """Updates a tier's latency estimate with a measured encoder call."""
+        with self._lock:
+            self._latency_ms[tier] += self.latency_smoothing * (1000 * latency_s - self._latency_ms[tier])
+
+    def get_metrics(self):
+        with self._lock:
+            return {
+                "chosen": dict(self._chosen),
+                "latency_ms": {tier: round(latency, 3) for tier, latency in self._latency_ms.items()},
+            }
+
+
+if __name__ == "__main__":
+    print("Running VisionTierPolicy module development example:")
+
+    policy = VisionTierPolicy(
+        ["fast", "balanced", "default", "accurate"], "default",
+        {"fast": 4.0, "balanced": 9.0, "default": 14.0, "accurate": 22.0}, workers=4,
+    )
+    for queue_depth in (0, 4, 8, 20):
+        print(f"queue depth {queue_depth:>2}: {policy.choose(queue_depth)}")
+    for budget_ms in (50, 20, 10, 1):
+        print(f"budget {budget_ms:>2} ms, idle: {policy.choose(0, budget_ms)} | queue 8: {policy.choose(8, budget_ms)}")
+    print(f"Metrics: {policy.get_metrics()}")
@@ -1,7 +1,10 @@
 import sys
 import os
 import logging
-import tempfile
+import json
+import asyncio
+import functools
+import time
 from contextlib import asynccontextmanager
 from typing import Optional, Any, List
 
@@ -10,14 +13,13 @@ import tensorflow as tf
 # Explicitly set TensorFlow to use only CPU
 tf.config.set_visible_devices([], 'GPU')
 
-from fastapi import FastAPI, Request, HTTPException, status
+from fastapi import FastAPI, Request, HTTPException, status, File, Form, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 import numpy as np
 import base64
-import cv2
-from io import BytesIO
-from PIL import Image
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,50 +28,116 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
 # Import the main orchestration function and necessary components from the emotional_ai_llm package
-from emotional_ai_llm.main import load_all_models, initialize_components, simulate_input_processing, EMOTION_LABELS, MAX_LEN_TEXT, VOCAB_SIZE_TEXT, INPUT_SHAPE_VISION
-from emotional_ai_llm.utils import create_text_tokenizer
+from emotional_ai_llm.main import load_all_models, load_text_vectorizer, initialize_components, prepare_audio_input_with_stats, prepare_vision_input, get_audio_frontend, voice_activity_stats, EMOTION_LABELS, INPUT_SHAPE_VISION, EMBEDDING_DIM_FUSION, AUDIO_EMBEDDING_DIM, VISION_EMBEDDING_DIM, AUDIO_WINDOW_HOP_FRAMES, AUDIO_POOLING
 from emotional_ai_llm.reporter import Reporter
 from emotional_ai_llm.nlp_analyzer import TextEmotionAnalyzer # Import NLP Analyzer
+from emotional_ai_llm.inference_executor import InferenceExecutor, InferenceQueueFullError
+from emotional_ai_llm.preprocessing import decode_image_base64, decode_image_bytes, strip_data_url, ImageTooLargeError, MAX_IMAGE_BYTES, FACE_CROP_ENABLED
+from emotional_ai_llm.batching import MicroBatcher
+from emotional_ai_llm.session_store import SessionMemoryStore
+from emotional_ai_llm.end_to_end_graph import SIGNATURE_NAMES, signature_for
+from emotional_ai_llm.streaming_audio import StreamingAudioEncoder, StreamedAudioEmbeddings, PCM_FORMATS
+from emotional_ai_llm.embedding_cache import EmbeddingCache, CACHE_NAMES, content_key, normalize_text
+from emotional_ai_llm.frame_gate import FrameChangeGate, frame_signature
+from emotional_ai_llm.vision_encoder import VISION_TIERS, DEFAULT_VISION_TIER, vision_tier_input_shape
+from emotional_ai_llm.vision_tier_policy import VisionTierPolicy
+from emotional_ai_llm.response_planner import reply_deadline
+from emotional_ai_llm.model_registry import get_model_registry
+from emotional_ai_llm.vision_stream import (
+    AdaptiveFrameRate, ProbabilitySmoother, StreamedVisionEmbeddings,
+    DEFAULT_VISION_STREAM_MAX_FPS, DEFAULT_VISION_STREAM_MIN_FPS, DEFAULT_VISION_SMOOTHING_S,
+)
 
 # --- Global instances of LLM components (will be initialized in lifespan event) ---
 text_encoder_model = None
 audio_encoder_model = None
 vision_encoder_model = None
 fusion_model = None
-memory = None
+inference_session = None # Pre-built graphs for all encoders and the fusion model
+session_store = None # Per-session ConversationMemory instances
 planner = None
 safety_checker = None
 output_handler = None
-text_tokenizer = None
+text_vectorizer = None
 reporter = None
 nlp_analyzer = None # Global NLP analyzer
+inference_executor = None # Runs blocking model calls off the event loop
+batchers = {} # Request-coalescing schedulers, one per end-to-end graph signature ("text_only", "text_vision", ...)
+streamed_audio = None # Latest audio embedding per session from /ws/audio, used by the next text turn
+embedding_caches = {} # Content-hash caches: "text", "audio" and "vision" embeddings, "nlp" probabilities
+frame_gate = None # Reuses a session's vision embedding while its camera frame is unchanged
+streamed_vision = None # Latest vision embedding per session from /ws/vision, reused by text turns
+vision_tier_policy = None # Picks the vision backbone tier per request from load or latency budget
+
+# Webcam stream pacing and smoothing (see vision_stream.py)
+VISION_STREAM_MAX_FPS = float(os.environ.get("NOVA_VISION_STREAM_MAX_FPS", DEFAULT_VISION_STREAM_MAX_FPS))
+VISION_STREAM_MIN_FPS = float(os.environ.get("NOVA_VISION_STREAM_MIN_FPS", DEFAULT_VISION_STREAM_MIN_FPS))
+VISION_SMOOTHING_S = float(os.environ.get("NOVA_VISION_SMOOTHING_S", DEFAULT_VISION_SMOOTHING_S))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Load the ML model when the app starts and clean up resources when the app stops.
     """
-    global text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model
-    global memory, planner, safety_checker, output_handler, text_tokenizer, reporter, nlp_analyzer
+    global text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model, inference_session
+    global session_store, planner, safety_checker, output_handler, text_vectorizer, reporter, nlp_analyzer
+    global inference_executor, batchers, streamed_audio, embedding_caches, frame_gate, streamed_vision, vision_tier_policy
 
     logging.info("Starting to load LLM components for FastAPI app...")
     
     # Load all models and initialize AI components
-    text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model = load_all_models()
-    memory, planner, safety_checker, output_handler = initialize_components()
+    text_encoder_model, audio_encoder_model, vision_encoder_model, fusion_model, inference_session = load_all_models()
+    _, planner, safety_checker, output_handler = initialize_components()
+    session_store = SessionMemoryStore.from_env(embedding_dim=EMBEDDING_DIM_FUSION)
 
-    # Initialize tokenizer once globally
-    dummy_texts = ["dummy text for tokenizer initialization"]
-    text_tokenizer = create_text_tokenizer(dummy_texts, num_words=VOCAB_SIZE_TEXT)
+    # Tokenizer artifact fitted on the training corpus, saved alongside the text encoder
+    text_vectorizer = load_text_vectorizer()
     
     reporter = Reporter()
-    nlp_analyzer = TextEmotionAnalyzer() # Initialize NLP analyzer
+    embedding_caches = {name: EmbeddingCache.from_env(name) for name in CACHE_NAMES}
+    frame_gate = FrameChangeGate.from_env()
+    nlp_analyzer = TextEmotionAnalyzer(cache=embedding_caches["nlp"]) # Initialize NLP analyzer
+    inference_executor = InferenceExecutor.from_env()
+    # Turns with the same modalities are batched together and run as one end-to-end graph call
+    batchers = {
+        name: MicroBatcher.from_env(name, _run_end_to_end_batch, inference_executor)
+        for name in SIGNATURE_NAMES.values()
+    }
+    # Mel windows completed by streaming audio sessions, batched across connections
+    batchers["audio_stream"] = MicroBatcher.from_env("audio_stream", inference_session.audio_embeddings, inference_executor)
+    streamed_audio = StreamedAudioEmbeddings.from_env()
+    # Webcam frames of all /ws/vision connections, encoded with the vision head in one call
+    batchers["vision_stream"] = MicroBatcher.from_env("vision_stream", inference_session.vision_embeddings_and_probabilities, inference_executor)
+    streamed_vision = StreamedVisionEmbeddings.from_env()
+    # Cheaper/more accurate vision backbones run standalone and are fused in NumPy
+    for tier in inference_session.vision_tiers:
+        if tier != DEFAULT_VISION_TIER:
+            batchers[f"vision_{tier}"] = MicroBatcher.from_env(
+                f"vision_{tier}", functools.partial(inference_session.vision_tier_embeddings, tier), inference_executor)
+    vision_tier_policy = VisionTierPolicy.from_env(
+        [tier for tier in VISION_TIERS if tier in inference_session.vision_tiers], DEFAULT_VISION_TIER,
+        inference_session.benchmark_vision_tiers(), workers=inference_executor.max_threads,
+    )
+    get_model_registry().log_load_report()
     logging.info("LLM components loaded and initialized for FastAPI app.")
     
     yield # Application runs
     
     # Clean up resources (if any)
     logging.info("Shutting down FastAPI app.")
+    for batcher in batchers.values():
+        await batcher.close()
+    planner.close()
+    inference_executor.shutdown()
+
+def _run_end_to_end_batch(inputs):
+    """Tokenizes a stacked batch of turns and runs it through the matching end-to-end graph signature."""
+    return inference_session.run_end_to_end(
+        text_vectorizer.encode(inputs["texts"]),
+        mel_spectrograms=inputs.get("mel_spectrograms"),
+        audio_window_weights=inputs.get("audio_window_weights"),
+        images=inputs.get("images"),
+    )
 
 app = FastAPI(lifespan=lifespan)
 
@@ -82,12 +150,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(InferenceQueueFullError)
+async def inference_queue_full_handler(request: Request, exc: InferenceQueueFullError):
+    logging.warning(f"Rejecting request, inference queue is full: {exc}")
+    return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"detail": "Server is busy, please retry shortly."})
+
+# Keep proxies from buffering Server-Sent Events
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 # --- Request Models ---
 class ChatRequest(BaseModel):
     text: str
     emotion: str = "neutral"
     image: Optional[str] = None # Base64 encoded image
     audio: Optional[str] = None # Base64 encoded audio
+    session_id: Optional[str] = None # Keeps conversation memory per chat session
+    latency_budget_ms: Optional[float] = None # Vision encoder budget; picks a cheaper backbone tier when tight
+    reply_budget_ms: Optional[float] = None # Whole-turn budget; the reply is cut short or templated to meet it (default NOVA_REPLY_BUDGET_MS)
 
 class AnalysisData(BaseModel):
     moodScore: float
@@ -102,16 +181,13 @@ class ChatResponse(BaseModel):
     dominant_emotions: str
     suggested_actions: List[str]
     analysisData: AnalysisData
+    audio_activity: Optional[dict] = None # Silence trimming and mel window coverage stats of the turn's audio clip
 
-# --- Endpoints ---
+# --- Helpers ---
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request_data: ChatRequest):
-    user_input_text = request_data.text
-    user_facial_emotion = request_data.emotion
-    image_base64 = request_data.image
-
-    interaction_data = {
+def _new_interaction_data(user_input_text, user_facial_emotion):
+    """Creates the Reporter record for one chat turn."""
+    return {
         "user_input": user_input_text,
         "user_facial_emotion": user_facial_emotion,
         "ai_response": "",
@@ -123,106 +199,191 @@ async def chat(request_data: ChatRequest):
         "crisis_keywords_ai": []
     }
 
-    if not user_input_text:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No text input provided")
-
-    logging.info(f"Received chat request: '{user_input_text}', Facial Emotion: '{user_facial_emotion}'")
-
-    image_input_processed = None
-    if image_base64:
-        try:
-            if "base64," in image_base64:
-                _, image_base64 = image_base64.split("base64,", 1)
-            
-            image_bytes = base64.b64decode(image_base64)
-            image_array = np.array(Image.open(BytesIO(image_bytes)))
-            
-            if image_array.ndim == 3 and image_array.shape[2] == 4:
-                image_array = cv2.cvtColor(image_array, cv2.COLOR_RGBA2RGB)
-            elif image_array.ndim == 2:
-                image_array = cv2.cvtColor(image_array, cv2.COLOR_GRAY2RGB)
-            
-            target_height, target_width, _ = INPUT_SHAPE_VISION
-            image_input_processed = cv2.resize(image_array, (target_width, target_height))
-            image_input_processed = image_input_processed.astype(np.float32) / 255.0
-            
-            logging.info("Image data successfully decoded and preprocessed.")
-        except Exception as e:
-            logging.error(f"Error decoding or processing image: {e}")
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Error processing image: {e}")
-
-    is_crisis_input, detected_keywords_input = safety_checker.check_for_crisis_language(user_input_text)
-    if is_crisis_input:
-        logging.warning("Crisis language detected in user input.")
-        output_handler.escalate_to_human(reason="Crisis language in user input", text_to_escalate=user_input_text)
-        response_text = "I'm here for you. Please hold while I connect you to a human expert."
-        interaction_data["ai_response"] = response_text
-        interaction_data["safety_flag_user_input"] = True
-        interaction_data["crisis_keywords_user"] = detected_keywords_input
-        reporter.log_interaction(interaction_data)
-        return ChatResponse(
-            response=response_text,
-            safe=False,
-            dominant_emotions="crisis",
-            suggested_actions=["Human escalation triggered"],
-            analysisData=AnalysisData(
-                moodScore=0, emotionalBreakdown=[], userFacialEmotion=user_facial_emotion,
-                overallSummary={"status": "Crisis", "trend": "N/A", "recommendation": response_text},
-                insights=[{"title": "Safety Alert", "description": "Crisis language detected."}]
-            )
+def _crisis_input_response(user_input_text, user_facial_emotion, detected_keywords_input, interaction_data):
+    """Escalates a turn with crisis language and builds the fixed hand-off response."""
+    logging.warning("Crisis language detected in user input.")
+    output_handler.escalate_to_human(reason="Crisis language in user input", text_to_escalate=user_input_text)
+    response_text = "I'm here for you. Please hold while I connect you to a human expert."
+    interaction_data["ai_response"] = response_text
+    interaction_data["safety_flag_user_input"] = True
+    interaction_data["crisis_keywords_user"] = detected_keywords_input
+    reporter.log_interaction(interaction_data)
+    return ChatResponse(
+        response=response_text,
+        safe=False,
+        dominant_emotions="crisis",
+        suggested_actions=["Human escalation triggered"],
+        analysisData=AnalysisData(
+            moodScore=0, emotionalBreakdown=[], userFacialEmotion=user_facial_emotion,
+            overallSummary={"status": "Crisis", "trend": "N/A", "recommendation": response_text},
+            insights=[{"title": "Safety Alert", "description": "Crisis language detected."}]
         )
+    )
 
-    # Audio Processing
-    audio_base64 = request_data.audio
-    audio_temp_path = None
-    
-    if audio_base64:
-        try:
-            if "base64," in audio_base64:
-                _, audio_base64 = audio_base64.split("base64,", 1)
-            
-            audio_bytes = base64.b64decode(audio_base64)
-            # Create a temp file. We explicitly do not delete on close so we can pass path.
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-                tmp.write(audio_bytes)
-                audio_temp_path = tmp.name
-            logging.info("Audio data successfully decoded and saved to temp file.")
-        except Exception as e:
-            logging.error(f"Error decoding or processing audio: {e}")
-            audio_temp_path = None
+async def _decode_image(decode_fn, image_payload, latency_budget_ms=None):
+    """
+    Decodes and preprocesses the optional camera frame, raising 400 on bad input and 413
+    on oversize images. `decode_fn` is decode_image_base64 for JSON requests and
+    decode_image_bytes for uploads.
 
-    try:
-        text_emb, audio_emb, vision_emb = simulate_input_processing(
-            user_input_text, 
-            text_encoder_model=text_encoder_model, 
-            audio_encoder_model=audio_encoder_model, 
-            vision_encoder_model=vision_encoder_model,
-            image_data=image_input_processed,
-            audio_path=audio_temp_path
-        )
-    finally:
-        # Clean up temp file
-        if audio_temp_path and os.path.exists(audio_temp_path):
-            try:
-                os.remove(audio_temp_path)
-            except Exception as e:
-                logging.error(f"Error removing temp audio file: {e}")
+    The vision backbone tier is chosen here, since it decides the decode resolution.
 
-    logging.debug("Multimodal embeddings generated.")
+    Returns:
+        tuple: (image or None, vision tier name)
+    """
+    if not image_payload:
+        return None, DEFAULT_VISION_TIER
+    vision_tier = vision_tier_policy.choose(inference_executor.queue_depth(), latency_budget_ms)
+    try:
+        image_input_processed = await inference_executor.run_preprocess(
+            decode_fn, image_payload, vision_tier_input_shape(vision_tier), face_crop=FACE_CROP_ENABLED)
+        logging.info(f"Image data successfully decoded and preprocessed for vision tier '{vision_tier}'.")
+        return image_input_processed, vision_tier
+    except InferenceQueueFullError:
+        raise
+    except ImageTooLargeError as e:
+        logging.warning(f"Rejecting oversize image: {e}")
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error decoding or processing image: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Error processing image: {e}")
+
+def _decode_audio_base64(audio_base64):
+    """Returns the encoded audio bytes from a base64 payload, or None if it cannot be decoded."""
+    if not audio_base64:
+        return None
+    try:
+        audio_bytes = base64.b64decode(strip_data_url(audio_base64))
+        logging.info("Audio data successfully decoded.")
+        return audio_bytes
+    except Exception as e:
+        logging.error(f"Error decoding or processing audio: {e}")
+        return None
+
+async def _analyze_emotions(user_input_text, session_id, image_input_processed, audio_bytes, interaction_data=None,
+                            vision_tier=DEFAULT_VISION_TIER):
+    """
+    Runs the multimodal encoders, fusion model and NLP analyzer for one turn and
+    updates the session's conversation memory. Voice-activity and mel window coverage
+    stats of the audio clip are recorded in `interaction_data["audio_activity"]`. Images
+    decoded for a vision tier other than the default one are encoded by that tier's backbone.
 
-    fused_embedding_input = {
-        "text_embedding_input": text_emb,
-        "audio_embedding_input": audio_emb,
-        "vision_embedding_input": vision_emb
-    }
-    fused_output_raw = fusion_model.predict(fused_embedding_input)
-    
-    emotion_probabilities = fused_output_raw[0] if isinstance(fused_output_raw, list) else fused_output_raw[0]
+    Returns:
+        tuple: (emotion_probabilities, weighted_context_vector)
+    """
+    logging.info(f"Processing user input: '{user_input_text}'")
+
+    # Embeddings of content seen before (same phrase, camera frame or audio clip) come from
+    # the content-hash caches; only the missing modalities are sent through the graph
+    text_key = content_key(normalize_text(user_input_text))
+    audio_key = content_key(audio_bytes) if audio_bytes else None
+    vision_key = content_key(vision_tier, image_input_processed) if image_input_processed is not None else None
+    text_emb = embedding_caches["text"].get(text_key)
+    audio_emb = embedding_caches["audio"].get(audio_key)
+    vision_emb = embedding_caches["vision"].get(vision_key)
+
+    # A camera frame that barely changed since the session's last encoded frame (same face,
+    # same expression) reuses that frame's embedding instead of re-running MobileNetV2
+    vision_signature = frame_signature(image_input_processed) if image_input_processed is not None else None
+    vision_gated = False
+    if vision_emb is None and vision_signature is not None:
+        vision_emb = frame_gate.reuse(session_id, vision_signature)
+        vision_gated = vision_emb is not None
+        if vision_gated:
+            logging.debug("Camera frame unchanged since the last encoded frame; reusing its vision embedding.")
+    elif image_input_processed is None:
+        # Webcam streamed over /ws/vision: its latest frame is already encoded, no image to decode
+        vision_emb = streamed_vision.latest(session_id)
+        if vision_emb is not None:
+            logging.info("Using the streamed vision embedding for this turn.")
+    if vision_emb is None and image_input_processed is not None and vision_tier != DEFAULT_VISION_TIER:
+        started_at = time.perf_counter()
+        vision_emb = (await batchers[f"vision_{vision_tier}"].submit(image_input_processed[np.newaxis]))[0]
+        vision_tier_policy.record(vision_tier, time.perf_counter() - started_at)
+        embedding_caches["vision"].put(vision_key, vision_emb)
+    has_vision = vision_emb is not None or image_input_processed is not None
+
+    # Audio is decoded from memory; no temp file round-trip for WAV/FLAC/OGG clips. Silence is
+    # trimmed before feature extraction and a silent clip takes the zero audio embedding path.
+    audio_input, audio_stats = None, None
+    if audio_bytes and audio_emb is None:
+        audio_input, audio_stats = await inference_executor.run(prepare_audio_input_with_stats, audio_bytes=audio_bytes)
+    if audio_stats is not None:
+        if "trimmed_s" in audio_stats:
+            logging.info(
+                f"VAD: kept {audio_stats['trimmed_s']}s of {audio_stats['original_s']}s audio "
+                f"({audio_stats['saved_stft_frames']} STFT frames skipped, voiced={audio_stats['voiced']})."
+            )
+        logging.info(
+            f"Audio: encoded {audio_stats['encoded_s']}s of {audio_stats['original_s']}s in "
+            f"{audio_stats['windows']} mel windows (coverage {audio_stats['coverage']:.0%})."
+        )
+        if interaction_data is not None:
+            interaction_data["audio_activity"] = audio_stats
+        if audio_input is None:
+            # Silent clip: cache an empty embedding so a resend skips decoding and VAD too
+            embedding_caches["audio"].put(audio_key, np.zeros(0, dtype=np.float32))
+    if audio_emb is not None and audio_emb.size == 0:
+        audio_emb = None
+    vision_input = prepare_vision_input(image_input_processed) if vision_emb is None else None
+
+    # One end-to-end graph call per turn (encoders + fusion), batched with concurrent turns
+    # that carry the same modalities. Raw text is batched too, so the whole batch is
+    # tokenized in one vectorized call; absent modalities become zero embeddings in-graph.
+    fuse_in_numpy = audio_emb is not None or vision_emb is not None # Cached embeddings the graph did not see
+    if text_emb is None or audio_input is not None or vision_input is not None:
+        turn_inputs = {"texts": np.array([user_input_text], dtype=object)}
+        if audio_input is not None:
+            turn_inputs.update(audio_input) # Mel windows + pooling weights
+        if vision_input is not None:
+            turn_inputs["images"] = vision_input
+        signature_name = signature_for(audio_input is not None, vision_input is not None)
+        outputs = await batchers[signature_name].submit(turn_inputs)
+        logging.debug(f"End-to-end graph '{signature_name}' produced embeddings and fused probabilities.")
+        emotion_probabilities = outputs["emotion_probabilities"][0]
+
+        text_emb = outputs["text_embedding"][0]
+        embedding_caches["text"].put(text_key, text_emb)
+        if audio_input is not None:
+            audio_emb = outputs["audio_embedding"][0]
+            embedding_caches["audio"].put(audio_key, audio_emb)
+        if vision_input is not None:
+            vision_emb = outputs["vision_embedding"][0]
+            embedding_caches["vision"].put(vision_key, vision_emb)
+    else:
+        fuse_in_numpy = True
+        logging.debug("All embeddings of this turn were cached; skipping the encoders.")
+    if vision_signature is not None and not vision_gated:
+        frame_gate.update(session_id, vision_signature, vision_emb)
+
+    # Voice streamed over /ws/audio while the user was talking: its embedding is already
+    # computed, so only the (NumPy) fusion MLP is re-run with it
+    streamed_audio_emb = streamed_audio.take(session_id) if audio_emb is None else None
+    if streamed_audio_emb is not None:
+        audio_emb = streamed_audio_emb
+        fuse_in_numpy = True
+        logging.info("Using the streamed audio embedding for this turn.")
+
+    text_only = audio_emb is None and vision_emb is None
+    if audio_emb is None:
+        audio_emb = np.zeros(AUDIO_EMBEDDING_DIM, dtype=np.float32)
+    if vision_emb is None:
+        vision_emb = np.zeros(VISION_EMBEDDING_DIM, dtype=np.float32)
+    if fuse_in_numpy:
+        # Only the (NumPy) fusion MLP runs for embeddings that did not go through the graph
+        if text_only:
+            emotion_probabilities = inference_session.fuse_text_only(text_emb[np.newaxis])[0]
+        else:
+            emotion_probabilities = inference_session.fuse({
+                "text_embedding_input": text_emb[np.newaxis],
+                "audio_embedding_input": audio_emb[np.newaxis],
+                "vision_embedding_input": vision_emb[np.newaxis],
+            })[0]
     logging.debug(f"Fused emotion probabilities (original): {emotion_probabilities}")
 
     # --- NLP Sentiment Integration ---
     if nlp_analyzer:
-        nlp_probs = nlp_analyzer.get_emotion_probabilities(user_input_text)
+        nlp_probs = await inference_executor.run(nlp_analyzer.get_emotion_probabilities, user_input_text)
         if nlp_probs:
             logging.info(f"NLP emotion probabilities: {nlp_probs}")
             # Blend NLP probabilities with Fusion probabilities
@@ -234,7 +395,7 @@ async def chat(request_data: ChatRequest):
                     # If audio/vision is missing (text-only), trust NLP 100% to avoid fusion noise.
                     # Otherwise, blend 50/50.
                     
-                    if not image_base64: 
+                    if not has_vision:
                         weight_nlp = 1.0
                     else:
                         weight_nlp = 0.5
@@ -253,71 +414,380 @@ async def chat(request_data: ChatRequest):
     # ---------------------------------
 
     current_turn_embedding = np.concatenate([text_emb.flatten(), audio_emb.flatten(), vision_emb.flatten()])
+    memory = session_store.get_memory(session_id)
     memory.add_context(current_turn_embedding)
     logging.debug("Current turn embedding added to memory.")
 
     weighted_context_vector = memory.get_weighted_context()
     logging.debug(f"Recency-weighted context vector shape: {weighted_context_vector.shape}")
+    return emotion_probabilities, weighted_context_vector
 
-    empathetic_response_text = planner.generate_empathetic_response(
-        user_input_text=user_input_text,
-        current_emotion_probabilities=emotion_probabilities,
-        conversation_context_vector=weighted_context_vector,
-        user_facial_emotion=user_facial_emotion
-    )
-    logging.info(f"Generated empathetic response: '{empathetic_response_text}'")
+def _check_response_safety(response_text, interaction_data):
+    """
+    Replaces a generated response that contains crisis language.
 
-    is_crisis_output, detected_keywords_output = safety_checker.check_for_crisis_language(empathetic_response_text)
+    Returns:
+        tuple: (response_text, is_crisis_output)
+    """
+    is_crisis_output, detected_keywords_output = safety_checker.check_for_crisis_language(response_text)
     if is_crisis_output:
         logging.warning("Crisis language detected in AI's generated response.")
-        output_handler.escalate_to_human(reason="Crisis language in generated response", text_to_escalate=empathetic_response_text)
-        empathetic_response_text = "I'm processing that. My apologies if anything I said was unhelpful. Let me connect you with a human expert."
-        logging.info(f"Overridden response due to safety: '{empathetic_response_text}'")
+        output_handler.escalate_to_human(reason="Crisis language in generated response", text_to_escalate=response_text)
+        response_text = "I'm processing that. My apologies if anything I said was unhelpful. Let me connect you with a human expert."
+        logging.info(f"Overridden response due to safety: '{response_text}'")
         interaction_data["safety_flag_ai_response"] = True
         interaction_data["crisis_keywords_ai"] = detected_keywords_output
+    return response_text, is_crisis_output
 
-    dominant_emotions_str = planner._get_dominant_emotions(emotion_probabilities)
+def _suggested_actions(dominant_emotions_str):
     first_dominant_emotion = dominant_emotions_str.split(', ')[0].lower() if dominant_emotions_str else "neutral"
-    suggested_actions_list = output_handler.action_suggestions.get(first_dominant_emotion, output_handler.action_suggestions["neutral"])
-
-    interaction_data["ai_response"] = empathetic_response_text
-    interaction_data["dominant_emotions"] = dominant_emotions_str
-    interaction_data["suggested_actions"] = suggested_actions_list
-    reporter.log_interaction(interaction_data)
+    return output_handler.action_suggestions.get(first_dominant_emotion, output_handler.action_suggestions["neutral"])
 
-    # Prepare analysis data for response
-    emotional_breakdown_list = [
+def _emotional_breakdown(emotion_probabilities):
+    return [
         {"emotion": EMOTION_LABELS[i], "value": int(prob * 100), "color": "bg-primary" if prob > 0.5 else "bg-accent"}
         for i, prob in enumerate(emotion_probabilities)
     ]
+
+def _build_analysis_data(emotion_probabilities, dominant_emotions_str, suggested_actions_list, response_text, user_facial_emotion):
     overall_summary_status = "Positive" if "positive" in dominant_emotions_str.lower() else ("Negative" if "negative" in dominant_emotions_str.lower() else "Neutral")
     
-    analysis_data_response = AnalysisData(
+    return AnalysisData(
         moodScore=7.5, # Placeholder, needs proper scoring
-        emotionalBreakdown=emotional_breakdown_list,
+        emotionalBreakdown=_emotional_breakdown(emotion_probabilities),
         userFacialEmotion=user_facial_emotion,
-        overallSummary={"status": overall_summary_status, "trend": "Stable", "recommendation": empathetic_response_text},
+        overallSummary={"status": overall_summary_status, "trend": "Stable", "recommendation": response_text},
         insights=[
             {"title": "Key Emotions", "description": f"The dominant emotions detected were: {dominant_emotions_str}."},
-            {"title": "AI Recommendation", "description": empathetic_response_text},
+            {"title": "AI Recommendation", "description": response_text},
             {"title": "Suggested Next Steps", "description": ", ".join(suggested_actions_list)}
         ]
     )
 
+def _sse_event(event, data):
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+async def _chat_turn(user_input_text, user_facial_emotion, session_id, image_input_processed, audio_bytes, vision_tier=DEFAULT_VISION_TIER,
+                     deadline=None):
+    """Runs safety checks, emotion analysis and response generation for one /chat turn."""
+    interaction_data = _new_interaction_data(user_input_text, user_facial_emotion)
+
+    is_crisis_input, detected_keywords_input = safety_checker.check_for_crisis_language(user_input_text)
+    if is_crisis_input:
+        return _crisis_input_response(user_input_text, user_facial_emotion, detected_keywords_input, interaction_data)
+
+    emotion_probabilities, weighted_context_vector = await _analyze_emotions(
+        user_input_text, session_id, image_input_processed, audio_bytes, interaction_data, vision_tier=vision_tier)
+
+    # Decoded together with the replies of other concurrent chats (see generation_scheduler.py)
+    empathetic_response_text = await planner.agenerate_empathetic_response(
+        user_input_text=user_input_text,
+        current_emotion_probabilities=emotion_probabilities,
+        conversation_context_vector=weighted_context_vector,
+        user_facial_emotion=user_facial_emotion,
+        session_id=session_id,
+        run_blocking=inference_executor.run,
+        deadline=deadline
+    )
+    logging.info(f"Generated empathetic response: '{empathetic_response_text}'")
+
+    empathetic_response_text, is_crisis_output = _check_response_safety(empathetic_response_text, interaction_data)
+
+    dominant_emotions_str = planner._get_dominant_emotions(emotion_probabilities)
+    suggested_actions_list = _suggested_actions(dominant_emotions_str)
+
+    interaction_data["ai_response"] = empathetic_response_text
+    interaction_data["dominant_emotions"] = dominant_emotions_str
+    interaction_data["suggested_actions"] = suggested_actions_list
+    reporter.log_interaction(interaction_data)
+
     return ChatResponse(
         response=empathetic_response_text,
         safe=not is_crisis_output,
         dominant_emotions=dominant_emotions_str,
         suggested_actions=suggested_actions_list,
-        analysisData=analysis_data_response
+        analysisData=_build_analysis_data(emotion_probabilities, dominant_emotions_str, suggested_actions_list, empathetic_response_text, user_facial_emotion),
+        audio_activity=interaction_data.get("audio_activity")
     )
 
+# --- Endpoints ---
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request_data: ChatRequest):
+    deadline = reply_deadline(request_data.reply_budget_ms)
+    user_input_text = request_data.text
+    user_facial_emotion = request_data.emotion
+
+    if not user_input_text:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No text input provided")
+
+    logging.info(f"Received chat request: '{user_input_text}', Facial Emotion: '{user_facial_emotion}'")
+
+    image_input_processed, vision_tier = await _decode_image(decode_image_base64, request_data.image, request_data.latency_budget_ms)
+    audio_bytes = _decode_audio_base64(request_data.audio)
+    return await _chat_turn(user_input_text, user_facial_emotion, request_data.session_id, image_input_processed, audio_bytes, vision_tier, deadline)
+
+@app.post("/chat/upload", response_model=ChatResponse)
+async def chat_upload(
+    text: str = Form(...),
+    emotion: str = Form("neutral"),
+    session_id: Optional[str] = Form(None),
+    image: Optional[UploadFile] = File(None),
+    audio: Optional[UploadFile] = File(None),
+    latency_budget_ms: Optional[float] = Form(None),
+    reply_budget_ms: Optional[float] = Form(None),
+):
+    """
+    multipart/form-data variant of /chat. Image and audio arrive as raw file parts and are
+    decoded straight from memory, avoiding base64 inflation and temp files.
+    """
+    deadline = reply_deadline(reply_budget_ms)
+    if not text:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No text input provided")
+
+    logging.info(f"Received chat upload: '{text}', Facial Emotion: '{emotion}'")
+
+    if image is not None and (getattr(image, "size", None) or 0) > MAX_IMAGE_BYTES:
+        # The size is known once the form is parsed: reject before copying and decoding the part
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Image exceeds the {MAX_IMAGE_BYTES} byte limit.")
+    image_bytes = await image.read() if image is not None else None
+    audio_bytes = await audio.read() if audio is not None else None
+
+    image_input_processed, vision_tier = await _decode_image(decode_image_bytes, image_bytes, latency_budget_ms)
+    return await _chat_turn(text, emotion, session_id, image_input_processed, audio_bytes or None, vision_tier, deadline)
+
+@app.post("/chat/stream")
+async def chat_stream(request_data: ChatRequest):
+    """
+    Server-Sent Events variant of /chat.
+
+    Emits an `analysis` event as soon as fusion completes, then `intro`, `token` and `closing`
+    events whose texts concatenate to the reply, and finally a `done` event carrying the same
+    payload as /chat. If `done.safe` is false the streamed text must be replaced by `done.response`.
+    A reply stopped by the reply budget mid-sentence is streamed as decoded, and `done.response`
+    carries it cut back to its last complete sentence, as /chat returns it.
+    """
+    deadline = reply_deadline(request_data.reply_budget_ms)
+    user_input_text = request_data.text
+    user_facial_emotion = request_data.emotion
+    interaction_data = _new_interaction_data(user_input_text, user_facial_emotion)
+
+    if not user_input_text:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No text input provided")
+
+    logging.info(f"Received streaming chat request: '{user_input_text}', Facial Emotion: '{user_facial_emotion}'")
+
+    # Analysis happens before the stream opens so bad input and overload still surface as HTTP errors
+    image_input_processed, vision_tier = await _decode_image(decode_image_base64, request_data.image, request_data.latency_budget_ms)
+
+    is_crisis_input, detected_keywords_input = safety_checker.check_for_crisis_language(user_input_text)
+    if is_crisis_input:
+        crisis_response = _crisis_input_response(user_input_text, user_facial_emotion, detected_keywords_input, interaction_data)
+
+        async def crisis_events():
+            yield _sse_event("done", crisis_response)
+        return StreamingResponse(crisis_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    audio_bytes = _decode_audio_base64(request_data.audio)
+    emotion_probabilities, weighted_context_vector = await _analyze_emotions(
+        user_input_text, request_data.session_id, image_input_processed, audio_bytes, interaction_data, vision_tier=vision_tier)
+    dominant_emotions_str = planner._get_dominant_emotions(emotion_probabilities)
+    suggested_actions_list = _suggested_actions(dominant_emotions_str)
+
+    async def events():
+        yield _sse_event("analysis", {
+            "dominant_emotions": dominant_emotions_str,
+            "suggested_actions": suggested_actions_list,
+            "emotionalBreakdown": _emotional_breakdown(emotion_probabilities),
+            "userFacialEmotion": user_facial_emotion,
+        })
+
+        response_parts = []
+        async for kind, text in planner.stream_empathetic_response(
+            user_input_text=user_input_text,
+            current_emotion_probabilities=emotion_probabilities,
+            conversation_context_vector=weighted_context_vector,
+            user_facial_emotion=user_facial_emotion,
+            run_blocking=inference_executor.run,
+            session_id=request_data.session_id,
+            deadline=deadline
+        ):
+            if kind == "trim":
+                # Already streamed; only done.response drops the unfinished sentence
+                streamed_text = "".join(response_parts)
+                response_parts = [streamed_text[:len(streamed_text.rstrip()) - len(text)]]
+                continue
+            response_parts.append(text)
+            yield _sse_event(kind, {"text": text})
+
+        empathetic_response_text = "".join(response_parts)
+        logging.info(f"Streamed empathetic response: '{empathetic_response_text}'")
+        empathetic_response_text, is_crisis_output = _check_response_safety(empathetic_response_text, interaction_data)
+
+        interaction_data["ai_response"] = empathetic_response_text
+        interaction_data["dominant_emotions"] = dominant_emotions_str
+        interaction_data["suggested_actions"] = suggested_actions_list
+        reporter.log_interaction(interaction_data)
+
+        yield _sse_event("done", ChatResponse(
+            response=empathetic_response_text,
+            safe=not is_crisis_output,
+            dominant_emotions=dominant_emotions_str,
+            suggested_actions=suggested_actions_list,
+            analysisData=_build_analysis_data(emotion_probabilities, dominant_emotions_str, suggested_actions_list, empathetic_response_text, user_facial_emotion),
+            audio_activity=interaction_data.get("audio_activity")
+        ))
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.websocket("/ws/audio")
+async def audio_stream(websocket: WebSocket, session_id: str, sample_rate: int = 22050, sample_format: str = "pcm_s16le"):
+    """
+    Streams microphone audio for a chat session.
+
+    Binary messages are raw mono PCM chunks (`sample_format`: pcm_s16le or pcm_f32le) at
+    `sample_rate`. Mel windows are encoded as soon as they complete, and the pooled embedding
+    of the current utterance is kept for the session's next text turn. A text message "end"
+    closes the utterance.
+    """
+    if sample_format not in PCM_FORMATS:
+        await websocket.close(code=1003, reason=f"Unsupported sample_format. Expected one of {list(PCM_FORMATS)}.")
+        return
+    await websocket.accept()
+    encoder = StreamingAudioEncoder(get_audio_frontend(), AUDIO_WINDOW_HOP_FRAMES, input_sample_rate=sample_rate,
+                                    sample_format=sample_format)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            end_of_utterance = message.get("text") == "end"
+            if message.get("bytes") is not None:
+                windows, energies = await inference_executor.run(encoder.push_pcm, message["bytes"])
+            elif end_of_utterance:
+                windows, energies = await inference_executor.run(encoder.flush)
+            else:
+                continue
+
+            if windows is not None:
+                embeddings = await batchers["audio_stream"].submit(windows)
+                streamed_audio.put(session_id, encoder.add_embeddings(embeddings, energies, AUDIO_POOLING))
+                await websocket.send_json({
+                    "type": "window",
+                    "windows": encoder.num_windows,
+                    "seconds": round(encoder.num_samples / encoder.frontend.sr, 2),
+                })
+            if end_of_utterance:
+                await websocket.send_json({"type": "utterance_end", "windows": encoder.num_windows})
+                encoder.reset()
+    except WebSocketDisconnect:
+        pass
+    except InferenceQueueFullError:
+        # Exception handlers do not cover WebSockets; 1013 = try again later
+        await websocket.close(code=1013, reason="Server busy")
+    logging.info(f"Audio stream closed for session {session_id}.")
+
+@app.websocket("/ws/vision")
+async def vision_stream(websocket: WebSocket, session_id: str, max_fps: float = VISION_STREAM_MAX_FPS):
+    """
+    Streams webcam frames for a chat session and answers with live facial emotion scores.
+
+    Binary messages are encoded frames (JPEG or PNG). Frames are processed at an adaptive
+    rate (see AdaptiveFrameRate): only the newest frame waits for the next slot, older ones
+    are dropped, so a slow server never builds up a queue. Every processed frame is answered
+    with an "emotions" message carrying the smoothed per-emotion probabilities, and its
+    vision embedding is reused by the session's text turns that carry no image.
+    """
+    await websocket.accept()
+    rate = AdaptiveFrameRate(max_fps=min(max_fps, VISION_STREAM_MAX_FPS), min_fps=VISION_STREAM_MIN_FPS)
+    smoother = ProbabilitySmoother(VISION_SMOOTHING_S)
+    pending = {"frame": None} # Newest frame not processed yet
+    frame_ready = asyncio.Event()
+
+    async def receive_frames():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes") is None:
+                continue
+            streamed_vision.count_frames(received=1, dropped=int(pending["frame"] is not None))
+            pending["frame"] = message["bytes"]
+            frame_ready.set()
+
+    async def process_frames():
+        while True:
+            await frame_ready.wait()
+            await asyncio.sleep(rate.delay()) # Frames arriving meanwhile replace the pending one
+            frame_ready.clear()
+            frame, pending["frame"] = pending["frame"], None
+            started_at = time.monotonic()
+            try:
+                image = await inference_executor.run_preprocess(decode_image_bytes, frame, INPUT_SHAPE_VISION, face_crop=FACE_CROP_ENABLED)
+                outputs = await batchers["vision_stream"].submit(image[np.newaxis])
+            except InferenceQueueFullError:
+                streamed_vision.count_frames(dropped=1)
+                rate.back_off()
+                continue
+            except ValueError as e: # Corrupt or oversize frame
+                streamed_vision.count_frames(rejected=1)
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+            rate.record(started_at, time.monotonic() - started_at)
+            streamed_vision.count_frames(processed=1)
+            streamed_vision.put(session_id, outputs["vision_embedding"][0])
+            probabilities = smoother.update(outputs["vision_probabilities"][0])
+            await websocket.send_json({
+                "type": "emotions",
+                "probabilities": {label: round(float(p), 4) for label, p in zip(EMOTION_LABELS, probabilities)},
+                "dominant_emotion": EMOTION_LABELS[int(np.argmax(probabilities))],
+                "fps": round(rate.fps, 2),
+            })
+
+    tasks = [asyncio.create_task(receive_frames()), asyncio.create_task(process_frames())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    except (WebSocketDisconnect, RuntimeError):
+        pass # Client went away while a result was being sent
+    finally:
+        for task in tasks:
+            task.cancel()
+    logging.info(f"Vision stream closed for session {session_id}.")
+
 @app.get("/reports")
 async def get_reports():
     logs = reporter.get_all_logs()
     logging.info(f"Retrieved {len(logs)} interaction logs.")
     return logs
 
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    frame_gate.drop_session(session_id)
+    streamed_audio.drop_session(session_id)
+    streamed_vision.drop_session(session_id)
+    return {"deleted": session_store.drop_session(session_id)}
+
+@app.get("/metrics")
+async def get_metrics():
+    return {
+        "inference_executor": inference_executor.get_metrics(),
+        "batching": {name: batcher.get_metrics() for name, batcher in batchers.items()},
+        "sessions": session_store.get_metrics(),
+        "streamed_audio": streamed_audio.get_metrics(),
+        "voice_activity": voice_activity_stats.get_metrics(),
+        "embedding_caches": {name: cache.get_metrics() for name, cache in embedding_caches.items()},
+        "vision_frame_gate": frame_gate.get_metrics(),
+        "streamed_vision": streamed_vision.get_metrics(),
+        "vision_tiers": vision_tier_policy.get_metrics(),
+        "generation": planner.get_generation_metrics(),
+        "model_loads": get_model_registry().get_metrics(),
+        "startup_self_check": inference_session.self_check_report,
+    }
+
 @app.get("/")
 async def read_root():
     return {"message": "Emotional AI LLM FastAPI Backend is running."}
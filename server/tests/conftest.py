@@ -0,0 +1,8 @@
+# tests/conftest.py
+
+# Tests import the package the way fastapi_app.py does, with the server directory on sys.path.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -0,0 +1,73 @@
+# tests/test_audio_frontend.py
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("librosa")
+tf = pytest.importorskip("tensorflow")
+
+from emotional_ai_llm.audio_frontend import MelFrontend, DEFAULT_SR, DEFAULT_N_MELS, DEFAULT_N_FRAMES, DEFAULT_HOP_LENGTH
+from emotional_ai_llm.utils import mel_spectrogram_from_waveform
+
+TOLERANCE_DB = 1e-2
+# Clips of fewer, exactly and more than DEFAULT_N_FRAMES STFT frames (1 + samples // hop):
+# the first takes the pad path, the last the resize path
+CLIP_FRAMES = {"shorter": 20, "equal": DEFAULT_N_FRAMES, "longer": 200}
+
+
+def librosa_reference(waveform):
+    """The original per-clip path: librosa mel-spectrogram, then resized or zero-padded to 44 frames."""
+    mel_spec = mel_spectrogram_from_waveform(waveform, DEFAULT_SR, n_mels=DEFAULT_N_MELS, hop_length=DEFAULT_HOP_LENGTH)
+    mel_spec = mel_spec[np.newaxis, ..., np.newaxis]
+    if mel_spec.shape[2] > DEFAULT_N_FRAMES:
+        mel_spec = tf.image.resize(mel_spec, (DEFAULT_N_MELS, DEFAULT_N_FRAMES)).numpy()
+    elif mel_spec.shape[2] < DEFAULT_N_FRAMES:
+        mel_spec = np.pad(mel_spec, ((0, 0), (0, 0), (0, DEFAULT_N_FRAMES - mel_spec.shape[2]), (0, 0)))
+    return mel_spec[0]
+
+
+def _clip(frames, seed=0):
+    length = (frames - 1) * DEFAULT_HOP_LENGTH + DEFAULT_HOP_LENGTH // 2
+    return (0.1 * np.random.default_rng(seed).standard_normal(length)).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def frontend():
+    return MelFrontend()
+
+
+@pytest.mark.parametrize("frames", CLIP_FRAMES.values(), ids=CLIP_FRAMES.keys())
+def test_frontend_matches_librosa_path(frontend, frames):
+    waveform = _clip(frames)
+
+    actual = frontend([waveform])
+
+    assert actual.shape == (1, DEFAULT_N_MELS, DEFAULT_N_FRAMES, 1)
+    np.testing.assert_allclose(actual[0], librosa_reference(waveform), rtol=0, atol=TOLERANCE_DB)
+
+
+def test_frontend_matches_librosa_path_in_mixed_batches(frontend):
+    waveforms = [_clip(frames, seed) for seed, frames in enumerate(CLIP_FRAMES.values())]
+
+    actual = frontend(waveforms)
+
+    np.testing.assert_allclose(actual, np.stack([librosa_reference(waveform) for waveform in waveforms]), rtol=0, atol=TOLERANCE_DB)
+
+
+@pytest.mark.parametrize("frames", [DEFAULT_N_FRAMES * 20, DEFAULT_N_FRAMES * 40], ids=["overlapping", "overlap_dropped"])
+def test_windows_cover_clips_that_fit_the_window_budget(frontend, frames):
+    waveform = _clip(frames)
+
+    windows, energies, encoded_s = frontend.windows(waveform, hop_frames=DEFAULT_N_FRAMES // 2, max_windows=64)
+
+    assert len(windows) == len(energies) <= 64
+    assert encoded_s == pytest.approx(len(waveform) / DEFAULT_SR)
+
+
+def test_windows_report_partial_coverage_of_long_clips(frontend):
+    waveform = _clip(30 * DEFAULT_SR // DEFAULT_HOP_LENGTH)
+
+    windows, _, encoded_s = frontend.windows(waveform, hop_frames=DEFAULT_N_FRAMES // 2, max_windows=64)
+
+    assert windows.shape == (64, DEFAULT_N_MELS, DEFAULT_N_FRAMES, 1)
+    assert encoded_s == pytest.approx(64 * DEFAULT_N_FRAMES * DEFAULT_HOP_LENGTH / DEFAULT_SR)
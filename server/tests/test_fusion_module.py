@@ -0,0 +1,50 @@
+# tests/test_fusion_module.py
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("tensorflow")
+
+from emotional_ai_llm.fusion_module import (
+    build_fusion_model, build_text_only_fusion_model,
+    TEXT_EMBEDDING_DIM, AUDIO_EMBEDDING_DIM, VISION_EMBEDDING_DIM, NUM_EMOTION_LABELS,
+)
+
+
+@pytest.fixture(scope="module")
+def fusion_model():
+    return build_fusion_model(NUM_EMOTION_LABELS)
+
+
+def _full_model_inputs(text_embeddings, audio_embedding=None, vision_embedding=None):
+    rows = len(text_embeddings)
+    audio = np.zeros(AUDIO_EMBEDDING_DIM, dtype=np.float32) if audio_embedding is None else audio_embedding
+    vision = np.zeros(VISION_EMBEDDING_DIM, dtype=np.float32) if vision_embedding is None else vision_embedding
+    return {
+        "text_embedding_input": text_embeddings,
+        "audio_embedding_input": np.tile(audio, (rows, 1)),
+        "vision_embedding_input": np.tile(vision, (rows, 1)),
+    }
+
+
+def test_text_only_fusion_matches_full_model_with_zero_audio_and_vision(fusion_model):
+    text_embeddings = np.random.default_rng(0).random((32, TEXT_EMBEDDING_DIM), dtype=np.float32)
+    text_only_model = build_text_only_fusion_model(fusion_model)
+
+    expected = fusion_model.predict(_full_model_inputs(text_embeddings), verbose=0)
+    actual = text_only_model.predict(text_embeddings, verbose=0)
+
+    np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-6)
+
+
+def test_text_only_fusion_folds_constant_embeddings(fusion_model):
+    rng = np.random.default_rng(1)
+    text_embeddings = rng.random((8, TEXT_EMBEDDING_DIM), dtype=np.float32)
+    audio_embedding = rng.random(AUDIO_EMBEDDING_DIM, dtype=np.float32)
+    vision_embedding = rng.random(VISION_EMBEDDING_DIM, dtype=np.float32)
+    text_only_model = build_text_only_fusion_model(fusion_model, audio_embedding, vision_embedding)
+
+    expected = fusion_model.predict(_full_model_inputs(text_embeddings, audio_embedding, vision_embedding), verbose=0)
+    actual = text_only_model.predict(text_embeddings, verbose=0)
+
+    np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-6)
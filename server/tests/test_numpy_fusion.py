@@ -0,0 +1,57 @@
+# tests/test_numpy_fusion.py
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("tensorflow")
+
+from emotional_ai_llm.fusion_module import build_fusion_model, build_text_only_fusion_model, NUM_EMOTION_LABELS
+from emotional_ai_llm.numpy_fusion import NumpyFusionMLP, export_fusion_weights
+
+MAX_BATCH_SIZE = 16
+# Single row, exactly one chunk, and several chunks with a partial last one
+BATCH_SIZES = (1, MAX_BATCH_SIZE, 3 * MAX_BATCH_SIZE + 5)
+TOLERANCES = {np.float32: 1e-5, np.float16: 5e-3}
+
+
+@pytest.fixture(scope="module")
+def fusion_model():
+    return build_fusion_model(NUM_EMOTION_LABELS)
+
+
+def _random_inputs(model, batch_size, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        tensor.name.split(":")[0]: rng.random((batch_size, int(tensor.shape[-1])), dtype=np.float32)
+        for tensor in model.inputs
+    }
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float16])
+@pytest.mark.parametrize("batch_size", BATCH_SIZES)
+def test_numpy_fusion_matches_keras_predict(fusion_model, dtype, batch_size):
+    inputs = _random_inputs(fusion_model, batch_size)
+    runtime = NumpyFusionMLP.from_keras_model(fusion_model, dtype=dtype, max_batch_size=MAX_BATCH_SIZE)
+
+    actual = runtime.predict(inputs)
+
+    assert actual.dtype == np.float32
+    np.testing.assert_allclose(actual, fusion_model.predict(inputs, verbose=0), rtol=0, atol=TOLERANCES[dtype])
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float16])
+def test_text_only_numpy_fusion_matches_keras_predict(fusion_model, dtype):
+    text_only_model = build_text_only_fusion_model(fusion_model)
+    text_embeddings = _random_inputs(text_only_model, BATCH_SIZES[-1])["text_embedding_input"]
+    runtime = NumpyFusionMLP.from_keras_model(text_only_model, dtype=dtype, max_batch_size=MAX_BATCH_SIZE)
+
+    np.testing.assert_allclose(
+        runtime.predict(text_embeddings), text_only_model.predict(text_embeddings, verbose=0), rtol=0, atol=TOLERANCES[dtype])
+
+
+def test_exported_weights_round_trip(fusion_model, tmp_path):
+    inputs = _random_inputs(fusion_model, BATCH_SIZES[-1])
+    path = export_fusion_weights(fusion_model, str(tmp_path / "fusion_mlp_weights.npz"))
+    runtime = NumpyFusionMLP.load(path, max_batch_size=MAX_BATCH_SIZE)
+
+    np.testing.assert_allclose(runtime.predict(inputs), fusion_model.predict(inputs, verbose=0), rtol=0, atol=TOLERANCES[np.float32])
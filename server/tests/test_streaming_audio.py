@@ -0,0 +1,40 @@
+# tests/test_streaming_audio.py
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+pytest.importorskip("librosa")
+
+from emotional_ai_llm.audio_frontend import MelFrontend, DEFAULT_SR
+from emotional_ai_llm.streaming_audio import StreamingAudioEncoder
+
+HOP_FRAMES = 22
+
+
+def _stream(frontend, chunks):
+    encoder = StreamingAudioEncoder(frontend, HOP_FRAMES, sample_format="pcm_s16le")
+    windows = []
+    for chunk in chunks:
+        chunk_windows, _ = encoder.push_pcm(chunk)
+        if chunk_windows is not None:
+            windows.append(chunk_windows)
+    tail_windows, _ = encoder.flush()
+    if tail_windows is not None:
+        windows.append(tail_windows)
+    return encoder, np.concatenate(windows)
+
+
+def test_chunks_split_inside_a_sample_lose_no_audio():
+    frontend = MelFrontend()
+    samples = (np.random.default_rng(0).integers(-8000, 8000, DEFAULT_SR)).astype("<i2")
+    data = samples.tobytes()
+    # Odd chunk sizes split every other chunk boundary inside a 2-byte sample
+    bounds = list(range(0, len(data), 1001)) + [len(data)]
+    chunks = [data[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    whole_encoder, whole_windows = _stream(frontend, [data])
+    split_encoder, split_windows = _stream(frontend, chunks)
+
+    assert split_encoder.num_samples == whole_encoder.num_samples == len(samples)
+    np.testing.assert_allclose(split_windows, whole_windows, rtol=0, atol=1e-4)
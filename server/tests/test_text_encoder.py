@@ -0,0 +1,52 @@
+# tests/test_text_encoder.py
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("tensorflow")
+
+from emotional_ai_llm.text_encoder import (
+    build_cnn_text_encoder, build_text_embedding_extractor, bucket_boundary_lengths, bucket_for_length,
+    group_by_length_bucket, KERNEL_SIZE, MAX_LEN, TEXT_LENGTH_BUCKETS,
+)
+
+NUM_LABELS = 7
+
+
+@pytest.fixture(scope="module")
+def text_extractor():
+    return build_text_embedding_extractor(build_cnn_text_encoder(NUM_LABELS))
+
+
+def _padded_sequences(lengths, seed=0):
+    rng = np.random.default_rng(seed)
+    sequences = np.zeros((len(lengths), MAX_LEN), dtype=np.int32)
+    for row, length in enumerate(lengths):
+        sequences[row, :length] = rng.integers(2, 1000, size=length)
+    return sequences
+
+
+def test_boundary_lengths_cover_every_bucket_edge():
+    lengths = bucket_boundary_lengths(KERNEL_SIZE)
+    for bucket in TEXT_LENGTH_BUCKETS[:-1]:
+        assert bucket - KERNEL_SIZE in lengths and bucket - KERNEL_SIZE + 1 in lengths
+    assert any(length > MAX_LEN - KERNEL_SIZE for length in lengths)
+    assert MAX_LEN in lengths
+
+
+@pytest.mark.parametrize("length", bucket_boundary_lengths(KERNEL_SIZE))
+def test_bucket_keeps_every_window_of_the_full_sequence(length):
+    bucket = bucket_for_length(length, KERNEL_SIZE)
+    assert bucket == MAX_LEN or bucket >= length + KERNEL_SIZE
+
+
+def test_bucketed_embeddings_equal_full_length_embeddings(text_extractor):
+    # Every boundary length, several rows each, so each bucket group holds a real batch
+    sequences = _padded_sequences(np.repeat(bucket_boundary_lengths(KERNEL_SIZE), 3))
+    expected = text_extractor.predict(sequences, verbose=0)
+
+    actual = np.empty_like(expected)
+    for bucket, rows in group_by_length_bucket(sequences, kernel_size=KERNEL_SIZE).items():
+        actual[rows] = text_extractor.predict(sequences[rows, :bucket], verbose=0)
+
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-6)